@@ -0,0 +1,215 @@
+import math
+import random
+import time
+
+from chromosome import ScheduleCodec
+from delta_fitness import IncrementalFitness
+from genetic_algorithm import GeneticAlgorithm, Result, ScheduleBuilder
+from problem import compile_problem
+from progress import ProgressReporter
+
+
+class SimulatedAnnealing:
+    """Имитация отжига: одна траектория от build_schedule с дельта-оценкой ходов.
+
+    Ходы - обмен уроков внутри дня, обмен уроков класса между днями и перенос
+    урока в другой день; каждый оценивается по изменению штрафа
+    IncrementalFitness.penalty. Температура снижается от initial_temperature до
+    final_temperature по мере расхода бюджета (время или итерации): 'geometric'
+    или 'linear'. time_limit - бюджет всего прогона вместе с ремонтом.
+    Возвращает тот же Result, что GeneticAlgorithm.run.
+    """
+
+    # Раз в сколько итераций отжига проверяются отмена и пора ли сообщить прогресс
+    PROGRESS_EVERY = 100
+
+    def __init__(self, classes, subjects, teachers, rooms, time_limit=10.0, max_iterations=200000,
+                 initial_temperature=100.0, final_temperature=0.1, cooling='geometric',
+                 move_probability=0.1, conflict_bias=0.5, construction='greedy', seed=None, problem=None,
+                 progress_callback=None, progress_interval=0.25, cancel_token=None, **kwargs):
+        if cooling not in ('geometric', 'linear'):
+            raise ValueError(f"Неизвестный режим охлаждения: {cooling}")
+        if not 0 < final_temperature <= initial_temperature:
+            raise ValueError("Нужно 0 < final_temperature <= initial_temperature")
+
+        self.classes = classes
+        self.subjects = subjects
+        self.teachers = teachers
+        self.rooms = rooms
+        self.problem = problem or compile_problem(classes, subjects, teachers, rooms)
+        self.days = list(self.problem.days)
+
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.cooling = cooling
+        # Доля ходов-переносов (меняют длины дней) и доля ходов из конфликтных ячеек
+        self.move_probability = move_probability
+        self.conflict_bias = conflict_bias
+        # Начальное расписание: 'greedy' или 'dsatur' (см. ScheduleBuilder.build_schedule)
+        self.construction = construction
+        # progress_callback(dict) - прогресс отжига и ремонта, не чаще раза в progress_interval секунд
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        # CancellationToken: проверяется раз в PROGRESS_EVERY итераций и в ремонте
+        self.cancel_token = cancel_token
+
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.best_schedule = None
+        self.best_fitness = 0
+        self.conflicts = {}
+        self.stats = {}
+
+    def temperature(self, progress: float) -> float:
+        """Температура при доле израсходованного бюджета progress (0..1)"""
+        t0, t1 = self.initial_temperature, self.final_temperature
+        if self.cooling == 'linear':
+            return t0 + (t1 - t0) * progress
+        return t0 * (t1 / t0) ** progress
+
+    def _pick_cell(self, engine, rng):
+        """Ячейка (класс, день, позиция): из конфликта учителя или случайная непустая"""
+        if engine.clashes and rng.random() < self.conflict_bias:
+            t, d, p = rng.choice(sorted(engine.clashes))
+            column = self.codec.teacher_of[engine.genes[:, d, p]]
+            classes = [c for c, teacher in enumerate(column.tolist()) if teacher == t]
+            return rng.choice(classes), d, p
+
+        c = rng.randrange(engine.genes.shape[0])
+        d = rng.randrange(engine.genes.shape[1])
+        n = int(engine.lengths[c, d])
+        if n == 0:
+            return None
+        return c, d, rng.randrange(n)
+
+    def _propose(self, engine, rng):
+        """Применяет случайный ход и возвращает функцию его отмены (или None)"""
+        cell = self._pick_cell(engine, rng)
+        if cell is None:
+            return None
+        c, d, i = cell
+        d2 = rng.randrange(engine.genes.shape[1])
+
+        if rng.random() < self.move_probability:
+            rows = engine.genes[c, d].copy(), engine.genes[c, d2].copy()
+            if not engine.move(c, d, i, d2):
+                return None
+
+            def undo():
+                engine.set_row(c, d, rows[0])
+                engine.set_row(c, d2, rows[1])
+            return undo
+
+        n = int(engine.lengths[c, d2])
+        if n == 0:
+            return None
+        j = rng.randrange(n)
+        if d2 == d:
+            if i == j:
+                return None
+            engine.swap(c, d, i, j)
+            return lambda: engine.swap(c, d, i, j)
+        engine.swap_days(c, d, i, d2, j)
+        return lambda: engine.swap_days(c, d, i, d2, j)
+
+    def run(self):
+        """Отжиг до исчерпания бюджета; затем ремонт оставшихся конфликтов"""
+        print(f"🔥 Запуск имитации отжига: {self.max_iterations} итераций, {self.time_limit} с, "
+              f"T={self.initial_temperature}..{self.final_temperature} ({self.cooling})")
+        rng = random.Random(self.seed)
+        start_time = time.perf_counter()
+        reporter = ProgressReporter(self.progress_callback, self.progress_interval)
+        # Как в GA: часть бюджета остается на ремонт, весь прогон укладывается в time_limit
+        anneal_limit = self.time_limit * (1 - GeneticAlgorithm.REPAIR_SHARE)
+        deadline = time.time() + self.time_limit
+
+        builder = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms, problem=self.problem)
+        initial = builder.build_schedule(self.construction, rng=rng)
+        self.codec = ScheduleCodec.from_schedule(initial, self.days, self.problem)
+        engine = IncrementalFitness(self.codec, self.codec.encode(initial))
+
+        energy = engine.penalty
+        best_energy = energy
+        best_genes = engine.genes.copy()
+        iterations = 0
+        accepted = 0
+        temperature = self.initial_temperature
+        # Время, за которое траектория впервые пришла к нулю конфликтов учителей
+        feasible_time = 0.0 if not engine.clashes else None
+
+        while iterations < self.max_iterations and best_energy > 0:
+            elapsed = time.perf_counter() - start_time
+            if elapsed > anneal_limit:
+                break
+            progress = max(iterations / self.max_iterations, elapsed / anneal_limit)
+            temperature = self.temperature(progress)
+            iterations += 1
+
+            undo = self._propose(engine, rng)
+            if undo is None:
+                continue
+
+            delta = engine.penalty - energy
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                energy += delta
+                accepted += 1
+                if energy < best_energy:
+                    best_energy = energy
+                    best_genes = engine.genes.copy()
+                if feasible_time is None and not engine.clashes:
+                    feasible_time = time.perf_counter() - start_time
+            else:
+                undo()
+
+            if iterations % self.PROGRESS_EVERY == 0:
+                if self.cancel_token is not None:
+                    self.cancel_token.check()
+                reporter({
+                    'phase': 'annealing',
+                    'iteration': iterations,
+                    'iterations': self.max_iterations,
+                    'best_fitness': 100 / (1 + best_energy / 10000),
+                    'conflicts': engine.teacher_conflicts
+                })
+
+            if iterations % 20000 == 0:
+                print(f"Iter {iterations}: T={temperature:.2f}, Penalty={best_energy}, "
+                      f"Conflicts={engine.teacher_conflicts}")
+
+        elapsed = time.perf_counter() - start_time
+        self.stats = {
+            'iterations': iterations,
+            'accepted': accepted,
+            'time': elapsed,
+            'moves_per_sec': iterations / elapsed if elapsed > 0 else 0.0,
+            'final_temperature': temperature,
+            'time_to_feasible': feasible_time
+        }
+
+        # Лучшее расписание - в dict; оставшиеся конфликты снимает ремонт, как в GA
+        self.best_schedule = self.codec.decode(best_genes)
+        self.best_fitness, self.conflicts = self.codec.evaluate(best_genes)
+        b = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms, problem=self.problem)
+        b.schedule = self.codec.decode(best_genes)
+        if reporter:
+            b.progress_callback = reporter
+        b.cancel_token = self.cancel_token
+        if b.has_teacher_conflicts():
+            print(f"\n🔧 Ремонт конфликтов после отжига...")
+            repair_rng = random.Random(self.seed)
+            if not b.resolve_conflicts_tabu(time_limit=max(0.0, deadline - time.time()), rng=repair_rng):
+                b.resolve_all_conflicts_powerful(max_retries=10, rng=repair_rng, deadline=deadline)
+            self.stats['repair'] = b.repair_stats
+        b.assign_rooms()
+
+        b.calculate_fitness()
+        # Как в GA: результат ремонта берется, только если он лучше расписания отжига
+        if b.fitness > self.best_fitness:
+            self.best_schedule = b.schedule
+            self.best_fitness = b.fitness
+            self.conflicts = b.conflicts
+        print(f"✅ Отжиг завершен: fitness={self.best_fitness:.2f}, "
+              f"конфликтов: {self.conflicts['teacher_conflicts']}, {self.stats['moves_per_sec']:.0f} ходов/с")
+
+        return Result(self.best_schedule, self.best_fitness, self.conflicts)
@@ -1,67 +1,249 @@
-from flask import Flask, request, jsonify, send_file, abort
+from flask import Flask, Response, request, jsonify, send_file, abort
 from flask_cors import CORS
+import hashlib
 import json
 import os
+import threading
+import uuid
 from datetime import datetime
 from io import BytesIO
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from genetic_algorithm import GeneticAlgorithm
-from collections import defaultdict
+from jobs import JobQueue, QueueFull, request_cancel, run_optimization, validate_request, watch_record
+from state_store import MemoryStateStore, make_state_store
+from problem import compile_problem
+from result_cache import make_result_cache, request_key
+from versions import make_version_store
+from export_cache import make_export_cache
+from teacher_index import TeacherIndex
+from pdf_export import export_pdf_zip, export_to_pdf
+from workbook_import import import_workbook, SHEETS
+from collections import OrderedDict, defaultdict
 
 app = Flask(__name__)
 CORS(app)
 
-ga_instance = None
-last_schedule = None
-last_fitness = 0
-last_conflicts = None
-
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Расписания пользователей по schedule_id (STATE_BACKEND=memory | sqlite, см. state_store.py);
+# очередь задач - своя у каждого процесса приложения
+state_store = make_state_store()
+job_queue = None
+# Записи задач (статус, прогресс, результат) и запросы их отмены - в том же хранилище:
+# с sqlite GET/DELETE/events задачи работают на любом процессе, а не только на принявшем POST
+job_store = make_state_store(table='job_state')
+# Все версии расписаний (результат оптимизации, сохранения редактора) - VERSIONS_DB, переживают перезапуск
+schedule_versions = make_version_store()
+# Готовые результаты по ключу входных данных (RESULT_CACHE_DIR, RESULT_CACHE_MB; 0 - выключен)
+result_cache = make_result_cache()
+# Готовые XLSX/PDF/JSON по версии расписания (EXPORT_CACHE_MB, EXPORT_CACHE_DIR)
+export_cache = make_export_cache()
+# Загруженные книги (/api/import): проверенные листы по problem_id - в том же хранилище, что и
+# расписания (STATE_BACKEND), чтобы problem_id работал на любом процессе; скомпилированные задачи -
+# LRU в памяти процесса (PROBLEM_CACHE_SIZE), при промахе компилируются заново по листам
+problem_store = make_state_store(table='problem_data')
+problem_cache = MemoryStateStore(int(os.environ.get('PROBLEM_CACHE_SIZE', 32)))
+
+SCHEDULE_COOKIE = 'schedule_id'
+SCHEDULE_COOKIE_MAX_AGE = 30 * 24 * 3600
+
+def save_version(schedule_id, state, source):
+	"""Новая версия расписания: в историю версий и текущим состоянием schedule_id"""
+	state = dict(state, version=schedule_versions.save(schedule_id, state, source))
+	state_store.put(schedule_id, state)
+	return state
+
+def remember_result(schedule_id, result):
+	"""Результат оптимизации - первая версия расписания schedule_id (для редактирования и экспорта)"""
+	return save_version(schedule_id, {
+		'schedule': result['schedule'],
+		'fitness': result['fitness'],
+		'conflicts': result['conflicts']
+	}, 'optimize')
+
+def current_schedule_id():
+	"""schedule_id из параметра запроса, JSON или cookie браузера"""
+	body = request.get_json(silent=True) if request.method == 'POST' else None
+	return request.args.get('schedule_id') or (body or {}).get('schedule_id') or request.cookies.get(SCHEDULE_COOKIE)
+
+def current_state():
+	"""Состояние расписания текущего пользователя (или его версии ?version=N) либо None"""
+	schedule_id = current_schedule_id()
+	if not schedule_id:
+		return None
+	version = request.args.get('version', type=int)
+	if version is not None:
+		return schedule_versions.load(schedule_id, version)
+	state = state_store.get(schedule_id)
+	if state is None:
+		# После перезапуска или вытеснения из state_store - последняя сохраненная версия
+		state = schedule_versions.load(schedule_id)
+		if state is not None:
+			state_store.put(schedule_id, state)
+	return state
+
+def with_schedule_cookie(response, schedule_id):
+	"""Запоминает schedule_id в cookie, чтобы экспорт работал без явного параметра"""
+	response.set_cookie(SCHEDULE_COOKIE, schedule_id, max_age=SCHEDULE_COOKIE_MAX_AGE, httponly=True, samesite='Lax')
+	return response
+
+def cached_result(data):
+	"""(ключ, результат из кэша или None) для запроса оптимизации"""
+	if result_cache is None:
+		return None, None
+	key = request_key(data)
+	return key, result_cache.get(key)
+
+def resolve_problem(data):
+	"""(данные запроса, ProblemInstance или None): по problem_id подставляет листы загруженной книги"""
+	if not data or not data.get('problem_id'):
+		return data, None
+	problem_id = data['problem_id']
+	entry = problem_cache.get(problem_id)
+	if entry is None:
+		# Книга загружена через другой процесс или вытеснена из памяти этого
+		sheets = problem_store.get(problem_id)
+		if sheets is None:
+			raise ValueError('Загруженные данные не найдены, загрузите файл заново')
+		entry = {'data': sheets, 'problem': compile_problem(sheets['classes'], sheets['subjects'],
+															sheets['teachers'], sheets['rooms'])}
+		problem_cache.put(problem_id, entry)
+	return dict(data, **entry['data']), entry['problem']
+
+def on_job_result(job):
+	remember_result(job.id, job.result)
+	if result_cache is not None and job.key:
+		result_cache.put(job.key, job.result)
+
+def get_job_queue():
+	"""Очередь задач создается при первом запросе: JOB_WORKERS процессов, до JOB_QUEUE_SIZE задач"""
+	global job_queue
+	if job_queue is None:
+		job_queue = JobQueue(
+			workers=int(os.environ.get('JOB_WORKERS', 1)),
+			max_pending=int(os.environ.get('JOB_QUEUE_SIZE', 8)),
+			on_result=on_job_result,
+			store=job_store
+		)
+	return job_queue
+
+def local_job(job_id):
+	"""Задача очереди этого процесса; очередь не создается ради чужой задачи"""
+	if job_queue is None:
+		return None
+	return job_queue.get(job_id)
+
+def stored_job(job_id):
+	"""Запись задачи другого процесса из job_store"""
+	record = job_store.get(job_id)
+	if record is None:
+		return None
+	return {name: value for name, value in record.items() if name != 'version'}
+
+# Обратные индексы учителей по (schedule_id, версия) - общие для XLSX, PDF и /api/teachers
+TEACHER_INDEX_CACHE_SIZE = 32
+teacher_indexes = OrderedDict()
+teacher_indexes_lock = threading.Lock()
+
+def teacher_index(state):
+	"""TeacherIndex расписания: один раз на версию, без версии - заново"""
+	version = state.get('version')
+	if version is None:
+		return TeacherIndex(state['schedule'])
+	key = (current_schedule_id(), version)
+	with teacher_indexes_lock:
+		index = teacher_indexes.get(key)
+		if index is not None:
+			teacher_indexes.move_to_end(key)
+			return index
+	index = TeacherIndex(state['schedule'])
+	with teacher_indexes_lock:
+		teacher_indexes[key] = index
+		while len(teacher_indexes) > TEACHER_INDEX_CACHE_SIZE:
+			teacher_indexes.popitem(last=False)
+	return index
+
 #ЭКСПОРТ В EXCEL
+WEEK_DAYS = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница']
+
+def xlsx_styles():
+	"""Именованные стили XLSX: каждая ячейка ссылается на один из них вместо собственных Font/Fill/Border"""
+	def style(name, bold=False, size=11, color=None, fill=None, bordered=True, align='center'):
+		return NamedStyle(
+			name=name,
+			font=Font(name='Calibri', bold=bold, size=size, color=color),
+			fill=PatternFill(start_color=fill, end_color=fill, fill_type='solid') if fill else PatternFill(),
+			border=thin_border if bordered else Border(),
+			alignment=Alignment(horizontal=align, vertical='center', wrap_text=True) if align else Alignment()
+		)
 
-def export_to_excel(schedule, fitness, conflicts):
-	"""Экспортировать расписание в XLSX файл с 4 листами"""
-	wb = openpyxl.Workbook()
-	wb.remove(wb.active)
-
-	header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-	header_font = Font(name='Calibri', bold=True, color="FFFFFF", size=11)
-	title_font = Font(name='Calibri', bold=True, size=16, color="4472C4")
-	title_14_font = Font(name='Calibri', bold=True, size=14)
-	border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-	center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-	left_align = Alignment(horizontal='left', vertical='center', wrap_text=True)
-	alt_fill = PatternFill(start_color="F0F0F0", end_color="F0F0F0", fill_type="solid")
-	days = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница']
+	thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+	alt = 'F0F0F0'
+	return [
+		style('sched_report_title', bold=True, size=16, color='4472C4', bordered=False),
+		style('sched_title', bold=True, size=14, bordered=False, align=None),
+		style('sched_rooms_title', bold=True, size=14, color='4472C4', bordered=False),
+		style('sched_header', bold=True, color='FFFFFF', fill='4472C4'),
+		style('sched_param', align='left'),
+		style('sched_param_alt', align='left', fill=alt),
+		style('sched_cell'),
+		style('sched_cell_alt', fill=alt),
+		style('sched_day', bold=True),
+		style('sched_day_alt', bold=True, fill=alt),
+		style('sched_total', bold=True, bordered=False, align=None),
+		# Загруженность кабинетов: до 25%, 50%, 75% и выше
+		style('sched_load_25', fill='C6EFCE'),
+		style('sched_load_50', fill='FFEB9C'),
+		style('sched_load_75', fill='FFC7CE'),
+		style('sched_load_100', fill='FF6B6B')
+	]
+
+def lesson_field(lesson, name, default=''):
+	return lesson.get(name, default) if isinstance(lesson, dict) else getattr(lesson, name, default)
+
+def export_to_excel(schedule, fitness, conflicts, teachers=None):
+	"""Экспортировать расписание в XLSX файл с 4 листами.
+
+	Книга в режиме write_only: строки листов пишутся потоком во временные
+	файлы и не держатся в памяти, ячейки ссылаются на именованные стили
+	xlsx_styles(). Высоты строк и ширины столбцов задаются до записи строк.
+	teachers - TeacherIndex расписания (строится, если не передан).
+	"""
+	teachers = teachers or TeacherIndex(schedule)
+	wb = openpyxl.Workbook(write_only=True)
+	for named_style in xlsx_styles():
+		wb.add_named_style(named_style)
+	days = WEEK_DAYS
+
+	def cell(ws, value, style):
+		c = WriteOnlyCell(ws, value=value)
+		c.style = style
+		return c
+
+	def header_row(ws, titles):
+		return [cell(ws, title, 'sched_header') for title in titles]
+
+	def set_widths(ws, first, rest, count):
+		ws.column_dimensions['A'].width = first
+		for col in range(2, count + 2):
+			ws.column_dimensions[get_column_letter(col)].width = rest
+
+	def append_title(ws, row, text):
+		"""Заголовок блока (класса, учителя) на строке row, объединенный на A:H; возвращает следующую строку"""
+		ws.row_dimensions[row].height = 22
+		ws.merged_cells.add(f'A{row}:H{row}')
+		ws.append([cell(ws, text, 'sched_title')])
+		ws.append([])
+		ws.append([cell(ws, "День", 'sched_header')] + header_row(ws, [f"Урок {period}" for period in range(1, 8)]))
+		return row + 3
 
 	#ЛИСТ 0: ОТЧЕТ ГЕНЕРАЦИИ
 	def create_report_sheet(wb, schedule, fitness, conflicts):
-		ws = wb.create_sheet("Отчет генерации", 0)
-		ws['A1'] = "ОТЧЕТ ОБ ОПТИМИЗАЦИИ РАСПИСАНИЯ"
-		ws['A1'].font = title_font
-		ws['A1'].alignment = center_align
-		ws.merge_cells('A1:B1')
-		ws.row_dimensions[1].height = 25
-
+		ws = wb.create_sheet("Отчет генерации")
 		total_lessons = sum(len([l for l in lessons if l is not None]) for class_schedule in schedule.values() for lessons in class_schedule.values())
 
-		unique_teachers = set()
-		for class_schedule in schedule.values():
-			for lessons in class_schedule.values():
-				for lesson in lessons:
-					if lesson is not None:
-						teacher = lesson.get('учитель', '')
-						if teacher and teacher != 'Generic' and teacher != 'N/A':
-							unique_teachers.add(teacher)
-
 		unique_classes = len(schedule)
 		metrics = [
 			("Качество расписания (%)", f"{fitness:.1f}"),
@@ -71,231 +253,95 @@ def export_to_excel(schedule, fitness, conflicts):
 			("Нарушения SanPin", str(conflicts.get('sanpin_violations', 0))),
 			("Дата создания", datetime.now().strftime("%Y-%m-%d")),
 			("Количество классов", str(unique_classes)),
-			("Количество учителей", str(len(unique_teachers)))
+			("Количество учителей", str(len(teachers.teachers)))
 		]
 
-		ws['A3'] = "Параметр"
-		ws['B3'] = "Значение"
-		ws['A3'].font = header_font
-		ws['B3'].font = header_font
-		ws['A3'].fill = header_fill
-		ws['B3'].fill = header_fill
-		ws['A3'].alignment = center_align
-		ws['B3'].alignment = center_align
-		ws['A3'].border = border
-		ws['B3'].border = border
-
-		row = 4
-		for i, (param, value) in enumerate(metrics):
-			ws[f'A{row}'] = param
-			ws[f'B{row}'] = value
-			ws[f'A{row}'].border = border
-			ws[f'B{row}'].border = border
-			ws[f'A{row}'].alignment = left_align
-			ws[f'B{row}'].alignment = center_align
-			ws[f'A{row}'].font = Font(name='Calibri', size=11)
-			ws[f'B{row}'].font = Font(name='Calibri', size=11)
-			if i % 2 == 1:
-				ws[f'A{row}'].fill = alt_fill
-				ws[f'B{row}'].fill = alt_fill
-			row += 1
-
 		ws.column_dimensions['A'].width = 25
 		ws.column_dimensions['B'].width = 20
-		for r in range(3, row):
+		ws.row_dimensions[1].height = 25
+		for r in range(3, len(metrics) + 4):
 			ws.row_dimensions[r].height = 20
+		ws.merged_cells.add('A1:B1')
+
+		ws.append([cell(ws, "ОТЧЕТ ОБ ОПТИМИЗАЦИИ РАСПИСАНИЯ", 'sched_report_title')])
+		ws.append([])
+		ws.append(header_row(ws, ["Параметр", "Значение"]))
+		for i, (param, value) in enumerate(metrics):
+			alt = '_alt' if i % 2 == 1 else ''
+			ws.append([cell(ws, param, 'sched_param' + alt), cell(ws, value, 'sched_cell' + alt)])
 
 	#ЛИСТ 1: РАСПИСАНИЕ КЛАССОВ
 	def create_classes_sheet(wb, schedule, days):
-		ws = wb.create_sheet("Расписание классов", 1)
+		ws = wb.create_sheet("Расписание классов")
+		set_widths(ws, 15, 18, 7)
 		row = 1
-		sorted_classes = sorted(schedule.keys())
 
-		for class_idx, class_name in enumerate(sorted_classes):
-			ws[f'A{row}'] = f"Расписание класса {class_name}"
-			ws[f'A{row}'].font = title_14_font
-			ws.merge_cells(f'A{row}:H{row}')
-			ws.row_dimensions[row].height = 22
-			row += 2
-
-			ws[f'A{row}'] = "День"
-			ws[f'A{row}'].font = header_font
-			ws[f'A{row}'].fill = header_fill
-			ws[f'A{row}'].alignment = center_align
-			ws[f'A{row}'].border = border
-			for period in range(1, 8):
-				col = get_column_letter(period + 1)
-				ws[f'{col}{row}'] = f"Урок {period}"
-				ws[f'{col}{row}'].font = header_font
-				ws[f'{col}{row}'].fill = header_fill
-				ws[f'{col}{row}'].alignment = center_align
-				ws[f'{col}{row}'].border = border
-			row += 1
+		for class_name in sorted(schedule.keys()):
+			row = append_title(ws, row, f"Расписание класса {class_name}")
 
 			class_schedule = schedule[class_name]
 			for day_idx, day in enumerate(days):
-				ws[f'A{row}'] = day
-				ws[f'A{row}'].border = border
-				ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-				ws[f'A{row}'].alignment = center_align
-				if day_idx % 2 == 1:
-					ws[f'A{row}'].fill = alt_fill
-
+				alt = '_alt' if day_idx % 2 == 1 else ''
 				lessons = class_schedule.get(day, [])
 				if isinstance(lessons, dict):
 					lessons = list(lessons.values())
 
+				# Первый урок с каждым номером
+				by_period = {}
+				for lesson in lessons:
+					if lesson is not None:
+						by_period.setdefault(lesson_field(lesson, 'урок', 0), lesson)
+
+				cells = [cell(ws, day, 'sched_day' + alt)]
 				for period in range(1, 8):
-					col = get_column_letter(period + 1)
-					target_lesson = None
-					for lesson in lessons:
-						if lesson is not None:
-							lesson_num = lesson.get('урок') if isinstance(lesson, dict) else getattr(lesson, 'урок', 0)
-							if lesson_num == period:
-								target_lesson = lesson
-								break
-
-					if target_lesson:
-						subj = target_lesson.get('предмет', '') if isinstance(target_lesson, dict) else getattr(target_lesson, 'предмет', '')
-						teacher = target_lesson.get('учитель', '') if isinstance(target_lesson, dict) else getattr(target_lesson, 'учитель', '')
-						room = target_lesson.get('кабинет', '') if isinstance(target_lesson, dict) else getattr(target_lesson, 'кабинет', '')
-						text = f"{subj}\n{teacher}\n(Каб. {room})"
-						ws[f'{col}{row}'] = text
+					lesson = by_period.get(period)
+					if lesson:
+						text = f"{lesson_field(lesson, 'предмет')}\n{lesson_field(lesson, 'учитель')}\n(Каб. {lesson_field(lesson, 'кабинет')})"
 					else:
-						ws[f'{col}{row}'] = ""
-
-					ws[f'{col}{row}'].border = border
-					ws[f'{col}{row}'].alignment = center_align
-					ws[f'{col}{row}'].font = Font(name='Calibri', size=11)
-					if day_idx % 2 == 1:
-						ws[f'{col}{row}'].fill = alt_fill
+						text = ""
+					cells.append(cell(ws, text, 'sched_cell' + alt))
 
 				ws.row_dimensions[row].height = 55
+				ws.append(cells)
 				row += 1
 
+			ws.append([])
+			ws.append([])
 			row += 2
 
-		ws.column_dimensions['A'].width = 15
-		for col in range(2, 9):
-			ws.column_dimensions[get_column_letter(col)].width = 18
-
 	#ЛИСТ 2: РАСПИСАНИЕ УЧИТЕЛЕЙ
-	def create_teachers_sheet(wb, schedule, days):
-		ws = wb.create_sheet("Расписание учителей", 2)
-		teachers_set = set()
-		teacher_classes = defaultdict(set)
-
-		for class_name, class_schedule in schedule.items():
-			for day, lessons in class_schedule.items():
-				for lesson in lessons:
-					if lesson is not None:
-						teacher = lesson.get('учитель', '')
-						if teacher and teacher != 'Generic' and teacher != 'N/A':
-							teachers_set.add(teacher)
-							teacher_classes[teacher].add(class_name)
+	def create_teachers_sheet(wb, teachers, days):
+		ws = wb.create_sheet("Расписание учителей")
+		set_widths(ws, 15, 18, 7)
 
-		sorted_teachers = sorted(teachers_set)
 		row = 1
-
-		for teacher in sorted_teachers:
-			ws[f'A{row}'] = f"Расписание учителя: {teacher}"
-			ws[f'A{row}'].font = title_14_font
-			ws.merge_cells(f'A{row}:H{row}')
-			ws.row_dimensions[row].height = 22
-			row += 2
-
-			ws[f'A{row}'] = "День"
-			ws[f'A{row}'].font = header_font
-			ws[f'A{row}'].fill = header_fill
-			ws[f'A{row}'].alignment = center_align
-			ws[f'A{row}'].border = border
-			for period in range(1, 8):
-				col = get_column_letter(period + 1)
-				ws[f'{col}{row}'] = f"Урок {period}"
-				ws[f'{col}{row}'].font = header_font
-				ws[f'{col}{row}'].fill = header_fill
-				ws[f'{col}{row}'].alignment = center_align
-				ws[f'{col}{row}'].border = border
-			row += 1
-
-			total_hours = 0
-			gaps = 0
+		for teacher in teachers.teachers:
+			row = append_title(ws, row, f"Расписание учителя: {teacher}")
 
 			for day_idx, day in enumerate(days):
-				ws[f'A{row}'] = day
-				ws[f'A{row}'].border = border
-				ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-				ws[f'A{row}'].alignment = center_align
-				if day_idx % 2 == 1:
-					ws[f'A{row}'].fill = alt_fill
-
-				day_lessons = []
-				for class_name in schedule.keys():
-					class_schedule = schedule[class_name]
-					lessons = class_schedule.get(day, [])
-					if isinstance(lessons, dict):
-						lessons = list(lessons.values())
-					for lesson in lessons:
-						if lesson is not None:
-							lesson_teacher = lesson.get('учитель', '')
-							if lesson_teacher == teacher:
-								day_lessons.append({
-									'период': lesson.get('урок', 0),
-									'класс': class_name,
-									'предмет': lesson.get('предмет', ''),
-									'кабинет': lesson.get('кабинет', '')
-								})
-
-				if day_lessons:
-					day_lessons.sort(key=lambda x: x['период'])
-					for i in range(1, 8):
-						has_lesson = any(l['период'] == i for l in day_lessons)
-						if not has_lesson and i > 0:
-							gaps += 1
-
+				alt = '_alt' if day_idx % 2 == 1 else ''
+				by_period = teachers.day(teacher, day)
+				cells = [cell(ws, day, 'sched_day' + alt)]
 				for period in range(1, 8):
-					col = get_column_letter(period + 1)
-					target_lesson = None
-					for lesson in day_lessons:
-						if lesson['период'] == period:
-							target_lesson = lesson
-							break
-
-					if target_lesson:
-						text = f"{target_lesson['класс']}\n{target_lesson['предмет']}\nКаб. {target_lesson['кабинет']}"
-						ws[f'{col}{row}'] = text
-						total_hours += 1
-					else:
-						ws[f'{col}{row}'] = "-"
-
-					ws[f'{col}{row}'].border = border
-					ws[f'{col}{row}'].alignment = center_align
-					ws[f'{col}{row}'].font = Font(name='Calibri', size=11)
-					if day_idx % 2 == 1:
-						ws[f'{col}{row}'].fill = alt_fill
+					lesson = by_period.get(period)
+					text = f"{lesson['класс']}\n{lesson['предмет']}\nКаб. {lesson['кабинет']}" if lesson else "-"
+					cells.append(cell(ws, text, 'sched_cell' + alt))
 
 				ws.row_dimensions[row].height = 55
+				ws.append(cells)
 				row += 1
 
-			ws[f'A{row}'] = f"Всего часов в неделю: {total_hours}"
-			ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-			row += 1
-			ws[f'A{row}'] = f"Окна (пропуски): {gaps}"
-			ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-			row += 2
-
-		ws.column_dimensions['A'].width = 15
-		for col in range(2, 9):
-			ws.column_dimensions[get_column_letter(col)].width = 18
+			ws.append([cell(ws, f"Всего часов в неделю: {teachers.hours(teacher, days)}", 'sched_total')])
+			ws.append([cell(ws, f"Окна (пропуски): {teachers.free_periods(teacher, days)}", 'sched_total')])
+			ws.append([])
+			row += 3
 
 	#ЛИСТ 3: ЗАГРУЖЕННОСТЬ КАБИНЕТОВ
 	def create_rooms_sheet(wb, schedule, days):
-		ws = wb.create_sheet("Загруженность кабинетов", 3)
-		ws['A1'] = "ЗАГРУЖЕННОСТЬ КАБИНЕТОВ"
-		ws['A1'].font = Font(name='Calibri', bold=True, size=14, color="4472C4")
-		ws['A1'].alignment = center_align
-		ws.merge_cells('A1:H1')
+		ws = wb.create_sheet("Загруженность кабинетов")
+		set_widths(ws, 15, 12, len(days) + 2)
 		ws.row_dimensions[1].height = 22
+		ws.merged_cells.add('A1:H1')
 
 		room_usage = defaultdict(lambda: {day: 0 for day in days})
 		rooms_set = set()
@@ -310,261 +356,111 @@ def export_to_excel(schedule, fitness, conflicts):
 							room_usage[str(room)][day] += 1
 
 		sorted_rooms = sorted(rooms_set)
-		row = 3
-
-		ws[f'A{row}'] = "Кабинет"
-		ws[f'A{row}'].font = header_font
-		ws[f'A{row}'].fill = header_fill
-		ws[f'A{row}'].alignment = center_align
-		ws[f'A{row}'].border = border
-
-		for day_idx, day in enumerate(days):
-			col = get_column_letter(day_idx + 2)
-			ws[f'{col}{row}'] = day[:2]
-			ws[f'{col}{row}'].font = header_font
-			ws[f'{col}{row}'].fill = header_fill
-			ws[f'{col}{row}'].alignment = center_align
-			ws[f'{col}{row}'].border = border
-
-		col = get_column_letter(len(days) + 2)
-		ws[f'{col}{row}'] = "Всего"
-		ws[f'{col}{row}'].font = header_font
-		ws[f'{col}{row}'].fill = header_fill
-		ws[f'{col}{row}'].alignment = center_align
-		ws[f'{col}{row}'].border = border
-
-		col = get_column_letter(len(days) + 3)
-		ws[f'{col}{row}'] = "%"
-		ws[f'{col}{row}'].font = header_font
-		ws[f'{col}{row}'].fill = header_fill
-		ws[f'{col}{row}'].alignment = center_align
-		ws[f'{col}{row}'].border = border
-		row += 1
+		ws.append([cell(ws, "ЗАГРУЖЕННОСТЬ КАБИНЕТОВ", 'sched_rooms_title')])
+		ws.append([])
+		ws.append(header_row(ws, ["Кабинет"] + [day[:2] for day in days] + ["Всего", "%"]))
 
 		max_lessons_per_day = 7
 		total_usage_all = 0
 		rooms_used = 0
+		room_percentages = {}
 
 		for room in sorted_rooms:
-			ws[f'A{row}'] = str(room)
-			ws[f'A{row}'].border = border
-			ws[f'A{row}'].alignment = center_align
-			ws[f'A{row}'].font = Font(name='Calibri', size=11)
-
-			daily_usage = []
-			for day in days:
-				usage = room_usage[room].get(day, 0)
-				daily_usage.append(usage)
-
+			daily_usage = [room_usage[room].get(day, 0) for day in days]
 			total_usage = sum(daily_usage)
 			total_usage_all += total_usage
-
 			if total_usage > 0:
 				rooms_used += 1
 
 			percentage = (total_usage / (len(days) * max_lessons_per_day)) * 100 if len(days) > 0 else 0
+			room_percentages[room] = percentage
 
 			if percentage <= 25:
-				fill_color = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+				load = 'sched_load_25'
 			elif percentage <= 50:
-				fill_color = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
+				load = 'sched_load_50'
 			elif percentage <= 75:
-				fill_color = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+				load = 'sched_load_75'
 			else:
-				fill_color = PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid")
-
-			for day_idx, usage in enumerate(daily_usage):
-				col = get_column_letter(day_idx + 2)
-				ws[f'{col}{row}'] = usage
-				ws[f'{col}{row}'].border = border
-				ws[f'{col}{row}'].alignment = center_align
-				ws[f'{col}{row}'].fill = fill_color
-				ws[f'{col}{row}'].font = Font(name='Calibri', size=11)
-
-			col = get_column_letter(len(days) + 2)
-			ws[f'{col}{row}'] = total_usage
-			ws[f'{col}{row}'].border = border
-			ws[f'{col}{row}'].alignment = center_align
-			ws[f'{col}{row}'].fill = fill_color
-			ws[f'{col}{row}'].font = Font(name='Calibri', size=11)
-
-			col = get_column_letter(len(days) + 3)
-			ws[f'{col}{row}'] = f"{percentage:.0f}%"
-			ws[f'{col}{row}'].border = border
-			ws[f'{col}{row}'].alignment = center_align
-			ws[f'{col}{row}'].fill = fill_color
-			ws[f'{col}{row}'].font = Font(name='Calibri', size=11)
-			row += 1
-
-		row += 1
-		avg_percentage = (total_usage_all / (len(sorted_rooms) * len(days) * max_lessons_per_day)) * 100 if len(sorted_rooms) > 0 and len(days) > 0 else 0
+				load = 'sched_load_100'
 
-		room_percentages = {}
-		for room in sorted_rooms:
-			usage = sum(room_usage[room].values())
-			percentage = (usage / (len(days) * max_lessons_per_day)) * 100 if len(days) > 0 else 0
-			room_percentages[room] = percentage
+			ws.append([cell(ws, str(room), 'sched_cell')] +
+					  [cell(ws, value, load) for value in daily_usage + [total_usage, f"{percentage:.0f}%"]])
 
+		avg_percentage = (total_usage_all / (len(sorted_rooms) * len(days) * max_lessons_per_day)) * 100 if len(sorted_rooms) > 0 and len(days) > 0 else 0
 		max_room = max(room_percentages, key=room_percentages.get) if room_percentages else "N/A"
 		min_room = min(room_percentages, key=room_percentages.get) if room_percentages else "N/A"
 
-		ws[f'A{row}'] = f"Всего кабинетов: {len(sorted_rooms)}"
-		ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-		row += 1
-		ws[f'A{row}'] = f"Используемых: {rooms_used}"
-		ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-		row += 1
-		ws[f'A{row}'] = f"Пустых: {len(sorted_rooms) - rooms_used}"
-		ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-		row += 1
-		ws[f'A{row}'] = f"Средняя загруженность: {avg_percentage:.1f}%"
-		ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-		row += 1
-		ws[f'A{row}'] = f"Самый нагруженный: Каб. {max_room} ({room_percentages.get(max_room, 0):.0f}%)"
-		ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-		row += 1
-		ws[f'A{row}'] = f"Самый свободный: Каб. {min_room} ({room_percentages.get(min_room, 0):.0f}%)"
-		ws[f'A{row}'].font = Font(name='Calibri', bold=True, size=11)
-
-		ws.column_dimensions['A'].width = 15
-		for col in range(2, len(days) + 4):
-			ws.column_dimensions[get_column_letter(col)].width = 12
+		ws.append([])
+		for text in (
+			f"Всего кабинетов: {len(sorted_rooms)}",
+			f"Используемых: {rooms_used}",
+			f"Пустых: {len(sorted_rooms) - rooms_used}",
+			f"Средняя загруженность: {avg_percentage:.1f}%",
+			f"Самый нагруженный: Каб. {max_room} ({room_percentages.get(max_room, 0):.0f}%)",
+			f"Самый свободный: Каб. {min_room} ({room_percentages.get(min_room, 0):.0f}%)"
+		):
+			ws.append([cell(ws, text, 'sched_total')])
 
 	create_report_sheet(wb, schedule, fitness, conflicts)
 	create_classes_sheet(wb, schedule, days)
-	create_teachers_sheet(wb, schedule, days)
+	create_teachers_sheet(wb, teachers, days)
 	create_rooms_sheet(wb, schedule, days)
 	return wb
 
-#ЭКСПОРТ В PDF 
-def export_to_pdf(schedule, fitness, conflicts):
-    """Экспортировать расписание в PDF"""
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-
-    buffer = BytesIO()
-
-    # Регистрируем русские шрифты
-    try:
-        pdfmetrics.registerFont(TTFont('DejaVu', 'DejaVuSans.ttf'))
-        pdfmetrics.registerFont(TTFont('DejaVuBold', 'DejaVuSans-Bold.ttf'))
-        font_name = 'DejaVu'
-        font_name_bold = 'DejaVuBold'
-    except:
-        font_name = 'Helvetica'
-        font_name_bold = 'Helvetica-Bold'
-
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), topMargin=0.3 * inch, bottomMargin=0.3 * inch,
-                            leftMargin=0.3 * inch, rightMargin=0.3 * inch)
-    story = []
-
-    days = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница']
-
-    for class_name, class_schedule in sorted(schedule.items()):
-        # Заголовок класса (простой текст без стилей)
-        header_style = ParagraphStyle(
-            'ClassHeader',
-            fontName=font_name_bold,
-            fontSize=12,
-            spaceAfter=10,
-            textColor=colors.HexColor('#4472C4')
-        )
-        story.append(Paragraph(f"Класс {class_name}", header_style))
-
-        data = [['День', 'Урок 1', 'Урок 2', 'Урок 3', 'Урок 4', 'Урок 5', 'Урок 6', 'Урок 7']]
-
-        for day in days:
-            row = [day]
-            lessons = class_schedule.get(day, [])
-            if isinstance(lessons, dict):
-                lessons = list(lessons.values())
-
-            for period in range(1, 8):
-                target_lesson = None
-                for lesson in lessons:
-                    if lesson is not None:
-                        lesson_num = lesson.get('урок') if isinstance(lesson, dict) else getattr(lesson, 'урок', 0)
-                        if lesson_num == period:
-                            target_lesson = lesson
-                            break
-
-                if target_lesson:
-                    subj = target_lesson.get('предмет', '-')
-                    if not subj or subj == 'N/A':
-                        subj = '-'
-                    teacher = target_lesson.get('учитель', '-')
-                    if not teacher or teacher == 'N/A':
-                        teacher = '-'
-                    room = target_lesson.get('кабинет', '-')
-                    if not room or room == 'N/A':
-                        room = '-'
-
-                    text = f"{subj}\n{teacher}\nКаб.{room}"
-                    row.append(text)
-                else:
-                    row.append('-')
-
-            data.append(row)
-
-        table = Table(data, colWidths=[0.8 * inch] + [0.9 * inch] * 7)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
-            ('FONTNAME', (0, 1), (-1, -1), font_name),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('FONTSIZE', (0, 1), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
-            ('TOPPADDING', (0, 0), (-1, 0), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
-            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-            ('TOPPADDING', (0, 1), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
-        ]))
-
-        story.append(table)
-        story.append(Spacer(1, 0.2 * inch))
-
-    # Статистика
-    stats_style = ParagraphStyle(
-        'StatsHeader',
-        fontName=font_name_bold,
-        fontSize=12,
-        spaceAfter=10,
-        textColor=colors.HexColor('#4472C4')
-    )
-    story.append(Paragraph("Статистика", stats_style))
-
-    stats_data = [
-        ['Параметр', 'Значение'],
-        ['Качество расписания', f"{fitness:.1f}%"],
-        ['Конфликты учителей', str(conflicts.get('teacher_conflicts', 0))],
-        ['Конфликты кабинетов', str(conflicts.get('room_conflicts', 0))],
-        ['Нарушения SanPin', str(conflicts.get('sanpin_violations', 0))],
-    ]
-
-    stats_table = Table(stats_data, colWidths=[3 * inch, 2 * inch])
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
-        ('FONTNAME', (0, 1), (-1, -1), font_name),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
-
-    story.append(stats_table)
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+#КЭШ ЭКСПОРТА
+
+EXPORT_MIMETYPES = {
+	'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+	'pdf': 'application/pdf',
+	'json': 'application/json',
+	'zip': 'application/zip'
+}
+
+def build_xlsx(state):
+	wb = export_to_excel(state['schedule'], state['fitness'], state['conflicts'], teacher_index(state))
+	buffer = BytesIO()
+	wb.save(buffer)
+	return buffer.getvalue()
+
+def build_pdf(state):
+	return export_to_pdf(state['schedule'], state['fitness'], state['conflicts']).getvalue()
+
+def build_zip(state):
+	return export_pdf_zip(state['schedule'], state['fitness'], state['conflicts'], teacher_index(state))
+
+def build_json(state):
+	return json.dumps(state['schedule'], ensure_ascii=False, indent=2).encode('utf-8')
+
+def export_response(state, fmt, build):
+	"""Файл экспорта версии расписания: из кэша или build(state), со strong ETag.
+
+	Клиент с If-None-Match, совпадающим с ETag, получает 304 без тела.
+	Версия после сохранения не меняется, поэтому кэш по (schedule_id, версия,
+	формат) не устаревает; /api/update создает новую версию.
+	"""
+	cacheable = export_cache is not None and state.get('version') is not None
+	key = (current_schedule_id(), state.get('version'), fmt)
+	artifact = export_cache.get(key) if cacheable else None
+	if artifact is None:
+		data = build(state)
+		artifact = export_cache.put(key, data) if cacheable else (hashlib.sha256(data).hexdigest(), data)
+	etag, data = artifact
+
+	response = send_file(
+		BytesIO(data),
+		mimetype=EXPORT_MIMETYPES[fmt],
+		as_attachment=True,
+		download_name=f'расписание_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{fmt}',
+		etag=etag,
+		conditional=True
+	)
+	# Файл зависит от cookie schedule_id - общие кэши его хранить не должны
+	response.cache_control.private = True
+	response.cache_control.no_cache = True
+	response.vary.add('Cookie')
+	return response
+
 #ROUTES
 
 @app.route('/')
@@ -572,62 +468,57 @@ def serve_index():
 	"""Главная страница"""
 	return send_file(os.path.join(BASE_DIR, 'index.html'))
 
+@app.route('/api/import', methods=['POST'])
+def import_data():
+	"""Загрузить книгу XLSX с исходными данными; возвращает problem_id для /api/optimize и /api/jobs"""
+	file = request.files.get('file')
+	if file is None:
+		return jsonify({'success': False, 'error': 'Файл не передан (поле file)'}), 400
+	try:
+		entry = import_workbook(file.stream)
+	except ValueError as e:
+		return jsonify({'success': False, 'error': str(e)}), 400
+	problem_store.put(entry['id'], entry['data'])
+	problem_cache.put(entry['id'], entry)
+	data = entry['data']
+	return jsonify({
+		'success': True,
+		'problem_id': entry['id'],
+		'counts': {key: len(data[key]) for key in SHEETS},
+		'classes': [c['класс'] for c in data['classes']],
+		'total_lessons': sum(len(lessons) for lessons in entry['problem'].class_lessons.values())
+	})
+
 @app.route('/api/optimize', methods=['POST'])
 def optimize():
-	"""Запустить оптимизацию"""
-	global ga_instance, last_schedule, last_fitness, last_conflicts
+	"""Запустить оптимизацию (синхронно; для долгих прогонов - /api/jobs)"""
 	try:
 		data = request.json
-		classes = data.get('classes', [])
-		subjects = data.get('subjects', [])
-		teachers = data.get('teachers', [])
-		rooms = data.get('rooms', [])
-
-		if not classes or not subjects or not teachers:
-			return jsonify({'success': False, 'error': 'Недостаточно данных'}), 400
-
-		ga_instance = GeneticAlgorithm(
-			classes=classes,
-			subjects=subjects,
-			teachers=teachers,
-			rooms=rooms,
-			generations=100,
-			population_size=30,
-			mutation_rate=0.2,
-			crossover_rate=0.85
-		)
-
-		result = ga_instance.run()
-		schedule = result.schedule
-		fitness = result.fitness
-		conflicts = result.conflicts
-
-		schedule_dict = {}
-		for class_name, class_schedule in schedule.items():
-			schedule_dict[class_name] = {}
-			for day, lessons in class_schedule.items():
-				schedule_dict[class_name][day] = []
-				for lesson in lessons:
-					schedule_dict[class_name][day].append({
-						'урок': lesson.get('урок', 0),
-						'предмет': lesson.get('предмет', 'N/A'),
-						'учитель': lesson.get('учитель', 'N/A'),
-						'кабинет': str(lesson.get('кабинет', '101'))
-					})
-
-		last_schedule = schedule_dict
-		last_fitness = fitness
-		last_conflicts = conflicts
-
-		total_lessons = sum(len(lessons) for class_schedule in schedule_dict.values() for lessons in class_schedule.values())
-
-		return jsonify({
+		try:
+			data, problem = resolve_problem(data)
+			validate_request(data)
+		except ValueError as e:
+			return jsonify({'success': False, 'error': str(e)}), 400
+
+		key, result = cached_result(data)
+		cached = result is not None
+		if not cached:
+			result = run_optimization(data, problem=problem)
+			if key:
+				result_cache.put(key, result)
+		schedule_id = uuid.uuid4().hex
+		state = remember_result(schedule_id, result)
+
+		return with_schedule_cookie(jsonify({
 			'success': True,
-			'schedule': schedule_dict,
-			'fitness': fitness,
-			'total_lessons': total_lessons,
-			'conflicts': conflicts
-		})
+			'schedule_id': schedule_id,
+			'version': state['version'],
+			'schedule': result['schedule'],
+			'fitness': result['fitness'],
+			'total_lessons': result['total_lessons'],
+			'conflicts': result['conflicts'],
+			'cached': cached
+		}), schedule_id)
 
 	except Exception as e:
 		import traceback
@@ -635,36 +526,156 @@ def optimize():
 		print(traceback.format_exc())
 		return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+	"""Поставить оптимизацию в очередь; сразу возвращает id задачи (он же schedule_id результата)"""
+	data = request.json
+	try:
+		data, problem = resolve_problem(data)
+		validate_request(data)
+		key, result = cached_result(data)
+		if result is not None:
+			job = get_job_queue().add_cached(result, key)
+			remember_result(job.id, result)
+		else:
+			job = get_job_queue().submit(data, key, problem)
+	except QueueFull as e:
+		return jsonify({'success': False, 'error': str(e)}), 503
+	except ValueError as e:
+		return jsonify({'success': False, 'error': str(e)}), 400
+	response = jsonify({'success': True, 'job_id': job.id, 'schedule_id': job.id, 'status': job.status,
+						'cached': job.cached})
+	return with_schedule_cookie(response, job.id), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+	"""Статус, прогресс и (после завершения) результат задачи - своей или, через job_store, другого процесса"""
+	job = local_job(job_id)
+	record = job.to_dict() if job is not None else stored_job(job_id)
+	if record is None:
+		return jsonify({'success': False, 'error': 'Задача не найдена'}), 404
+	return jsonify(dict(record, success=True))
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+	"""Отменить задачу: ядра освобождаются на ближайшей проверке токена отмены.
+	Задачу другого процесса отменяет ее владелец по запросу в job_store (до STORE_POLL_INTERVAL секунд)"""
+	job = local_job(job_id)
+	if job is None:
+		record = stored_job(job_id)
+		if record is None:
+			return jsonify({'success': False, 'error': 'Задача не найдена'}), 404
+		if record['status'] not in ('queued', 'running'):
+			return jsonify({'success': False, 'error': 'Задача уже завершена', 'status': record['status']}), 409
+		request_cancel(job_store, job_id)
+		return jsonify({'success': True, 'status': record['status']}), 202
+	if not job_queue.cancel(job):
+		return jsonify({'success': False, 'error': 'Задача уже завершена', 'status': job.status}), 409
+	return jsonify({'success': True, 'status': job.status}), 202
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+	"""Прогресс задачи потоком Server-Sent Events (progress, затем done, failed или cancelled);
+	задачу другого процесса поток читает из job_store"""
+	job = local_job(job_id)
+	if job is not None:
+		events = job_queue.watch(job)
+	elif job_store.get(job_id) is not None:
+		events = watch_record(job_store, job_id)
+	else:
+		return jsonify({'success': False, 'error': 'Задача не найдена'}), 404
+
+	def stream():
+		for event in events:
+			if event is None:
+				yield ": keep-alive\n\n"
+				continue
+			name, payload = event
+			yield f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+	return Response(stream(), mimetype='text/event-stream',
+					headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/update', methods=['POST'])
 def update_schedule():
 	"""Обновить расписание после редактирования"""
-	global last_schedule, last_fitness, last_conflicts
 	try:
 		data = request.json
 		new_schedule = data.get('schedule')
 		if not new_schedule:
 			return jsonify({'success': False, 'error': 'Нет данных'}), 400
-		last_schedule = new_schedule
-		return jsonify({'success': True})
+		schedule_id = current_schedule_id() or uuid.uuid4().hex
+		state = current_state() or {'fitness': 0, 'conflicts': {}}
+		state = save_version(schedule_id, dict(state, schedule=new_schedule), 'edit')
+		return with_schedule_cookie(jsonify({'success': True, 'schedule_id': schedule_id,
+											 'version': state['version']}), schedule_id)
 	except Exception as e:
 		return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/schedules/<schedule_id>/versions', methods=['GET'])
+def schedule_history(schedule_id):
+	"""Версии расписания (номер, время, источник, fitness), от новых к старым"""
+	return jsonify({'success': True, 'schedule_id': schedule_id, 'versions': schedule_versions.history(schedule_id)})
+
+@app.route('/api/schedules/<schedule_id>/versions/<int:version>', methods=['GET'])
+def schedule_version(schedule_id, version):
+	"""Загрузить версию расписания без повторной оптимизации"""
+	state = schedule_versions.load(schedule_id, version)
+	if state is None:
+		return jsonify({'success': False, 'error': 'Версия не найдена'}), 404
+	return jsonify(dict(state, success=True, schedule_id=schedule_id))
+
+@app.route('/api/schedules/<schedule_id>/rollback', methods=['POST'])
+def rollback_schedule(schedule_id):
+	"""Откат к версии {"version": N}: она становится новой текущей версией"""
+	version = (request.get_json(silent=True) or {}).get('version')
+	if not isinstance(version, int):
+		return jsonify({'success': False, 'error': 'Нужен номер версии'}), 400
+	state = schedule_versions.rollback(schedule_id, version)
+	if state is None:
+		return jsonify({'success': False, 'error': 'Версия не найдена'}), 404
+	state_store.put(schedule_id, state)
+	return with_schedule_cookie(jsonify(dict(state, success=True, schedule_id=schedule_id)), schedule_id)
+
+@app.route('/api/teachers', methods=['GET'])
+def teachers_summary():
+	"""Учителя текущего расписания: часы в неделю, окна и свободные уроки в рабочие дни"""
+	state = current_state()
+	if not state:
+		return jsonify({'success': False, 'error': 'Расписание не найдено'}), 404
+	index = teacher_index(state)
+	return jsonify({'success': True, 'teachers': [{
+		'teacher': teacher,
+		'hours': index.hours(teacher, WEEK_DAYS),
+		'windows': index.windows(teacher),
+		'free_periods': index.free_periods(teacher, WEEK_DAYS)
+	} for teacher in index.teachers]})
+
+@app.route('/api/teachers/<path:teacher>', methods=['GET'])
+def teacher_timetable(teacher):
+	"""Расписание учителя по дням: уроки с классом, предметом и кабинетом"""
+	state = current_state()
+	if not state:
+		return jsonify({'success': False, 'error': 'Расписание не найдено'}), 404
+	index = teacher_index(state)
+	if teacher not in index:
+		return jsonify({'success': False, 'error': 'Учитель не найден'}), 404
+	return jsonify({
+		'success': True,
+		'teacher': teacher,
+		'days': index.timetable(teacher, WEEK_DAYS),
+		'hours': index.hours(teacher, WEEK_DAYS),
+		'windows': index.windows(teacher)
+	})
+
 @app.route('/api/export/xlsx', methods=['GET'])
 def export_xlsx():
 	"""Экспортировать в XLSX"""
-	if not last_schedule:
+	state = current_state()
+	if not state:
 		return abort(400)
 	try:
-		wb = export_to_excel(last_schedule, last_fitness, last_conflicts)
-		buffer = BytesIO()
-		wb.save(buffer)
-		buffer.seek(0)
-		return send_file(
-			buffer,
-			mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-			as_attachment=True,
-			download_name=f'расписание_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-		)
+		return export_response(state, 'xlsx', build_xlsx)
 	except Exception as e:
 		import traceback
 		print(traceback.format_exc())
@@ -673,41 +684,47 @@ def export_xlsx():
 @app.route('/api/export/pdf', methods=['GET'])
 def export_pdf():
 	"""Экспортировать в PDF"""
-	if not last_schedule:
+	state = current_state()
+	if not state:
 		return abort(400)
 	try:
-		buffer = export_to_pdf(last_schedule, last_fitness, last_conflicts)
-		return send_file(
-			buffer,
-			mimetype='application/pdf',
-			as_attachment=True,
-			download_name=f'расписание_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-		)
+		return export_response(state, 'pdf', build_pdf)
 	except Exception as e:
 		return jsonify({'error': str(e)}), 400
 
+@app.route('/api/export/pdf-zip', methods=['GET'])
+def export_pdf_zip_route():
+	"""Экспортировать ZIP: PDF каждого класса и учителя и общий PDF (рендеринг в пуле процессов)"""
+	state = current_state()
+	if not state:
+		return abort(400)
+	try:
+		return export_response(state, 'zip', build_zip)
+	except Exception as e:
+		import traceback
+		print(traceback.format_exc())
+		return jsonify({'error': str(e)}), 400
+
 @app.route('/api/export/json', methods=['GET'])
 def export_json():
 	"""Экспортировать в JSON"""
-	if not last_schedule:
+	state = current_state()
+	if not state:
 		return abort(400)
 	try:
-		buffer = BytesIO()
-		buffer.write(json.dumps(last_schedule, ensure_ascii=False, indent=2).encode('utf-8'))
-		buffer.seek(0)
-		return send_file(
-			buffer,
-			mimetype='application/json',
-			as_attachment=True,
-			download_name=f'расписание_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-		)
+		return export_response(state, 'json', build_json)
 	except Exception as e:
 		return jsonify({'error': str(e)}), 400
 
 @app.route('/api/health', methods=['GET'])
 def health():
 	"""Проверка здоровья"""
-	return jsonify({'status': 'healthy', 'schedule_ready': last_schedule is not None})
+	return jsonify({
+		'status': 'healthy',
+		'schedule_ready': current_state() is not None,
+		'result_cache': result_cache.stats() if result_cache is not None else None,
+		'export_cache': export_cache.stats() if export_cache is not None else None
+	})
 
 if __name__ == '__main__':
 	print("=" * 60)
@@ -715,9 +732,14 @@ if __name__ == '__main__':
 	print("=" * 60)
 	print("URL: http://localhost:5000")
 	print("API: http://localhost:5000/api/optimize")
+	print("Загрузка книги: POST /api/import (XLSX) -> problem_id для /api/optimize и /api/jobs")
+	print("Задачи: POST /api/jobs, GET/DELETE /api/jobs/<id>, SSE /api/jobs/<id>/events")
+	print("Версии: /api/schedules/<id>/versions[/<n>], откат: POST /api/schedules/<id>/rollback")
+	print("Учителя: /api/teachers, /api/teachers/<ФИО>")
 	print("Экспорт:")
 	print(" - XLSX: /api/export/xlsx")
 	print(" - PDF: /api/export/pdf")
+	print(" - PDF по классам и учителям (ZIP): /api/export/pdf-zip")
 	print(" - JSON: /api/export/json")
 	print("=" * 60)
 if __name__ == '__main__':
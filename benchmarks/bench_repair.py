@@ -0,0 +1,57 @@
+"""Ремонт конфликтов: табу-поиск против resolve_all_conflicts_powerful.
+
+    python benchmarks/bench_repair.py --classes 10 30 60
+"""
+import argparse
+import contextlib
+import copy
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.instances import generate_instance
+from genetic_algorithm import ScheduleBuilder
+
+
+def _run(data, schedule, method, seed, time_limit):
+    b = ScheduleBuilder(**data)
+    b.schedule = copy.deepcopy(schedule)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if method == 'tabu':
+            b.resolve_conflicts_tabu(time_limit=time_limit, rng=rng)
+        else:
+            b.resolve_all_conflicts_powerful(max_retries=10, rng=rng)
+    elapsed = time.perf_counter() - start
+    b.calculate_fitness()
+    return b, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--classes', type=int, nargs='+', default=[10, 30, 60])
+    parser.add_argument('--time-limit', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'классов':>8} {'метод':>9} {'было':>6} {'стало':>6} {'время, с':>9} {'ходов/с':>9} {'fitness':>9}")
+    for n_classes in args.classes:
+        data = generate_instance(n_classes, seed=args.seed)
+        builder = ScheduleBuilder(**data)
+        schedule = builder.build_schedule()
+        before = builder.conflicts['teacher_conflicts']
+
+        for method in ('powerful', 'tabu'):
+            b, elapsed = _run(data, schedule, method, args.seed, args.time_limit)
+            rate = f"{b.repair_stats['moves_per_sec']:.0f}" if method == 'tabu' else '-'
+            print(f"{n_classes:>8} {method:>9} {before:>6} {b.conflicts['teacher_conflicts']:>6} "
+                  f"{elapsed:>9.2f} {rate:>9} {b.fitness:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Поколений в секунду в зависимости от числа процессов GA.
+
+    python benchmarks/bench_workers.py --classes 60 --workers 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.instances import generate_instance
+from genetic_algorithm import GeneticAlgorithm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--classes', type=int, default=60)
+    parser.add_argument('--generations', type=int, default=30)
+    parser.add_argument('--evaluation', default='delta', choices=['delta', 'batch', 'full'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    data = generate_instance(args.classes, seed=args.seed)
+    print(f"Классов: {args.classes}, уроков: {sum(s['часов_в_неделю'] for s in data['subjects'])}, "
+          f"учителей: {len(data['teachers'])}, CPU: {os.cpu_count()}")
+    print(f"{'workers':>8} {'поколений':>10} {'время, с':>10} {'пок./с':>8} {'fitness':>10}")
+
+    for workers in args.workers:
+        ga = GeneticAlgorithm(**data, representation='array', evaluation=args.evaluation,
+                              workers=workers, seed=args.seed)
+        ga.generations = args.generations
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = ga.run()
+        stats = ga.stats
+        rate = stats['generations'] / stats['evolution_time']
+        print(f"{workers:>8} {stats['generations']:>10} {stats['evolution_time']:>10.2f} {rate:>8.2f} {result.fitness:>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Генератор синтетических школ для бенчмарков"""
+import random
+
+SUBJECTS = [
+    ('Русский язык', 4, 'Филология'),
+    ('Литература', 2, 'Филология'),
+    ('Английский язык', 3, 'Филология'),
+    ('Алгебра', 3, 'Математика'),
+    ('Геометрия', 2, 'Математика'),
+    ('Информатика', 1, 'Математика'),
+    ('Физика', 2, 'Естествознание'),
+    ('Химия', 2, 'Естествознание'),
+    ('Биология', 2, 'Естествознание'),
+    ('География', 2, 'Естествознание'),
+    ('История', 2, 'Обществознание'),
+    ('Обществознание', 1, 'Обществознание'),
+    ('Физкультура', 2, 'Физкультура'),
+    ('ОБЖ', 1, 'Физкультура'),
+]
+LETTERS = 'АБВГДЕЖЗИК'
+
+
+def generate_instance(n_classes, seed=0, max_teacher_load=24, shared_rooms=False):
+    """Школа из n_classes классов в формате листов Параллели/Предметы/Учителя/Кабинеты.
+
+    shared_rooms=True - у учителя один свой кабинет и до двух кабинетов коллег по предмету
+    (возможны конфликты кабинетов).
+    """
+    rng = random.Random(seed)
+    parallels = list(range(5, 12))
+    classes = []
+    for i in range(n_classes):
+        parallel = parallels[i % len(parallels)]
+        letter = LETTERS[i // len(parallels) % len(LETTERS)]
+        # После 70 классов (7 параллелей × 10 букв) буквы идут по кругу с номером: 5А2, 6А2, ...
+        cycle = i // (len(parallels) * len(LETTERS))
+        classes.append({'класс': f"{parallel}{letter}{cycle + 1 if cycle else ''}", 'параллель': parallel})
+
+    teachers = []
+    subjects = []
+    rooms = []
+    room_number = 100
+    for subj_name, hours, direction in SUBJECTS:
+        pool = []  # [ФИО, нагрузка]
+        subject_rooms = []
+        for cls in classes:
+            candidates = [t for t in pool if t[1] + hours <= max_teacher_load]
+            if not candidates:
+                fio = f"{subj_name[:4]}-{len(pool) + 1} {rng.choice('АБВГДЕЖИКЛМН')}.{rng.choice('АБВГДЕЖИКЛМН')}."
+                room_list = []
+                for _ in range(rng.randint(1, 2) if not shared_rooms else 1):
+                    room_number += 1
+                    room_list.append(str(room_number))
+                    rooms.append({'кабинет': str(room_number), 'вместимость': 30})
+                if shared_rooms and subject_rooms:
+                    room_list += rng.sample(subject_rooms, min(2, len(subject_rooms)))
+                subject_rooms.extend(r for r in room_list if r not in subject_rooms)
+                teachers.append({'ФИО': fio, 'предметы': subj_name, 'кабинеты': ';'.join(room_list)})
+                candidates = [[fio, 0]]
+                pool.append(candidates[0])
+            teacher = rng.choice(candidates)
+            teacher[1] += hours
+            subjects.append({
+                'предмет': subj_name,
+                'параллель': cls['класс'],
+                'часов_в_неделю': hours,
+                'учитель': teacher[0],
+                'направление': direction
+            })
+
+    return {'classes': classes, 'subjects': subjects, 'teachers': teachers, 'rooms': rooms}
@@ -0,0 +1,31 @@
+import multiprocessing
+
+
+class Cancelled(Exception):
+    """Прогон остановлен через CancellationToken"""
+
+
+class CancellationToken:
+    """Флаг кооперативной отмены, видимый из других процессов.
+
+    Флаг - байт в multiprocessing.RawArray: flags[index]. Общий массив
+    передается процессам при запуске (initializer пула, аргументы Process),
+    чтение - без блокировок, поэтому check() можно вызывать в каждой итерации.
+    Без flags токен заводит собственный массив из одного флага.
+    """
+
+    def __init__(self, flags=None, index=0):
+        self.flags = flags if flags is not None else multiprocessing.RawArray('b', 1)
+        self.index = index
+
+    def cancel(self):
+        self.flags[self.index] = 1
+
+    @property
+    def cancelled(self) -> bool:
+        return bool(self.flags[self.index])
+
+    def check(self):
+        """Бросает Cancelled, если отмена запрошена"""
+        if self.flags[self.index]:
+            raise Cancelled("Оптимизация отменена")
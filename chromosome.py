@@ -0,0 +1,272 @@
+import random
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from fitness import (
+    MIN_LESSONS_PER_DAY, ROOM_CONFLICT_PENALTY, SAME_ROOM_PENALTY, SHORT_DAY_PENALTY, TEACHER_CONFLICT_PENALTY,
+    VARIANCE_CAP_X10, missing_lessons, schedule_fitness, variance_penalty_x10
+)
+
+EMPTY = -1
+LESSON_FIELDS = ('предмет', 'учитель', 'кабинет', 'направление', 'коэффициент')
+NOT_COUNTED_TEACHERS = ('', None, 'Generic')
+NOT_COUNTED_ROOMS = ('', None, 'N/A')
+
+
+class ScheduleCodec:
+    """Целочисленное представление расписания: тензор int16 (класс × день × урок) с id уроков.
+
+    С problem (ProblemInstance) id классов, учителей и предметов берутся из
+    его таблиц; уроки (предмет, учитель, кабинет) интернируются по мере
+    кодирования, так как кабинеты назначаются уже при построении расписания.
+    """
+
+    def __init__(self, class_names, days, periods=8, problem=None):
+        self.class_names = list(class_names)
+        if problem is not None and tuple(self.class_names) == problem.class_names:
+            self.class_index = problem.class_ids
+        else:
+            self.class_index = {c: i for i, c in enumerate(self.class_names)}
+        self.days = list(days)
+        self.periods = periods
+
+        # Таблицы интернирования: id урока -> поля урока, учитель/предмет/кабинет -> id.
+        # Копии таблиц problem - учитель или предмет, добавленный правкой, не меняет общий объект
+        self.lessons = []
+        self._lesson_ids = {}
+        self.teachers = list(problem.teacher_names) if problem is not None else []
+        self._teacher_ids = dict(problem.teacher_ids) if problem is not None else {}
+        self.subjects = list(problem.subject_names) if problem is not None else []
+        self._subject_ids = dict(problem.subject_ids) if problem is not None else {}
+        self.rooms = []
+        self._room_ids = {}
+
+        self.teacher_of = np.full(1, EMPTY, dtype=np.int32)
+        self.subject_of = np.full(1, EMPTY, dtype=np.int32)
+        self.room_of = np.full(1, EMPTY, dtype=np.int32)
+        self.booked_room_of = np.full(1, EMPTY, dtype=np.int32)
+        self._tables_dirty = False
+
+    @classmethod
+    def from_schedule(cls, schedule: Dict, days, problem=None):
+        """Создает кодек по образцу расписания (порядок классов и длина дня)"""
+        longest = max(
+            (len(lessons) for c_sched in schedule.values() for lessons in c_sched.values()),
+            default=0
+        )
+        return cls(schedule.keys(), days, periods=max(8, longest), problem=problem)
+
+    @staticmethod
+    def _intern(value, table, ids):
+        if value not in ids:
+            ids[value] = len(table)
+            table.append(value)
+        return ids[value]
+
+    def lesson_id(self, lesson: Dict) -> int:
+        """Возвращает id урока, при необходимости добавляя его в таблицы"""
+        key = tuple(lesson.get(f) for f in LESSON_FIELDS)
+        lid = self._lesson_ids.get(key)
+        if lid is None:
+            lid = len(self.lessons)
+            if lid >= np.iinfo(np.int16).max:
+                raise ValueError("Слишком много различных уроков для int16 представления")
+            self._lesson_ids[key] = lid
+            self.lessons.append(key)
+            self._intern(key[1], self.teachers, self._teacher_ids)
+            self._intern(key[0], self.subjects, self._subject_ids)
+            self._intern(key[2], self.rooms, self._room_ids)
+            self._tables_dirty = True
+        return lid
+
+    def _refresh_tables(self):
+        """Перестраивает таблицы id урока -> учитель/предмет/кабинет.
+
+        Последний элемент каждой таблицы - заглушка для EMPTY (индекс -1).
+        Учителя и кабинеты, которые не участвуют в подсчете конфликтов (Generic,
+        кабинет не указан), получают EMPTY в teacher_of / booked_room_of.
+        """
+        n = len(self.lessons)
+        self.teacher_of = np.full(n + 1, EMPTY, dtype=np.int32)
+        self.subject_of = np.full(n + 1, EMPTY, dtype=np.int32)
+        self.room_of = np.full(n + 1, EMPTY, dtype=np.int32)
+        self.booked_room_of = np.full(n + 1, EMPTY, dtype=np.int32)
+        for lid, key in enumerate(self.lessons):
+            if key[1] not in NOT_COUNTED_TEACHERS:
+                self.teacher_of[lid] = self._teacher_ids[key[1]]
+            self.subject_of[lid] = self._subject_ids[key[0]]
+            self.room_of[lid] = self._room_ids[key[2]]
+            if key[2] not in NOT_COUNTED_ROOMS:
+                self.booked_room_of[lid] = self._room_ids[key[2]]
+        self._tables_dirty = False
+
+    def encode(self, schedule: Dict) -> np.ndarray:
+        """dict {класс: {день: [урок, ...]}} -> тензор id уроков"""
+        genes = np.full((len(self.class_names), len(self.days), self.periods), EMPTY, dtype=np.int16)
+        for c_name, c_sched in schedule.items():
+            ci = self.class_index[c_name]
+            for di, day in enumerate(self.days):
+                lessons = sorted(c_sched.get(day, []), key=lambda x: x.get('урок', 0))
+                if len(lessons) > self.periods:
+                    raise ValueError(f"В классе {c_name} ({day}) больше {self.periods} уроков")
+                for p, lesson in enumerate(lessons):
+                    genes[ci, di, p] = self.lesson_id(lesson)
+        if self._tables_dirty:
+            self._refresh_tables()
+        return genes
+
+    def decode(self, genes: np.ndarray) -> Dict:
+        """Тензор id уроков -> dict в формате ScheduleBuilder"""
+        schedule = {}
+        for ci, c_name in enumerate(self.class_names):
+            schedule[c_name] = {}
+            for di, day in enumerate(self.days):
+                final = []
+                for lid in genes[ci, di].tolist():
+                    if lid == EMPTY:
+                        break
+                    subj, teacher, room, direction, coef = self.lessons[lid]
+                    final.append({
+                        'урок': len(final) + 1,
+                        'предмет': subj,
+                        'учитель': teacher,
+                        'кабинет': room,
+                        'направление': direction,
+                        'коэффициент': coef
+                    })
+                schedule[c_name][day] = final
+        return schedule
+
+    def day_lengths(self, genes: np.ndarray) -> np.ndarray:
+        """Количество уроков по (класс, день); уроки в дне идут без пропусков"""
+        return (genes != EMPTY).sum(axis=-1)
+
+    def _count_slot_conflicts(self, resources: np.ndarray, n_resources: int) -> int:
+        """Число троек (день, урок, ресурс), где ресурс занят больше чем одним классом"""
+        day_idx, period_idx = np.nonzero(resources >= 0)[1:]
+        keys = (day_idx * self.periods + period_idx) * n_resources + resources[resources >= 0]
+        counts = np.bincount(keys)
+        return int((counts > 1).sum())
+
+    def count_teacher_conflicts(self, genes: np.ndarray) -> int:
+        """Число троек (день, урок, учитель), где учитель ведет больше одного класса"""
+        return self._count_slot_conflicts(self.teacher_of[genes], len(self.teachers))
+
+    def count_room_conflicts(self, genes: np.ndarray) -> int:
+        """Число троек (день, урок, кабинет), где в кабинете больше одного класса"""
+        return self._count_slot_conflicts(self.booked_room_of[genes], len(self.rooms))
+
+    def count_adjacent_same_room(self, genes: np.ndarray) -> int:
+        """Число пар соседних уроков класса в одном кабинете"""
+        rooms = self.room_of[genes]
+        same = (rooms[..., :-1] == rooms[..., 1:]) & (genes[..., 1:] != EMPTY)
+        return int(same.sum())
+
+    def evaluate(self, genes: np.ndarray) -> Tuple[float, Dict]:
+        """Fitness по той же формуле, что ScheduleBuilder.calculate_fitness"""
+        conflicts = {
+            'teacher_conflicts': 0,
+            'class_conflicts': 0,
+            'room_conflicts': 0,
+            'sanpin_violations': 0
+        }
+        conflicts['teacher_conflicts'] = self.count_teacher_conflicts(genes)
+        conflicts['room_conflicts'] = self.count_room_conflicts(genes)
+
+        lengths = self.day_lengths(genes).tolist()
+        variance = sum(variance_penalty_x10(lesson_counts) for lesson_counts in lengths)
+        missing = sum(missing_lessons(count) for lesson_counts in lengths for count in lesson_counts)
+
+        fitness = schedule_fitness(conflicts['teacher_conflicts'], self.count_adjacent_same_room(genes),
+                                   variance, missing, conflicts['room_conflicts'])
+        return fitness, conflicts
+
+    @staticmethod
+    def _batch_slot_conflicts(resources: np.ndarray, n_resources: int) -> np.ndarray:
+        """Конфликты ресурса для каждой особи тензора (особь × класс × день × урок)"""
+        n_ind, _, n_days, n_periods = resources.shape
+        n_resources = max(n_resources, 1)
+        valid = resources >= 0
+        ind_idx, _, day_idx, period_idx = np.nonzero(valid)
+        keys = ((ind_idx * n_days + day_idx) * n_periods + period_idx) * n_resources + resources[valid]
+        counts = np.bincount(keys, minlength=n_ind * n_days * n_periods * n_resources)
+        return (counts.reshape(n_ind, -1) > 1).sum(axis=1)
+
+    def evaluate_batch(self, population: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
+        """Fitness всей популяции за один проход NumPy.
+
+        population - тензор (особь × класс × день × урок). Результат совпадает
+        с evaluate() для каждой особи.
+        """
+        n_ind, _, n_days, _ = population.shape
+
+        # Конфликты учителей и кабинетов: bincount по id (особь, день, урок, ресурс)
+        teacher_conflicts = self._batch_slot_conflicts(self.teacher_of[population], len(self.teachers))
+        room_conflicts = self._batch_slot_conflicts(self.booked_room_of[population], len(self.rooms))
+
+        # Один кабинет на соседних уроках: сравнение со сдвигом
+        rooms = self.room_of[population]
+        same = (rooms[..., :-1] == rooms[..., 1:]) & (population[..., 1:] != EMPTY)
+        same_room_pairs = same.reshape(n_ind, -1).sum(axis=1)
+
+        # Неравномерность по дням и короткие дни: редукции по длинам дней
+        lengths = (population != EMPTY).sum(axis=-1).astype(np.int64)
+        totals = lengths.sum(axis=-1)
+        scaled = (n_days * (lengths ** 2).sum(axis=-1) - totals * totals) * 5 // n_days
+        variance_x10 = np.minimum(scaled, VARIANCE_CAP_X10).sum(axis=-1)
+        missing = np.maximum(MIN_LESSONS_PER_DAY - lengths, 0).reshape(n_ind, -1).sum(axis=1)
+
+        penalties_x10 = 10 * (teacher_conflicts.astype(np.int64) * TEACHER_CONFLICT_PENALTY
+                              + room_conflicts.astype(np.int64) * ROOM_CONFLICT_PENALTY
+                              + same_room_pairs * SAME_ROOM_PENALTY
+                              + missing * SHORT_DAY_PENALTY)
+        penalties_x10 += np.where(teacher_conflicts == 0, variance_x10, 0)
+        fitness = np.where(penalties_x10 == 0, 100.0, 100 / (1 + (penalties_x10 / 10000)))
+
+        conflicts = [
+            {
+                'teacher_conflicts': tc,
+                'class_conflicts': 0,
+                'room_conflicts': rc,
+                'sanpin_violations': 0
+            }
+            for tc, rc in zip(teacher_conflicts.tolist(), room_conflicts.tolist())
+        ]
+        return fitness, conflicts
+
+    def pick_crossover_days(self, rng=random) -> Tuple[int, int]:
+        """Случайный блок дней для Order Crossover"""
+        start_day = rng.randint(0, len(self.days) - 1)
+        end_day = rng.randint(start_day, len(self.days) - 1)
+        return start_day, end_day
+
+    def pick_swap(self, genes: np.ndarray, mutation_rate: float = 0.15, rng=random):
+        """Случайный обмен (класс, день, i, j) для swap mutation или None"""
+        if rng.random() > mutation_rate:
+            return None
+
+        ci = self.class_index[rng.choice(self.class_names)]
+        di = rng.choice(range(len(self.days)))
+        n = int((genes[ci, di] != EMPTY).sum())
+
+        if n >= 2:
+            i, j = rng.sample(range(n), 2)
+            return ci, di, i, j
+        return None
+
+    def crossover(self, parent1: np.ndarray, parent2: np.ndarray, rng=random) -> np.ndarray:
+        """Order Crossover: блок дней берется у второго родителя"""
+        start_day, end_day = self.pick_crossover_days(rng)
+        child = parent1.copy()
+        child[:, start_day:end_day + 1] = parent2[:, start_day:end_day + 1]
+        return child
+
+    def swap_mutation(self, genes: np.ndarray, mutation_rate: float = 0.15, rng=random) -> np.ndarray:
+        """Swap mutation: обмен двух уроков внутри одного дня класса"""
+        mutated = genes.copy()
+        move = self.pick_swap(mutated, mutation_rate, rng)
+        if move:
+            ci, di, i, j = move
+            mutated[ci, di, i], mutated[ci, di, j] = mutated[ci, di, j], mutated[ci, di, i]
+        return mutated
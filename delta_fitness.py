@@ -0,0 +1,221 @@
+from typing import Dict
+
+import numpy as np
+
+from chromosome import EMPTY
+from fitness import missing_lessons, penalty_x10, schedule_fitness, variance_penalty_x10
+from zobrist import cell_key, fingerprint
+
+
+class IncrementalFitness:
+    """Fitness тензорной особи с частичными суммами по компонентам.
+
+    Ходы (обмен уроков в дне, обмен между днями, перенос урока, замена дней при
+    кроссовере) обновляют только затронутые ячейки и занятость учителей/кабинетов. recompute() - полный пересчет,
+    verify() сверяет частичные суммы с ним. hash - Zobrist-хеш генов (zobrist.py), обновляется теми же ходами.
+    """
+
+    # Поля состояния без кодека (state/from_state): движок передается в другой процесс без пересчета
+    STATE_FIELDS = ('genes', 'teacher_load', 'teacher_conflicts', 'clashes', 'room_load', 'room_conflicts',
+                    'same_room', 'same_room_total', 'lengths', 'variance_x10', 'variance_total', 'missing_total',
+                    'hash')
+
+    def __init__(self, codec, genes: np.ndarray, recompute=True):
+        self.codec = codec
+        self.genes = genes
+        if recompute:
+            self.recompute()
+
+    def clone(self):
+        other = IncrementalFitness(self.codec, self.genes.copy(), recompute=False)
+        other.teacher_load = self.teacher_load.copy()
+        other.teacher_conflicts = self.teacher_conflicts
+        other.clashes = set(self.clashes)
+        other.room_load = self.room_load.copy()
+        other.room_conflicts = self.room_conflicts
+        other.same_room = self.same_room.copy()
+        other.same_room_total = self.same_room_total
+        other.lengths = self.lengths.copy()
+        other.variance_x10 = self.variance_x10.copy()
+        other.variance_total = self.variance_total
+        other.missing_total = self.missing_total
+        other.hash = self.hash
+        return other
+
+    def state(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.STATE_FIELDS)
+
+    @classmethod
+    def from_state(cls, codec, state):
+        """Движок из state() с тем же кодеком (в процессе-воркере - его копия кодека)"""
+        engine = cls(codec, state[0], recompute=False)
+        for name, value in zip(cls.STATE_FIELDS[1:], state[1:]):
+            setattr(engine, name, value)
+        return engine
+
+    def recompute(self):
+        """Полный пересчет всех компонент"""
+        codec = self.codec
+        genes = self.genes
+        _, n_days, n_periods = genes.shape
+
+        teachers = codec.teacher_of[genes]
+        ci, di, pi = np.nonzero(teachers >= 0)
+        self.teacher_load = np.zeros((max(len(codec.teachers), 1), n_days, n_periods), dtype=np.int16)
+        np.add.at(self.teacher_load, (teachers[ci, di, pi], di, pi), 1)
+        self.teacher_conflicts = int((self.teacher_load > 1).sum())
+        # Живое множество конфликтов (учитель, день, урок)
+        self.clashes = set(map(tuple, np.argwhere(self.teacher_load > 1).tolist()))
+
+        booked = codec.booked_room_of[genes]
+        ci, di, pi = np.nonzero(booked >= 0)
+        self.room_load = np.zeros((max(len(codec.rooms), 1), n_days, n_periods), dtype=np.int16)
+        np.add.at(self.room_load, (booked[ci, di, pi], di, pi), 1)
+        self.room_conflicts = int((self.room_load > 1).sum())
+
+        rooms = codec.room_of[genes]
+        same = (rooms[..., :-1] == rooms[..., 1:]) & (genes[..., 1:] != EMPTY)
+        self.same_room = same.sum(axis=-1).astype(np.int32)
+        self.same_room_total = int(self.same_room.sum())
+
+        self.lengths = codec.day_lengths(genes).astype(np.int32)
+        self.variance_x10 = np.array(
+            [variance_penalty_x10(row) for row in self.lengths.tolist()], dtype=np.int32
+        )
+        self.variance_total = int(self.variance_x10.sum())
+        self.missing_total = sum(missing_lessons(n) for n in self.lengths.ravel().tolist())
+        self.hash = fingerprint(genes)
+
+    @property
+    def fitness(self) -> float:
+        return schedule_fitness(self.teacher_conflicts, self.same_room_total,
+                                self.variance_total, self.missing_total, self.room_conflicts)
+
+    @property
+    def penalty(self) -> int:
+        """Штраф x10, монотонно связанный с fitness (энергия для отжига)"""
+        return penalty_x10(self.teacher_conflicts, self.same_room_total,
+                           self.variance_total, self.missing_total, self.room_conflicts)
+
+    @property
+    def conflicts(self) -> Dict:
+        return {
+            'teacher_conflicts': self.teacher_conflicts,
+            'class_conflicts': 0,
+            'room_conflicts': self.room_conflicts,
+            'sanpin_violations': 0
+        }
+
+    def verify(self) -> bool:
+        """Сверяет частичные суммы с полным пересчетом"""
+        check = IncrementalFitness(self.codec, self.genes)
+        return check.clashes == self.clashes and check.hash == self.hash and \
+            (check.teacher_conflicts, check.room_conflicts, check.same_room_total, check.variance_total,
+             check.missing_total) == \
+            (self.teacher_conflicts, self.room_conflicts, self.same_room_total, self.variance_total,
+             self.missing_total)
+
+    def _set_cell(self, c, d, p, lid):
+        """Ставит урок lid в ячейку и обновляет занятость учителей и кабинетов"""
+        teacher_of = self.codec.teacher_of
+        booked_room_of = self.codec.booked_room_of
+        old = int(self.genes[c, d, p])
+        if old == lid:
+            return
+        _, n_days, n_periods = self.genes.shape
+        index = (c * n_days + d) * n_periods + p
+        self.hash ^= cell_key(index, old) ^ cell_key(index, lid)
+        t = teacher_of[old]
+        if t >= 0:
+            self.teacher_load[t, d, p] -= 1
+            if self.teacher_load[t, d, p] == 1:
+                self.teacher_conflicts -= 1
+                self.clashes.discard((t, d, p))
+        t = teacher_of[lid]
+        if t >= 0:
+            self.teacher_load[t, d, p] += 1
+            if self.teacher_load[t, d, p] == 2:
+                self.teacher_conflicts += 1
+                self.clashes.add((t, d, p))
+        r = booked_room_of[old]
+        if r >= 0:
+            self.room_load[r, d, p] -= 1
+            if self.room_load[r, d, p] == 1:
+                self.room_conflicts -= 1
+        r = booked_room_of[lid]
+        if r >= 0:
+            self.room_load[r, d, p] += 1
+            if self.room_load[r, d, p] == 2:
+                self.room_conflicts += 1
+        self.genes[c, d, p] = lid
+
+    def _refresh_row(self, c, d):
+        """Пересчитывает кабинеты подряд и длину дня для строки класс-день"""
+        row = self.genes[c, d].tolist()
+        room_of = self.codec.room_of
+        n = 0
+        same = 0
+        prev_room = None
+        for lid in row:
+            if lid == EMPTY:
+                break
+            room = room_of[lid]
+            if n > 0 and room == prev_room:
+                same += 1
+            prev_room = room
+            n += 1
+
+        self.same_room_total += same - int(self.same_room[c, d])
+        self.same_room[c, d] = same
+
+        old_n = int(self.lengths[c, d])
+        if n != old_n:
+            self.lengths[c, d] = n
+            self.missing_total += missing_lessons(n) - missing_lessons(old_n)
+            new_var = variance_penalty_x10(self.lengths[c].tolist())
+            self.variance_total += new_var - int(self.variance_x10[c])
+            self.variance_x10[c] = new_var
+
+    def set_row(self, c, d, row):
+        """Заменяет строку класс-день, трогая только отличающиеся ячейки"""
+        for p in np.nonzero(self.genes[c, d] != row)[0].tolist():
+            self._set_cell(c, d, p, int(row[p]))
+        self._refresh_row(c, d)
+
+    def swap(self, c, d, i, j):
+        """Обмен двух уроков внутри дня класса"""
+        a, b = int(self.genes[c, d, i]), int(self.genes[c, d, j])
+        self._set_cell(c, d, i, b)
+        self._set_cell(c, d, j, a)
+        self._refresh_row(c, d)
+
+    def swap_days(self, c, d1, i, d2, j):
+        """Обмен уроков класса между двумя днями (длины дней не меняются)"""
+        a, b = int(self.genes[c, d1, i]), int(self.genes[c, d2, j])
+        self._set_cell(c, d1, i, b)
+        self._set_cell(c, d2, j, a)
+        self._refresh_row(c, d1)
+        self._refresh_row(c, d2)
+
+    def move(self, c, d1, i, d2):
+        """Перенос урока в конец другого дня класса со сдвигом оставшихся уроков"""
+        n1 = int(self.lengths[c, d1])
+        n2 = int(self.lengths[c, d2])
+        if d1 == d2 or i >= n1 or n2 >= self.genes.shape[2]:
+            return False
+        lid = int(self.genes[c, d1, i])
+        for p in range(i, n1 - 1):
+            self._set_cell(c, d1, p, int(self.genes[c, d1, p + 1]))
+        self._set_cell(c, d1, n1 - 1, EMPTY)
+        self._set_cell(c, d2, n2, lid)
+        self._refresh_row(c, d1)
+        self._refresh_row(c, d2)
+        return True
+
+    def copy_days_from(self, other_genes: np.ndarray, start_day, end_day):
+        """Кроссовер: дни start_day..end_day берутся из другой особи"""
+        block = slice(start_day, end_day + 1)
+        differ = np.any(self.genes[:, block] != other_genes[:, block], axis=-1)
+        for c, d in zip(*np.nonzero(differ)):
+            d = int(d) + start_day
+            self.set_row(int(c), d, other_genes[c, d])
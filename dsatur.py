@@ -0,0 +1,232 @@
+import heapq
+import random
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from chromosome import NOT_COUNTED_TEACHERS
+from problem import MAX_PERIODS, ProblemInstance
+
+
+class DSaturPlacer:
+    """Построение расписания раскраской графа конфликтов (DSatur).
+
+    Вершины - уроки, цвета - слоты (день, позиция) класса. Слоты класса заданы
+    квотами problem.class_quotas и идут подряд с первого урока, поэтому дни
+    получаются без окон. Уроки одного класса и уроки одного учителя в разных
+    классах смежны. Уроки класса с одним учителем взаимозаменяемы и образуют
+    группу (класс, учитель) с общим множеством допустимых слотов, размер
+    которого поддерживается инкрементально.
+
+    На каждом шаге берется группа с наименьшим запасом (допустимых слотов минус
+    оставшихся уроков), при равенстве - с более загруженным учителем, затем
+    случайно (приоритет группы разыгрывается один раз). Если допустимых слотов нет, ограниченный откат пробует перенести
+    урок, занявший учителя, в другой слот его класса; если и это не удалось,
+    урок ставится с конфликтом.
+
+    В дне не больше MAX_PERIODS слотов, как у жадного построителя: уроки
+    сверх квоты, для которых у класса не осталось слотов, не ставятся
+    (счетчик dropped).
+    """
+
+    def __init__(self, problem: ProblemInstance, rng=random, max_backtracks=500):
+        self.problem = problem
+        self.rng = rng
+        self.max_backtracks = max_backtracks
+        self.backtracks = 0
+        self.forced = 0
+        self.dropped = 0
+
+        days = problem.days
+        self.class_names = tuple(dict.fromkeys(problem.class_names))
+        # Слотов в дне - квота, но не больше MAX_PERIODS (индексы занятости учитывают уроки 1-8)
+        self.day_slots = {c: {day: min(problem.class_quotas[c][day], MAX_PERIODS) for day in days}
+                          for c in self.class_names}
+        # Свободные слоты класса и занятость учителей: слот -> число уроков
+        self.free = {
+            c: {(di, p) for di, day in enumerate(days) for p in range(self.day_slots[c][day])}
+            for c in self.class_names
+        }
+        self.busy = defaultdict(lambda: defaultdict(int))
+        self.placed = {c: {} for c in self.class_names}
+        self.teacher_at = defaultdict(set)
+        self.subject_days = defaultdict(set)
+
+        self.remaining = defaultdict(list)
+        self.groups_of_class = defaultdict(list)
+        self.groups_of_teacher = defaultdict(list)
+        teacher_load = defaultdict(int)
+        for c in self.class_names:
+            for lesson in problem.class_lessons[c]:
+                t = self._teacher(lesson)
+                group = (c, t)
+                if group not in self.remaining:
+                    self.groups_of_class[c].append(group)
+                    if t is not None:
+                        self.groups_of_teacher[t].append(group)
+                self.remaining[group].append(lesson)
+                teacher_load[t] += 1
+        self.degree = {group: teacher_load[group[1]] if group[1] is not None else 0 for group in self.remaining}
+        self.domain = {group: len(self.free[group[0]]) for group in self.remaining}
+
+        # Очередь групп по (запас, -нагрузка учителя, случайный приоритет); устаревшие
+        # записи пропускаются при извлечении
+        self.priority = {group: rng.random() for group in self.remaining}
+        self.queue = []
+        for group in self.remaining:
+            self._changed(group)
+
+    def _changed(self, group):
+        lessons = self.remaining[group]
+        if lessons:
+            slack = self.domain[group] - len(lessons)
+            heapq.heappush(self.queue, (slack, -self.degree[group], self.priority[group], group))
+
+    @staticmethod
+    def _teacher(lesson):
+        t = lesson.get('учитель')
+        return None if t in NOT_COUNTED_TEACHERS else t
+
+    def _is_free_for(self, group, slot) -> bool:
+        c, t = group
+        return slot in self.free[c] and (t is None or not self.busy[t][slot])
+
+    def _occupy(self, c, t, slot):
+        self.free[c].discard(slot)
+        for group in self.groups_of_class[c]:
+            if group[1] is None or not self.busy[group[1]][slot]:
+                self.domain[group] -= 1
+                self._changed(group)
+        if t is not None:
+            self.busy[t][slot] += 1
+            self.teacher_at[(t, slot)].add(c)
+            if self.busy[t][slot] == 1:
+                for group in self.groups_of_teacher[t]:
+                    if group[0] != c and slot in self.free[group[0]]:
+                        self.domain[group] -= 1
+                        self._changed(group)
+
+    def _release(self, c, t, slot):
+        if t is not None:
+            self.busy[t][slot] -= 1
+            self.teacher_at[(t, slot)].discard(c)
+            if self.busy[t][slot] == 0:
+                for group in self.groups_of_teacher[t]:
+                    if group[0] != c and slot in self.free[group[0]]:
+                        self.domain[group] += 1
+                        self._changed(group)
+        self.free[c].add(slot)
+        for group in self.groups_of_class[c]:
+            if group[1] is None or not self.busy[group[1]][slot]:
+                self.domain[group] += 1
+                self._changed(group)
+
+    def _place(self, c, t, slot, lesson):
+        self._occupy(c, t, slot)
+        self.placed[c][slot] = lesson
+        self.subject_days[c].add((lesson['предмет'], slot[0]))
+
+    def _unplace(self, c, slot):
+        lesson = self.placed[c].pop(slot)
+        self._release(c, self._teacher(lesson), slot)
+        self.subject_days[c].discard((lesson['предмет'], slot[0]))
+        return lesson
+
+    def _slot_score(self, group, slot):
+        """Меньше - лучше: повтор предмета в дне, затем сколько групп теряют слот"""
+        c, t = group
+        repeats = all((l['предмет'], slot[0]) in self.subject_days[c] for l in self.remaining[group])
+        lost = sum(1 for g in self.groups_of_class[c] if g != group and self._is_free_for(g, slot))
+        if t is not None:
+            lost += sum(1 for g in self.groups_of_teacher[t] if g[0] != c and slot in self.free[g[0]])
+        return repeats, lost, self.rng.random()
+
+    def _pick_lesson(self, group, slot):
+        """Урок группы, предмета которого еще нет в этом дне класса"""
+        c = group[0]
+        lessons = self.remaining[group]
+        for i, lesson in enumerate(lessons):
+            if (lesson['предмет'], slot[0]) not in self.subject_days[c]:
+                return lessons.pop(i)
+        return lessons.pop(0)
+
+    def _backtrack(self, group):
+        """Освобождает слот для группы: урок другого класса с тем же учителем
+        переносится в свободный слот своего класса или меняется местами с уроком,
+        учитель которого свободен в освобождаемом слоте"""
+        c, t = group
+        if t is None or self.backtracks >= self.max_backtracks:
+            return None
+        slots = sorted(self.free[c])
+        self.rng.shuffle(slots)
+        for slot in slots:
+            blockers = self.teacher_at[(t, slot)]
+            if len(blockers) != 1:
+                continue
+            other = next(iter(blockers))
+            targets = [s for s in self.free[other] if not self.busy[t][s]]
+            if targets:
+                self.backtracks += 1
+                lesson = self._unplace(other, slot)
+                self._place(other, t, self.rng.choice(targets), lesson)
+                return slot
+
+            swaps = []
+            for target, lesson in self.placed[other].items():
+                t2 = self._teacher(lesson)
+                if target != slot and not self.busy[t][target] and (t2 is None or not self.busy[t2][slot]):
+                    swaps.append(target)
+            if swaps:
+                self.backtracks += 1
+                target = self.rng.choice(sorted(swaps))
+                moved = self._unplace(other, slot)
+                lesson = self._unplace(other, target)
+                self._place(other, self._teacher(lesson), slot, lesson)
+                self._place(other, t, target, moved)
+                return slot
+        return None
+
+    def run(self) -> Dict[str, Dict[str, List[Dict]]]:
+        """Раскраска; возвращает {класс: {день: [шаблон урока, ...]}} по порядку уроков"""
+        rng = self.rng
+        while self.queue:
+            slack, _, _, group = heapq.heappop(self.queue)
+            lessons = self.remaining[group]
+            if not lessons or slack != self.domain[group] - len(lessons):
+                continue
+            c, t = group
+
+            if not self.free[c]:
+                # Все слоты класса заняты - урок сверх MAX_PERIODS в день не ставится
+                self.dropped += 1
+                lessons.pop()
+                self._changed(group)
+                continue
+
+            if self.domain[group] > 0:
+                candidates = [s for s in self.free[c] if t is None or not self.busy[t][s]]
+                slot = min(candidates, key=lambda s: self._slot_score(group, s))
+            else:
+                slot = self._backtrack(group)
+                if slot is None:
+                    # Допустимых слотов нет - урок ставится с конфликтом учителя
+                    self.forced += 1
+                    slot = min(self.free[c], key=lambda s: (self.busy[t][s], rng.random()))
+
+            self._place(c, t, slot, self._pick_lesson(group, slot))
+            self._changed(group)
+
+        days = self.problem.days
+        return {
+            c: {day: [self.placed[c][(di, p)] for p in range(self.day_slots[c][day])]
+                for di, day in enumerate(days)}
+            for c in self.class_names
+        }
+
+
+def dsatur_schedule(problem: ProblemInstance, rng=random, max_backtracks=500) -> Tuple[Dict, Dict]:
+    """Шаблоны уроков по слотам и статистика построения DSatur"""
+    placer = DSaturPlacer(problem, rng=rng, max_backtracks=max_backtracks)
+    grid = placer.run()
+    if placer.dropped:
+        print(f"⚠️ DSatur: {placer.dropped} урок(ов) не поместились в {MAX_PERIODS} уроков в день")
+    return grid, {'backtracks': placer.backtracks, 'forced': placer.forced, 'dropped': placer.dropped}
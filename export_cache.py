@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from result_cache import disk_entries, evict_oldest
+
+
+class ExportCache:
+    """Готовые файлы экспорта (XLSX, PDF, JSON) по ключу (schedule_id, версия, формат).
+
+    Версия расписания не меняется после сохранения, поэтому запись не
+    устаревает: /api/update создает новую версию и тем самым новый ключ.
+    Хранятся байты файла и strong ETag - SHA-256 содержимого. Память - LRU
+    на max_bytes; с directory файлы дополнительно пишутся на диск (LRU по
+    mtime на disk_max_bytes) и переживают перезапуск и вытеснение из памяти.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, directory=None, disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        # schedule_id приходит от клиента - в имя файла идет только хеш ключа
+        name = hashlib.sha256('\0'.join(map(str, key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{name}.export')
+
+    def get(self, key) -> Optional[Tuple[str, bytes]]:
+        """(etag, данные) или None"""
+        with self.lock:
+            artifact = self.entries.get(key)
+            if artifact is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return artifact
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                pass
+            else:
+                artifact = self._remember(key, data)
+                with self.lock:
+                    self.hits += 1
+                return artifact
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data: bytes) -> Tuple[str, bytes]:
+        """Сохраняет файл и возвращает (etag, данные)"""
+        artifact = self._remember(key, data)
+        if self.directory:
+            path = self._path(key)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                evict_oldest(self.directory, self.disk_max_bytes, '.export')
+            except OSError as e:
+                print(f"⚠️ Кэш экспорта: запись на диск не удалась ({e})")
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return artifact
+
+    def _remember(self, key, data):
+        artifact = (hashlib.sha256(data).hexdigest(), data)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            # Файл больше всей памяти кэша не вытесняет остальные
+            if len(data) <= self.max_bytes:
+                self.entries[key] = artifact
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return artifact
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        with self.lock:
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes
+            }
+        if self.directory:
+            files = disk_entries(self.directory, '.export')
+            stats['disk_entries'] = len(files)
+            stats['disk_bytes'] = sum(size for _, size, _ in files)
+        return stats
+
+
+def make_export_cache(max_mb=None, directory=None, disk_max_mb=None) -> Optional[ExportCache]:
+    """Кэш по EXPORT_CACHE_MB (память, 0 - без кэша), EXPORT_CACHE_DIR и EXPORT_CACHE_DISK_MB (диск)"""
+    if max_mb is None:
+        max_mb = float(os.environ.get('EXPORT_CACHE_MB', 64))
+    if max_mb <= 0:
+        return None
+    directory = directory or os.environ.get('EXPORT_CACHE_DIR') or None
+    if disk_max_mb is None:
+        disk_max_mb = float(os.environ.get('EXPORT_CACHE_DISK_MB', 512))
+    return ExportCache(int(max_mb * 1024 * 1024), directory, int(disk_max_mb * 1024 * 1024))
@@ -0,0 +1,50 @@
+from typing import List
+
+TEACHER_CONFLICT_PENALTY = 500000
+ROOM_CONFLICT_PENALTY = 50000
+SAME_ROOM_PENALTY = 5
+SHORT_DAY_PENALTY = 100
+MIN_LESSONS_PER_DAY = 4
+VARIANCE_CAP_X10 = 100
+
+
+def variance_penalty_x10(lesson_counts: List[int]) -> int:
+    """Штраф за неравномерность нагрузки класса по дням, умноженный на 10.
+
+    min(variance * 0.5, 10), где variance = sum((n - avg)^2) = sum(n^2) - total^2 / days;
+    для 5 дней это целое min(5 * sum(n^2) - total^2, 100).
+    """
+    days = len(lesson_counts)
+    total = sum(lesson_counts)
+    scaled = (days * sum(n * n for n in lesson_counts) - total * total) * 5 // days
+    return min(scaled, VARIANCE_CAP_X10)
+
+
+def missing_lessons(count: int) -> int:
+    """Сколько уроков не хватает до минимума в день"""
+    return max(0, MIN_LESSONS_PER_DAY - count)
+
+
+def penalty_x10(teacher_conflicts: int, same_room_pairs: int, variance_x10: int, missing: int,
+                room_conflicts: int) -> int:
+    """Суммарный штраф, умноженный на 10 (целый; чем меньше, тем выше fitness)"""
+    penalties_x10 = 10 * (teacher_conflicts * TEACHER_CONFLICT_PENALTY
+                          + room_conflicts * ROOM_CONFLICT_PENALTY
+                          + same_room_pairs * SAME_ROOM_PENALTY
+                          + missing * SHORT_DAY_PENALTY)
+    if teacher_conflicts == 0:
+        penalties_x10 += variance_x10
+    return penalties_x10
+
+
+def schedule_fitness(teacher_conflicts: int, same_room_pairs: int, variance_x10: int, missing: int,
+                     room_conflicts: int) -> float:
+    """Итоговый fitness по компонентам штрафа.
+
+    Компоненты целые, поэтому полный пересчет и инкрементальное обновление дают
+    один и тот же результат вплоть до бита.
+    """
+    penalties_x10 = penalty_x10(teacher_conflicts, same_room_pairs, variance_x10, missing, room_conflicts)
+    if penalties_x10 == 0:
+        return 100.0
+    return 100 / (1 + (penalties_x10 / 10000))
@@ -0,0 +1,88 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Tuple
+
+from zobrist import row_fingerprint
+
+
+def freeze_lesson(lesson):
+    """Урок только для чтения"""
+    if isinstance(lesson, MappingProxyType):
+        return lesson
+    return MappingProxyType(dict(lesson))
+
+
+def renumber_row(row) -> tuple:
+    """Проставляет 'урок' по позиции; новые объекты создаются только для сдвинутых уроков"""
+    return tuple(
+        lesson if lesson.get('урок') == idx else MappingProxyType({**lesson, 'урок': idx})
+        for idx, lesson in enumerate(row, 1)
+    )
+
+
+class FrozenSchedule(Mapping):
+    """Неизменяемое расписание {класс: {день: (урок, ...)}} со структурным разделением.
+
+    Строки класс-день - кортежи уроков только для чтения, поэтому их можно
+    разделять между особями. Новая версия расписания (with_rows) копирует
+    ссылки и создает только измененные строки. Читается как обычный dict
+    (items, get, len), для изменения на месте - thaw(). fingerprint() -
+    Zobrist-хеш: считается один раз, новые версии пересчитывают только
+    замененные строки.
+    """
+
+    __slots__ = ('_classes', '_hash')
+
+    def __init__(self, classes: Dict[str, Dict[str, tuple]], fingerprint=None):
+        self._classes = classes
+        self._hash = fingerprint
+
+    @classmethod
+    def from_dict(cls, schedule) -> 'FrozenSchedule':
+        if isinstance(schedule, FrozenSchedule):
+            return schedule
+        return cls({
+            c_name: {day: tuple(freeze_lesson(l) for l in lessons) for day, lessons in c_sched.items()}
+            for c_name, c_sched in schedule.items()
+        })
+
+    def __getitem__(self, cls):
+        return MappingProxyType(self._classes[cls])
+
+    def __iter__(self):
+        return iter(self._classes)
+
+    def __len__(self):
+        return len(self._classes)
+
+    def row(self, cls, day) -> tuple:
+        return self._classes[cls].get(day, ())
+
+    def with_rows(self, rows: Dict[Tuple[str, str], tuple]) -> 'FrozenSchedule':
+        """Новая версия с замененными строками (класс, день); остальное разделяется"""
+        classes = dict(self._classes)
+        h = self._hash
+        for (cls, day), row in rows.items():
+            if classes[cls] is self._classes[cls]:
+                classes[cls] = dict(classes[cls])
+            if h is not None:
+                h ^= row_fingerprint(cls, day, classes[cls].get(day, ())) ^ row_fingerprint(cls, day, row)
+            classes[cls][day] = row
+        return FrozenSchedule(classes, h)
+
+    def fingerprint(self) -> int:
+        """Zobrist-хеш расписания: XOR хешей строк класс-день"""
+        if self._hash is None:
+            h = 0
+            for cls, days in self._classes.items():
+                for day, row in days.items():
+                    h ^= row_fingerprint(cls, day, row)
+            self._hash = h
+        return self._hash
+
+    def thaw(self) -> Dict:
+        """Изменяемая глубокая копия в формате ScheduleBuilder"""
+        return {
+            c_name: {day: [dict(l) for l in row] for day, row in days.items()}
+            for c_name, days in self._classes.items()
+        }
@@ -1,21 +1,40 @@
 import random
 import copy
+import time
 from typing import Dict, List, Set, Tuple
 import math
 from collections import defaultdict
 
+import numpy as np
+
+from chromosome import ScheduleCodec
+from dsatur import dsatur_schedule
+from delta_fitness import IncrementalFitness
+from fitness import missing_lessons, schedule_fitness, variance_penalty_x10
+from frozen_schedule import FrozenSchedule, renumber_row
+from occupancy import RoomOccupancy, TeacherOccupancy
+from problem import DAYS, ProblemInstance, compile_problem
+from rooms import assign_rooms
+from islands import run_islands
+from local_search import repair_schedule
+from parallel_ga import OffspringPool, child_rng
+from progress import ProgressReporter
+from zobrist import FitnessCache, fingerprint
+
 # from sanpin import enrich_subject_data
 
 
 class ScheduleBuilder:
     """Конструктор с 8-м периодом и гарантированным разрешением конфликтов"""
 
-    def __init__(self, classes, subjects, teachers, rooms):
+    def __init__(self, classes, subjects, teachers, rooms, problem: ProblemInstance = None):
         self.classes = classes
         self.subjects = subjects
         self.teachers = teachers
         self.rooms = rooms
-        self.days = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница']
+        # Скомпилированная задача (problem.py); без нее компилируется при построении
+        self.problem = problem
+        self.days = list(problem.days) if problem else list(DAYS)
         self.schedule = {}
         self.conflicts = {
             'teacher_conflicts': 0,
@@ -24,9 +43,46 @@ class ScheduleBuilder:
             'sanpin_violations': 0
         }
         self.fitness = 0
-        self.teacher_rooms = self._build_teacher_rooms_map()
+        self.repair_stats = {}
+        self.construction_stats = {}
+        # progress_callback(dict) - прогресс ремонта; прореживать вызовы - дело вызывающего (ProgressReporter)
+        self.progress_callback = None
+        # CancellationToken: ремонт проверяет его на каждой итерации
+        self.cancel_token = None
+        self.teacher_rooms = problem.teacher_rooms if problem else self._build_teacher_rooms_map()
         self.room_usage_counter = defaultdict(int)
 
+    @property
+    def schedule(self) -> Dict:
+        return self._schedule
+
+    @schedule.setter
+    def schedule(self, value: Dict):
+        # Новое расписание - индексы занятости строятся заново при первом запросе
+        self._schedule = value
+        self._occupancy = None
+        self._room_occupancy = None
+
+    @property
+    def occupancy(self) -> TeacherOccupancy:
+        """Индекс занятости учителей; при изменении дня класса на месте - _touch(cls, day)"""
+        if self._occupancy is None:
+            self._occupancy = TeacherOccupancy(self._schedule, self.days)
+        return self._occupancy
+
+    @property
+    def room_occupancy(self) -> RoomOccupancy:
+        """Индекс занятости кабинетов (день × урок)"""
+        if self._room_occupancy is None:
+            self._room_occupancy = RoomOccupancy(self._schedule, self.days)
+        return self._room_occupancy
+
+    def _touch(self, cls, day):
+        """Сообщает индексам, что день класса изменился"""
+        for index in (self._occupancy, self._room_occupancy):
+            if index is not None:
+                index.update_row(cls, day, self._schedule[cls].get(day, []))
+
     def _build_teacher_rooms_map(self):
         """Строим словарь: учитель -> список доступных кабинетов"""
         teacher_rooms = {}
@@ -47,74 +103,29 @@ class ScheduleBuilder:
             if not subj.get('часов_в_неделю'):
                 subj['часов_в_неделю'] = 1
 
-    def build_schedule(self) -> Dict:
-        """Построение расписания с 8-м периодом"""
-        self.validate_data()
+    def build_schedule(self, construction='greedy', rng=random) -> Dict:
+        """Построение расписания с 8-м периодом ('greedy' - по классам, 'dsatur' - раскраской графа)"""
+        if construction not in ('greedy', 'dsatur'):
+            raise ValueError(f"Неизвестный способ построения: {construction}")
+        if self.problem is None:
+            self.validate_data()
+            self.problem = compile_problem(self.classes, self.subjects, self.teachers, self.rooms, self.days)
         self.schedule = {}
         self.room_usage_counter = defaultdict(int)
+        if construction == 'dsatur':
+            return self._build_schedule_dsatur(rng)
 
-        class_lessons_pool = {}
-        class_quotas = {}
-        parallels_map = defaultdict(list)
-
-        for c in self.classes:
-            parallels_map[str(c.get('параллель'))].append(c.get('класс'))
-
-        for p in parallels_map:
-            parallels_map[p].sort()
-
-        distributed_subjects = defaultdict(list)
-
-        for p_key, classes_list in parallels_map.items():
-            p_subjects = [s for s in self.subjects if str(s.get('параллель')) == p_key]
-            grouped_by_name = defaultdict(list)
-            for s in p_subjects:
-                grouped_by_name[s['предмет']].append(s)
-
-            for subj_name, variants in grouped_by_name.items():
-                if len(variants) >= len(classes_list):
-                    for i, cls_name in enumerate(classes_list):
-                        my_variant = variants[i % len(variants)]
-                        distributed_subjects[cls_name].append(my_variant)
-                else:
-                    for cls_name in classes_list:
-                        distributed_subjects[cls_name].append(variants[0])
-
-        for c in self.classes:
-            c_name = c.get('класс')
-            personal = [s for s in self.subjects if str(s.get('параллель')) == c_name]
-            distributed_subjects[c_name].extend(personal)
+        problem = self.problem
+        class_lessons_pool = {c_name: list(lessons) for c_name, lessons in problem.class_lessons.items()}
+        class_quotas = problem.class_quotas
 
-        for cls in self.classes:
-            c_name = cls.get('класс')
+        for c_name in problem.class_names:
             self.schedule[c_name] = {day: [] for day in self.days}
 
-            lessons = []
-            my_subjects = distributed_subjects[c_name]
-            for subj in my_subjects:
-                hours = int(subj.get('часов_в_неделю', 1))
-                for _ in range(hours):
-                    lessons.append(subj.copy())
-
-            lessons.sort(key=lambda x: (x['учитель'], x.get('коэффициент', 0)), reverse=True)
-            class_lessons_pool[c_name] = lessons
-
-            total = len(lessons)
-            base = total // 5
-            rem = total % 5
-            quotas = [base] * 5
-            priority = [2, 1, 3, 0, 4]
-            for i in range(rem):
-                quotas[priority[i]] += 1
-
-            class_quotas[c_name] = {day: q for day, q in zip(self.days, quotas)}
-
-        cls_names_fixed = sorted([c.get('класс') for c in self.classes])
+        cls_names_fixed = sorted(problem.class_names)
         teacher_occupied = {day: {p: set() for p in range(1, 10)} for day in self.days}  # 1-9 (8 периодов)
 
-        for day_idx in range(5):
-            day = self.days[day_idx]
-
+        for day in self.days:
             for cls_name in cls_names_fixed:
                 target_count = class_quotas[cls_name][day]
                 pool = class_lessons_pool[cls_name]
@@ -145,6 +156,7 @@ class ScheduleBuilder:
                     cls_name, day, selected_lessons, teacher_occupied
                 )
 
+        self.assign_rooms()
         self.calculate_fitness()
         return self.schedule
 
@@ -190,19 +202,37 @@ class ScheduleBuilder:
         final = []
         for p in range(1, 9):  # 1-8 периоды
             if schedule_map[p - 1]:
-                l = schedule_map[p - 1]
-                teacher_name = l.get('учитель', 'Generic')
-                room = self._get_best_room_for_teacher(teacher_name, day, p)
-                final.append({
-                    'урок': len(final) + 1,
-                    'предмет': l['предмет'],
-                    'учитель': l['учитель'],
-                    'кабинет': room,
-                    'направление': l.get('направление', 'Other'),
-                    'коэффициент': l.get('коэффициент', 0)
-                })
+                final.append(self._make_lesson(schedule_map[p - 1], day, p, len(final) + 1))
 
         self.schedule[cls][day] = final
+        self._touch(cls, day)
+
+    def _make_lesson(self, l, day, period, number) -> Dict:
+        """Урок расписания из шаблона предмета с подобранным кабинетом"""
+        teacher_name = l.get('учитель', 'Generic')
+        room = self._get_best_room_for_teacher(teacher_name, day, period)
+        return {
+            'урок': number,
+            'предмет': l['предмет'],
+            'учитель': l['учитель'],
+            'кабинет': room,
+            'направление': l.get('направление', 'Other'),
+            'коэффициент': l.get('коэффициент', 0)
+        }
+
+    def _build_schedule_dsatur(self, rng=random) -> Dict:
+        """Построение раскраской графа конфликтов (dsatur.py): дни без окон, почти без конфликтов"""
+        grid, self.construction_stats = dsatur_schedule(self.problem, rng=rng)
+        self.schedule = {
+            c_name: {
+                day: [self._make_lesson(l, day, p, p) for p, l in enumerate(lessons, 1)]
+                for day, lessons in days.items()
+            }
+            for c_name, days in grid.items()
+        }
+        self.assign_rooms()
+        self.calculate_fitness()
+        return self.schedule
 
     def _get_best_room_for_teacher(self, teacher_name, day, period):
         """Выбирает оптимальный кабинет для учителя"""
@@ -216,37 +246,24 @@ class ScheduleBuilder:
         self.room_usage_counter[f"{teacher_name}_{best_room}"] += 1
         return best_room
 
+    def assign_rooms(self) -> int:
+        """Снимает конфликты кабинетов паросочетанием уроков слота с кабинетами учителей (rooms.py)"""
+        if not self.room_occupancy.count():
+            return 0
+        changed = assign_rooms(self.schedule, self.days, self.teacher_rooms)
+        self._room_occupancy = None
+        return changed
+
     def _find_all_conflicts(self) -> List[Dict]:
-        """Находит ВСЕ конфликты"""
-        conflicts = []
-        for day in self.days:
-            for p in range(1, 9):  # 1-8 периоды
-                t_map = {}
-                for c_name, c_sched in self.schedule.items():
-                    lesson = next((x for x in c_sched.get(day, []) if x['урок'] == p), None)
-                    if lesson:
-                        t = lesson.get('учитель')
-                        if t and t != 'Generic':
-                            if t not in t_map:
-                                t_map[t] = []
-                            t_map[t].append(c_name)
-
-                for teacher, classes_list in t_map.items():
-                    if len(classes_list) > 1:
-                        conflicts.append({
-                            'day': day,
-                            'period': p,
-                            'teacher': teacher,
-                            'classes': classes_list
-                        })
-        return conflicts
+        """Находит ВСЕ конфликты (по индексу занятости учителей)"""
+        return self.occupancy.conflicts()
 
     def has_teacher_conflicts(self) -> bool:
         """Проверяет наличие конфликтов"""
-        return len(self._find_all_conflicts()) > 0
+        return self.occupancy.count() > 0
 
-    def resolve_all_conflicts_powerful(self, max_retries=10):
-        """СУПЕР-МОЩНОЕ разрешение конфликтов"""
+    def resolve_all_conflicts_powerful(self, max_retries=10, rng=random, deadline=None):
+        """СУПЕР-МОЩНОЕ разрешение конфликтов (deadline - time.time(), после которого ремонт прерывается)"""
         for retry in range(max_retries):
             conflicts = self._find_all_conflicts()
             if not conflicts:
@@ -259,6 +276,19 @@ class ScheduleBuilder:
                 conflicts = self._find_all_conflicts()
                 if not conflicts:
                     return True
+                if self.cancel_token is not None:
+                    self.cancel_token.check()
+                if self.progress_callback is not None:
+                    self.progress_callback({
+                        'phase': 'repair',
+                        'method': 'powerful',
+                        'retry': retry + 1,
+                        'iteration': iteration,
+                        'conflicts': len(conflicts)
+                    })
+                if deadline is not None and time.time() >= deadline:
+                    print(f"⏱ Время ремонта истекло, осталось {len(conflicts)} конфликтов")
+                    return False
 
                 conflict = conflicts[0]
                 day = conflict['day']
@@ -281,6 +311,8 @@ class ScheduleBuilder:
                                     lessons_other.append(lesson)
                                     for i, l in enumerate(lessons_other, 1):
                                         l['урок'] = i
+                                    self._touch(cls, day)
+                                    self._touch(cls, other_day)
                                     resolved = True
                                     break
                             if resolved:
@@ -288,20 +320,22 @@ class ScheduleBuilder:
                     if resolved:
                         break
 
-                if not resolved and random.random() < 0.7:
+                if not resolved and rng.random() < 0.7:
                     try:
-                        c1 = random.choice(list(self.schedule.keys()))
-                        c2 = random.choice(list(self.schedule.keys()))
-                        d1 = random.choice(self.days)
-                        d2 = random.choice(self.days)
+                        c1 = rng.choice(list(self.schedule.keys()))
+                        c2 = rng.choice(list(self.schedule.keys()))
+                        d1 = rng.choice(self.days)
+                        d2 = rng.choice(self.days)
 
                         l1 = self.schedule[c1].get(d1, [])
                         l2 = self.schedule[c2].get(d2, [])
 
                         if len(l1) > 0 and len(l2) > 0:
-                            i1 = random.randint(0, len(l1) - 1)
-                            i2 = random.randint(0, len(l2) - 1)
+                            i1 = rng.randint(0, len(l1) - 1)
+                            i2 = rng.randint(0, len(l2) - 1)
                             l1[i1], l2[i2] = l2[i2], l1[i1]
+                            self._touch(c1, d1)
+                            self._touch(c2, d2)
                             resolved = True
                     except:
                         pass
@@ -317,19 +351,21 @@ class ScheduleBuilder:
                             self.schedule[cls][min_day].append(lesson)
                             for i, l in enumerate(self.schedule[cls][min_day], 1):
                                 l['урок'] = i
+                            self._touch(cls, day)
+                            self._touch(cls, min_day)
                             resolved = True
                     except:
                         pass
 
                 if not resolved:
                     try:
-                        c = random.choice(list(self.schedule.keys()))
-                        d1 = random.choice(self.days)
-                        d2 = random.choice(self.days)
+                        c = rng.choice(list(self.schedule.keys()))
+                        d1 = rng.choice(self.days)
+                        d2 = rng.choice(self.days)
                         if d1 != d2:
                             if len(self.schedule[c][d1]) > 0 and len(self.schedule[c][d2]) > 0:
-                                idx1 = random.randint(0, len(self.schedule[c][d1]) - 1)
-                                idx2 = random.randint(0, len(self.schedule[c][d2]) - 1)
+                                idx1 = rng.randint(0, len(self.schedule[c][d1]) - 1)
+                                idx2 = rng.randint(0, len(self.schedule[c][d2]) - 1)
                                 l = self.schedule[c][d1].pop(idx1)
                                 l2 = self.schedule[c][d2].pop(idx2)
                                 self.schedule[c][d1].append(l2)
@@ -337,44 +373,51 @@ class ScheduleBuilder:
                                 for day_x in [d1, d2]:
                                     for i, lesson in enumerate(self.schedule[c][day_x], 1):
                                         lesson['урок'] = i
+                                    self._touch(c, day_x)
                     except:
                         pass
 
         return False
 
+    def resolve_conflicts_tabu(self, max_iterations=20000, time_limit=5.0, rng=random):
+        """Ремонт конфликтов локальным поиском min-conflicts/табу (local_search.py)"""
+        if not self.has_teacher_conflicts():
+            return True
+
+        schedule, success, self.repair_stats = repair_schedule(
+            self.schedule, self.days, max_iterations=max_iterations, time_limit=time_limit, rng=rng,
+            progress_callback=self.progress_callback, cancel_token=self.cancel_token, problem=self.problem
+        )
+        self.schedule = schedule
+        print(f"   Табу-поиск: {self.repair_stats['iterations']} итераций, "
+              f"{self.repair_stats['moves_per_sec']:.0f} ходов/с, "
+              f"осталось конфликтов: {self.repair_stats['teacher_conflicts']}")
+        return success
+
     def calculate_fitness(self):
         """Расчет fitness"""
         self.conflicts = {k: 0 for k in self.conflicts}
-        penalties = 0
 
         conflicts = self._find_all_conflicts()
-        for conflict in conflicts:
-            self.conflicts['teacher_conflicts'] += 1
-            penalties += 500000
+        self.conflicts['teacher_conflicts'] = len(conflicts)
+        self.conflicts['room_conflicts'] = self.room_occupancy.count()
 
+        same_room_pairs = 0
         for c_sched in self.schedule.values():
             for day, lessons in c_sched.items():
                 for i in range(len(lessons) - 1):
                     if lessons[i].get('кабинет') == lessons[i + 1].get('кабинет'):
-                        penalties += 5
-
-        if self.conflicts['teacher_conflicts'] == 0:
-            for c_sched in self.schedule.values():
-                lesson_counts = [len(c_sched.get(day, [])) for day in self.days]
-                avg_lessons = sum(lesson_counts) / 5
-                variance = sum((count - avg_lessons) ** 2 for count in lesson_counts)
-                penalties += min(variance * 0.5, 10)
+                        same_room_pairs += 1
 
+        variance = 0
+        missing = 0
         for c_sched in self.schedule.values():
+            variance += variance_penalty_x10([len(c_sched.get(day, [])) for day in self.days])
             for day, lessons in c_sched.items():
-                if len(lessons) < 4:
-                    penalties += (4 - len(lessons)) * 100
-
-        if penalties == 0:
-            self.fitness = 100.0
-        else:
-            self.fitness = 100 / (1 + (penalties / 1000))
+                missing += missing_lessons(len(lessons))
 
+        self.fitness = schedule_fitness(self.conflicts['teacher_conflicts'], same_room_pairs, variance, missing,
+                                        self.conflicts['room_conflicts'])
         return self.fitness
 
 
@@ -388,117 +431,229 @@ class Result:
 class GeneticAlgorithm:
     """Генетический алгоритм с 8-м периодом и 100% гарантией"""
 
-    def __init__(self, classes, subjects, teachers, rooms, generations=100, population_size=40, **kwargs):
+    # Доля time_limit, оставляемая на ремонт лучшего расписания
+    REPAIR_SHARE = 0.5
+
+    def __init__(self, classes, subjects, teachers, rooms, generations=None, population_size=None,
+                 representation='dict', evaluation='delta', workers=1, seed=None,
+                 islands=1, migration_interval=10, migrants=2, topology='ring', problem=None,
+                 repair='tabu', construction='greedy', initial_variants=10, time_limit=None,
+                 target_fitness=99.0, cache_size=4096, progress_callback=None, progress_interval=0.25,
+                 cancel_token=None, **kwargs):
+        if representation not in ('dict', 'array'):
+            raise ValueError(f"Неизвестное представление особи: {representation}")
+        if evaluation not in ('delta', 'batch', 'full'):
+            raise ValueError(f"Неизвестный режим оценки: {evaluation}")
+        if workers > 1 and representation != 'array':
+            raise ValueError("Параллельный режим (workers > 1) поддерживается только для representation='array'")
+        if islands > 1 and (representation != 'array' or workers > 1):
+            raise ValueError("Островная модель требует representation='array' и workers=1")
+        if topology not in ('ring', 'full'):
+            raise ValueError(f"Неизвестная топология миграции: {topology}")
+        if repair not in ('tabu', 'powerful'):
+            raise ValueError(f"Неизвестный метод ремонта: {repair}")
+        if construction not in ('greedy', 'dsatur'):
+            raise ValueError(f"Неизвестный способ построения: {construction}")
+
         self.classes = classes
         self.subjects = subjects
         self.teachers = teachers
         self.rooms = rooms
+        # Данные задачи компилируются один раз и разделяются всеми ScheduleBuilder и воркерами
+        self.problem = problem or compile_problem(classes, subjects, teachers, rooms)
+
+        # None - размер задачи определяет число поколений и особей
+        self.generations = generations if generations is not None else max(150, len(classes) * 3)
+        self.population_size = population_size if population_size is not None else min(50 + len(classes) * 2, 200)
 
-        self.generations = max(150, len(classes) * 3)
-        self.population_size = min(50 + len(classes) * 2, 200)
+        # Режим anytime: эволюция останавливается по времени или при best_fitness > target_fitness,
+        # часть бюджета (REPAIR_SHARE) остается на ремонт; deadline - time.time() окончания эволюции
+        self.time_limit = time_limit
+        self.target_fitness = target_fitness
+        self.deadline = None
 
         self.best_schedule = None
         self.best_fitness = 0
         self.conflicts = {}
         self.no_improvement_generations = 0
 
-        self.days = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница']
-
-    def order_crossover(self, parent1_schedule: Dict, parent2_schedule: Dict) -> Dict:
-        """Order Crossover"""
-        child_schedule = copy.deepcopy(parent1_schedule)
-
-        start_day = random.randint(0, len(self.days) - 1)
-        end_day = random.randint(start_day, len(self.days) - 1)
-
+        self.days = list(self.problem.days)
+
+        # 'array' - особи хранятся как тензоры id уроков (см. chromosome.py)
+        self.representation = representation
+        self.codec = None
+        # Для 'array': 'delta' - инкрементальный fitness, 'batch' - вся популяция одним
+        # проходом NumPy, 'full' - полный пересчет каждого потомка
+        self.evaluation = evaluation if representation == 'array' else 'full'
+
+        # Каждый потомок получает свой поток случайных чисел (seed, поколение, номер),
+        # поэтому результат при заданном seed не зависит от числа процессов
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.stats = {}
+
+        # Островная модель: islands подпопуляций в отдельных процессах, каждые
+        # migration_interval поколений лучшие migrants особей мигрируют по topology
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migrants = migrants
+        self.topology = topology
+
+        # Ремонт лучшего расписания: 'tabu' - локальный поиск (если он не справился -
+        # старый метод), 'powerful' - только resolve_all_conflicts_powerful
+        self.repair = repair
+
+        # Начальная популяция: 'greedy' - одна детерминированная особь на всех,
+        # 'dsatur' - initial_variants разных раскрасок (родителями все равно становятся 10 лучших)
+        self.construction = construction
+        self.initial_variants = initial_variants
+
+        # Кэш fitness по Zobrist-хешу расписания - только для оценок 'full' и 'batch': в 'delta'
+        # fitness потомка пересчитывается самими ходами кроссовера и мутации, пропускать
+        # нечего, поэтому кэша нет (и в stats fitness_cache = None); cache_size=0 - без кэша
+        self.fitness_cache = FitnessCache(cache_size) if cache_size and self.evaluation != 'delta' else None
+
+        # progress_callback(dict) - прогресс эволюции (поколение, лучший fitness, конфликты,
+        # elapsed) и ремонта; вызывается только в главном процессе, не чаще раза в
+        # progress_interval секунд (смена фазы передается всегда)
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self._progress = ProgressReporter(progress_callback, progress_interval)
+
+        # cancel_token (cancellation.py) проверяется между поколениями, при построении
+        # начальных вариантов и в ремонте; отмена - исключение Cancelled из run()
+        self.cancel_token = cancel_token
+
+    def _check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
+    def __getstate__(self):
+        # Воркеры и острова получают копию GA без callback (он может быть непиклируемым)
+        state = self.__dict__.copy()
+        state['progress_callback'] = None
+        state['_progress'] = ProgressReporter(None)
+        return state
+
+    def report_progress(self, generation, force=False):
+        """Передает progress_callback текущее поколение и лучший результат"""
+        if self._progress:
+            self._progress({
+                'phase': 'evolution',
+                'generation': generation,
+                'generations': self.generations,
+                'best_fitness': self.best_fitness,
+                'conflicts': self.conflicts.get('teacher_conflicts', 0)
+            }, force=force)
+
+    def order_crossover(self, parent1_schedule: Dict, parent2_schedule: Dict, rng=random) -> FrozenSchedule:
+        """Order Crossover: дни start..end берутся у второго родителя, строки разделяются, а не копируются"""
+        parent1_schedule = FrozenSchedule.from_dict(parent1_schedule)
+        parent2_schedule = FrozenSchedule.from_dict(parent2_schedule)
+
+        start_day = rng.randint(0, len(self.days) - 1)
+        end_day = rng.randint(start_day, len(self.days) - 1)
+
+        rows = {}
         for i in range(start_day, end_day + 1):
             day = self.days[i]
-            for class_name in child_schedule.keys():
+            for class_name in parent1_schedule:
                 if class_name in parent2_schedule:
-                    child_schedule[class_name][day] = copy.deepcopy(
-                        parent2_schedule[class_name][day]
-                    )
-
-        return child_schedule
+                    row = parent2_schedule.row(class_name, day)
+                    if row is not parent1_schedule.row(class_name, day):
+                        rows[(class_name, day)] = row
 
-    def swap_mutation(self, schedule: Dict, mutation_rate: float = 0.15) -> Dict:
-        """Swap mutation"""
-        mutated = copy.deepcopy(schedule)
+        return parent1_schedule.with_rows(rows) if rows else parent1_schedule
 
-        if random.random() > mutation_rate:
-            return mutated
+    def swap_mutation(self, schedule: Dict, mutation_rate: float = 0.15, rng=random) -> FrozenSchedule:
+        """Swap mutation: новая строка создается только для измененного дня"""
+        schedule = FrozenSchedule.from_dict(schedule)
 
-        try:
-            c_name = random.choice(list(mutated.keys()))
-            day = random.choice(self.days)
-            lessons = mutated[c_name][day]
+        if rng.random() > mutation_rate:
+            return schedule
 
-            if len(lessons) >= 2:
-                i, j = random.sample(range(len(lessons)), 2)
-                lessons[i], lessons[j] = lessons[j], lessons[i]
+        c_name = rng.choice(list(schedule.keys()))
+        day = rng.choice(self.days)
+        lessons = list(schedule.row(c_name, day))
 
-                for idx, lesson in enumerate(lessons, 1):
-                    lesson['урок'] = idx
-        except:
-            pass
+        if len(lessons) >= 2:
+            i, j = rng.sample(range(len(lessons)), 2)
+            lessons[i], lessons[j] = lessons[j], lessons[i]
+            return schedule.with_rows({(c_name, day): renumber_row(lessons)})
 
-        return mutated
+        return schedule
 
     def run(self):
         """Основной цикл GA с 8-м периодом"""
         print(f"🚀 Запуск GA с {self.population_size} особей на {self.generations} поколений (8 периодов)")
-
-        current_pop = [self._create_individual() for _ in range(self.population_size)]
+        start_time = run_start = time.time()
+        self._progress = ProgressReporter(self.progress_callback, self.progress_interval)
+        run_deadline = start_time + self.time_limit if self.time_limit is not None else None
+        if run_deadline is not None:
+            self.deadline = start_time + self.time_limit * (1 - self.REPAIR_SHARE)
+
+        # Жадный build_schedule детерминирован - особь строится один раз, популяция разделяет ее
+        # (особи не изменяются на месте, см. _copy_individual)
+        if self.construction == 'dsatur':
+            variants = []
+            for k in range(max(1, min(self.initial_variants, self.population_size))):
+                self._check_cancelled()
+                if variants and self._out_of_time():
+                    break
+                variants.append(self._create_individual(child_rng(self.seed, 'init', k)))
+        else:
+            variants = [self._create_individual()]
+        current_pop = [self._copy_individual(variants[k % len(variants)]) for k in range(self.population_size)]
+        if self.representation == 'array':
+            current_pop = self._encode_population(current_pop)
         self._update_global_best(current_pop)
+        init_time = time.time() - start_time
+        start_time = time.time()
 
-        for g in range(self.generations):
-            current_pop.sort(key=lambda x: x['fitness'], reverse=True)
-
-            new_pop = []
-
-            for i in range(min(5, len(current_pop))):
-                new_pop.append(copy.deepcopy(current_pop[i]))
-
-            while len(new_pop) < self.population_size:
-                parent1 = current_pop[random.randint(0, min(9, len(current_pop) - 1))]
-                parent2 = current_pop[random.randint(0, min(9, len(current_pop) - 1))]
-
-                child_schedule = self.order_crossover(parent1['schedule'], parent2['schedule'])
-                child_schedule = self.swap_mutation(child_schedule, mutation_rate=0.15)
-
-                b = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms)
-                b.schedule = child_schedule
-                b.calculate_fitness()
-
-                new_pop.append({
-                    'schedule': child_schedule,
-                    'fitness': b.fitness,
-                    'conflicts': b.conflicts
-                })
-
-            current_pop = new_pop[:self.population_size]
-            old_fitness = self.best_fitness
-            self._update_global_best(current_pop)
-
-            if self.best_fitness == old_fitness:
-                self.no_improvement_generations += 1
-            else:
-                self.no_improvement_generations = 0
-
-            if self.best_fitness > 99 or self.no_improvement_generations > 50:
-                break
+        if self.islands > 1:
+            generations_done = run_islands(self, current_pop)
+        else:
+            current_pop, generations_done = self._evolve(current_pop, self.generations)
+        self.report_progress(generations_done, force=True)
+
+        self.stats = {
+            'generations': generations_done,
+            'init_time': init_time,
+            'evolution_time': time.time() - start_time,
+            'workers': self.workers,
+            'islands': self.islands,
+            'fitness_cache': self.fitness_cache.stats() if self.fitness_cache is not None else None,
+            # Доля различных особей в итоговой популяции (у островов популяции в их процессах)
+            'diversity': self._diversity(current_pop) if self.islands == 1 else None
+        }
+        if self.fitness_cache is not None:
+            print(f"🗂 Кэш fitness: {self.stats['fitness_cache']['hit_rate']:.0%} попаданий")
 
-            if g % 10 == 0:
-                print(f"Gen {g}: Best={self.best_fitness:.2f}, Conflicts={self.conflicts.get('teacher_conflicts', 0)}")
+        # Тензор/неизменяемое расписание переводим в dict один раз - для ремонта и экспорта
+        if self.representation == 'array' and self.best_schedule is not None:
+            self.best_schedule = self.codec.decode(self.best_schedule)
+        elif isinstance(self.best_schedule, FrozenSchedule):
+            self.best_schedule = self.best_schedule.thaw()
 
         # СУПЕР-МОЩНОЕ РАЗРЕШЕНИЕ КОНФЛИКТОВ
         print(f"\n🔧 СУПЕР-МОЩНОЕ разрешение конфликтов (с 8-м периодом)...")
 
         if self.best_schedule:
-            b = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms)
+            b = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms, problem=self.problem)
             b.schedule = copy.deepcopy(self.best_schedule)
-
-            success = b.resolve_all_conflicts_powerful(max_retries=10)
+            if self._progress:
+                b.progress_callback = self._progress
+            b.cancel_token = self.cancel_token
+
+            rng = random.Random(self.seed)
+            success = False
+            if self.repair == 'tabu':
+                repair_time = 5.0 if run_deadline is None else max(0.0, run_deadline - time.time())
+                success = b.resolve_conflicts_tabu(time_limit=repair_time, rng=rng)
+                self.stats['repair'] = b.repair_stats
+            if not success:
+                success = b.resolve_all_conflicts_powerful(max_retries=10, rng=rng, deadline=run_deadline)
+            b.assign_rooms()
 
             b.calculate_fitness()
 
@@ -516,21 +671,212 @@ class GeneticAlgorithm:
             else:
                 print(f"✅ ИДЕАЛЬНО! Конфликтов 0. Расписание валидно (8 периодов).")
 
+        self.stats['total_time'] = time.time() - run_start
         return Result(self.best_schedule, self.best_fitness, self.conflicts)
 
-    def _create_individual(self):
+    def _evolve(self, current_pop, generations, first_generation=0):
+        """Эволюция популяции на generations поколений; возвращает (популяция, номер последнего поколения + 1)"""
+        pool = OffspringPool(self, self.workers) if self.workers > 1 else None
+        generations_done = first_generation
+        try:
+            for g in range(first_generation, first_generation + generations):
+                self._check_cancelled()
+                current_pop.sort(key=lambda x: x['fitness'], reverse=True)
+
+                new_pop = []
+
+                for i in range(min(5, len(current_pop))):
+                    new_pop.append(self._copy_individual(current_pop[i]))
+
+                parents = current_pop[:10]
+                indices = range(len(new_pop), self.population_size)
+                if pool:
+                    new_pop.extend(pool.breed(g, parents, indices))
+                else:
+                    new_pop.extend(self._breed_children(parents, g, indices))
+
+                current_pop = new_pop[:self.population_size]
+                old_fitness = self.best_fitness
+                self._update_global_best(current_pop)
+                generations_done = g + 1
+                self.report_progress(generations_done)
+
+                if self.best_fitness == old_fitness:
+                    self.no_improvement_generations += 1
+                else:
+                    self.no_improvement_generations = 0
+
+                if self.best_fitness > self.target_fitness or self.no_improvement_generations > 50:
+                    break
+                if self._out_of_time():
+                    print(f"⏱ Лимит времени: остановка на поколении {g}")
+                    break
+
+                if g % 10 == 0:
+                    print(f"Gen {g}: Best={self.best_fitness:.2f}, Conflicts={self.conflicts.get('teacher_conflicts', 0)}, "
+                          f"Diversity={self._diversity(current_pop):.0%}")
+        finally:
+            if pool:
+                pool.close()
+
+        return current_pop, generations_done
+
+    def _out_of_time(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def _create_individual(self, rng=random):
         """Создание одной особи"""
-        b = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms)
+        b = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms, problem=self.problem)
+        schedule = b.build_schedule(self.construction, rng=rng)
         return {
-            'schedule': b.build_schedule(),
+            'schedule': schedule if self.representation == 'array' else FrozenSchedule.from_dict(schedule),
             'fitness': b.fitness,
             'conflicts': b.conflicts
         }
 
+    def _breed_children(self, parents, generation, indices):
+        """Потомки с номерами indices от пула родителей (лучшие особи поколения)"""
+        children = [self._breed(parents, generation, k) for k in indices]
+        if self.evaluation == 'batch':
+            self._evaluate_batch(children)
+        return children
+
+    def _breed(self, parents, generation, index):
+        """Один потомок: выбор родителей, кроссовер, мутация и оценка на своем потоке случайных чисел"""
+        rng = child_rng(self.seed, generation, index)
+        parent1 = parents[rng.randint(0, len(parents) - 1)]
+        parent2 = parents[rng.randint(0, len(parents) - 1)]
+        return self._make_child(parent1, parent2, rng)
+
+    def _make_child(self, parent1, parent2, rng=random):
+        """Кроссовер + мутация + оценка одного потомка"""
+        if self.evaluation == 'delta':
+            child = parent1['engine'].clone()
+            start_day, end_day = self.codec.pick_crossover_days(rng)
+            child.copy_days_from(parent2['schedule'], start_day, end_day)
+            move = self.codec.pick_swap(child.genes, mutation_rate=0.15, rng=rng)
+            if move:
+                child.swap(*move)
+            return {
+                'schedule': child.genes,
+                'fitness': child.fitness,
+                'conflicts': child.conflicts,
+                'engine': child
+            }
+
+        if self.representation == 'array':
+            child_schedule = self.codec.crossover(parent1['schedule'], parent2['schedule'], rng)
+            child_schedule = self.codec.swap_mutation(child_schedule, mutation_rate=0.15, rng=rng)
+            child = {'schedule': child_schedule, 'fitness': None, 'conflicts': None}
+            if self.evaluation != 'batch':
+                # При 'batch' оценка - после формирования всего поколения, см. _evaluate_batch
+                child['fitness'], child['conflicts'] = self._evaluate_cached(
+                    child, lambda: self.codec.evaluate(child_schedule))
+            return child
+
+        child_schedule = self.order_crossover(parent1['schedule'], parent2['schedule'], rng)
+        child_schedule = self.swap_mutation(child_schedule, mutation_rate=0.15, rng=rng)
+
+        def evaluate():
+            b = ScheduleBuilder(self.classes, self.subjects, self.teachers, self.rooms, problem=self.problem)
+            b.schedule = child_schedule
+            return b.calculate_fitness(), b.conflicts
+
+        child = {'schedule': child_schedule}
+        child['fitness'], child['conflicts'] = self._evaluate_cached(child, evaluate)
+        return child
+
+    def _fingerprint(self, ind) -> int:
+        """Zobrist-хеш расписания особи (запоминается в особи)"""
+        if 'hash' not in ind:
+            if 'engine' in ind:
+                ind['hash'] = ind['engine'].hash
+            elif self.representation == 'array':
+                ind['hash'] = fingerprint(ind['schedule'])
+            else:
+                ind['hash'] = FrozenSchedule.from_dict(ind['schedule']).fingerprint()
+        return ind['hash']
+
+    def _evaluate_cached(self, ind, evaluate):
+        """(fitness, conflicts) особи: из кэша по хешу или evaluate() с записью в кэш"""
+        if self.fitness_cache is None:
+            return evaluate()
+        key = self._fingerprint(ind)
+        cached = self.fitness_cache.get(key)
+        if cached is None:
+            cached = evaluate()
+            self.fitness_cache.put(key, *cached)
+        return cached
+
+    def _diversity(self, pop) -> float:
+        """Доля различных расписаний в популяции (по Zobrist-хешу)"""
+        if not pop:
+            return 0.0
+        return len({self._fingerprint(ind) for ind in pop}) / len(pop)
+
+    def _encode_population(self, pop):
+        """Переводит особи из dict в тензоры id уроков"""
+        self.codec = ScheduleCodec.from_schedule(pop[0]['schedule'], self.days, self.problem)
+        # Одинаковые (разделяемые) расписания кодируются один раз
+        encoded = {}
+        for ind in pop:
+            key = id(ind['schedule'])
+            if key not in encoded:
+                genes = self.codec.encode(ind['schedule'])
+                engine = IncrementalFitness(self.codec, genes) if self.evaluation == 'delta' else None
+                encoded[key] = (ind['schedule'], genes, engine)
+            _, ind['schedule'], engine = encoded[key]
+            if engine is not None:
+                ind['engine'] = engine
+        return pop
+
+    def _evaluate_batch(self, pop):
+        """Оценивает список особей одним вызовом ScheduleCodec.evaluate_batch.
+
+        С кэшем в пакет попадают только различные расписания, которых нет в кэше;
+        повторы внутри пакета считаются попаданиями.
+        """
+        if not pop:
+            return
+        if self.fitness_cache is None:
+            pending = [[ind] for ind in pop]
+        else:
+            groups = defaultdict(list)
+            for ind in pop:
+                groups[self._fingerprint(ind)].append(ind)
+            self.fitness_cache.hits += len(pop) - len(groups)
+            pending = []
+            for key, inds in groups.items():
+                cached = self.fitness_cache.get(key)
+                if cached is None:
+                    pending.append(inds)
+                else:
+                    for ind in inds:
+                        ind['fitness'], ind['conflicts'] = cached[0], dict(cached[1])
+        if not pending:
+            return
+
+        fitness, conflicts = self.codec.evaluate_batch(np.stack([inds[0]['schedule'] for inds in pending]))
+        for inds, f, c in zip(pending, fitness.tolist(), conflicts):
+            if self.fitness_cache is not None:
+                self.fitness_cache.put(self._fingerprint(inds[0]), f, c)
+            for ind in inds:
+                ind['fitness'] = f
+                ind['conflicts'] = dict(c)
+
+    def _copy_individual(self, ind):
+        """Копия особи для элиты.
+
+        Расписания особей не меняются на месте (потомки создаются через
+        FrozenSchedule.with_rows, копию тензора или клон IncrementalFitness),
+        поэтому расписание и движок разделяются, копируется только запись.
+        """
+        return dict(ind, conflicts=dict(ind['conflicts']))
+
     def _update_global_best(self, pop):
         """Обновляем лучшее решение"""
         best = max(pop, key=lambda x: x['fitness'])
         if best['fitness'] > self.best_fitness:
             self.best_fitness = best['fitness']
-            self.best_schedule = copy.deepcopy(best['schedule'])
-            self.conflicts = copy.deepcopy(best['conflicts'])
+            self.best_schedule = best['schedule']
+            self.conflicts = dict(best['conflicts'])
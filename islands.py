@@ -0,0 +1,137 @@
+import multiprocessing
+import random
+
+from cancellation import Cancelled
+from delta_fitness import IncrementalFitness
+
+
+def island_seed(seed, island_id) -> int:
+    """Seed подпопуляции: острова эволюционируют на разных потоках случайных чисел"""
+    return random.Random(f"{seed}:island:{island_id}").randrange(2 ** 32)
+
+
+def migration_targets(topology, island_id, islands):
+    """Острова, которым остров island_id отправляет мигрантов"""
+    if topology == 'ring':
+        return [(island_id + 1) % islands]
+    return [i for i in range(islands) if i != island_id]
+
+
+def _accept_migrants(ga, population, migrants):
+    """Мигранты замещают худших особей острова"""
+    if not migrants:
+        return population
+    population.sort(key=lambda x: x['fitness'], reverse=True)
+    migrants = migrants[:ga.population_size - min(5, len(population))]
+    population = population[:ga.population_size - len(migrants)]
+    for genes, fitness, conflicts in migrants:
+        ind = {'schedule': genes, 'fitness': fitness, 'conflicts': conflicts}
+        if ga.evaluation == 'delta':
+            ind['engine'] = IncrementalFitness(ga.codec, genes)
+        population.append(ind)
+    return population
+
+
+def _island_main(conn, ga, island_id, population):
+    """Процесс острова: эволюция по команде координатора и обмен мигрантами"""
+    ga.seed = island_seed(ga.seed, island_id)
+    while True:
+        message = conn.recv()
+        if message[0] == 'stop':
+            break
+
+        _, first_generation, generations, migrants = message
+        population = _accept_migrants(ga, population, migrants)
+        try:
+            population, done = ga._evolve(population, generations, first_generation)
+        except Cancelled:
+            # Токен отмены общий с координатором: остров сообщает об остановке и завершается
+            conn.send({'cancelled': True})
+            break
+        population.sort(key=lambda x: x['fitness'], reverse=True)
+
+        cache = ga.fitness_cache
+        conn.send({
+            'migrants': [(ind['schedule'], ind['fitness'], ind['conflicts']) for ind in population[:ga.migrants]],
+            'stalled': done < first_generation + generations,
+            'cache': (cache.hits, cache.misses) if cache is not None else (0, 0)
+        })
+    conn.close()
+
+
+def run_islands(ga, population):
+    """Островная модель GA.
+
+    Каждый остров - отдельный процесс со своей копией начальной популяции.
+    Каждые ga.migration_interval поколений координатор собирает лучших особей
+    островов, обновляет глобальный рекорд ga.best_* и пересылает мигрантов по
+    топологии ('ring' - соседу по кольцу, 'full' - всем остальным).
+    Счетчики кэша fitness островов суммируются в ga.fitness_cache.
+    Возвращает число выполненных поколений.
+    """
+    islands = ga.islands
+    ctx = multiprocessing.get_context()
+    conns = []
+    processes = []
+    for island_id in range(islands):
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_island_main, args=(child_conn, ga, island_id, population), daemon=True)
+        process.start()
+        child_conn.close()
+        conns.append(parent_conn)
+        processes.append(process)
+
+    generations_done = 0
+    inbox = [[] for _ in range(islands)]
+    reports = []
+    try:
+        while generations_done < ga.generations:
+            step = min(ga.migration_interval, ga.generations - generations_done)
+            for island_id, conn in enumerate(conns):
+                conn.send(('evolve', generations_done, step, inbox[island_id]))
+            reports = [conn.recv() for conn in conns]
+            if any(report.get('cancelled') for report in reports):
+                raise Cancelled("Оптимизация отменена")
+            generations_done += step
+
+            old_fitness = ga.best_fitness
+            ga._update_global_best([
+                {'schedule': genes, 'fitness': fitness, 'conflicts': conflicts}
+                for report in reports for genes, fitness, conflicts in report['migrants'][:1]
+            ])
+            ga.report_progress(generations_done)
+            print(f"Gen {generations_done}: Best={ga.best_fitness:.2f}, "
+                  f"Conflicts={ga.conflicts.get('teacher_conflicts', 0)} ({islands} островов)")
+
+            if ga.best_fitness > old_fitness:
+                ga.no_improvement_generations = 0
+            else:
+                ga.no_improvement_generations += step
+
+            if ga.best_fitness > ga.target_fitness or all(report['stalled'] for report in reports):
+                break
+            if ga._out_of_time():
+                print(f"⏱ Лимит времени: остановка на поколении {generations_done}")
+                break
+
+            inbox = [[] for _ in range(islands)]
+            for island_id, report in enumerate(reports):
+                for target in migration_targets(ga.topology, island_id, islands):
+                    inbox[target].extend(report['migrants'])
+
+        # Счетчики в отчете острова - накопленные с начала прогона
+        if ga.fitness_cache is not None:
+            ga.fitness_cache.hits += sum(report['cache'][0] for report in reports)
+            ga.fitness_cache.misses += sum(report['cache'][1] for report in reports)
+    finally:
+        for conn in conns:
+            try:
+                conn.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    return generations_done
@@ -0,0 +1,437 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from annealing import SimulatedAnnealing
+from cancellation import Cancelled, CancellationToken
+from genetic_algorithm import GeneticAlgorithm
+from problem import ProblemInstance
+
+# Очередь событий и флаги отмены воркеров (задаются initializer'ом пула)
+_events = None
+_cancel_flags = None
+# Как часто процесс-владелец проверяет запросы отмены и чужой процесс - запись задачи в хранилище
+STORE_POLL_INTERVAL = 0.5
+
+
+class QueueFull(Exception):
+    """В очереди уже max_pending незавершенных задач"""
+
+
+def validate_request(data: Dict):
+    """Проверяет запрос оптимизации до постановки в очередь"""
+    if not data.get('classes') or not data.get('subjects') or not data.get('teachers'):
+        raise ValueError('Недостаточно данных')
+    solver = data.get('solver', 'ga')
+    if solver not in ('ga', 'sa'):
+        raise ValueError(f'Неизвестный solver: {solver}')
+
+
+def make_solver(data: Dict, progress_callback: Optional[Callable] = None,
+                cancel_token: Optional[CancellationToken] = None, problem: Optional[ProblemInstance] = None):
+    """GeneticAlgorithm или SimulatedAnnealing по JSON запроса /api/optimize;
+    problem - уже скомпилированные данные запроса (иначе компилируются решателем)"""
+    validate_request(data)
+    classes = data.get('classes', [])
+    subjects = data.get('subjects', [])
+    teachers = data.get('teachers', [])
+    rooms = data.get('rooms', [])
+
+    # Бюджет времени на весь прогон (секунды); по умолчанию из GA_TIME_LIMIT
+    time_limit = data.get('time_limit', os.environ.get('GA_TIME_LIMIT'))
+    time_limit = float(time_limit) if time_limit is not None else None
+
+    if data.get('solver', 'ga') == 'sa':
+        return SimulatedAnnealing(
+            classes=classes,
+            subjects=subjects,
+            teachers=teachers,
+            rooms=rooms,
+            time_limit=time_limit if time_limit is not None else 10.0,
+            cooling=data.get('cooling', 'geometric'),
+            construction=data.get('construction', 'greedy'),
+            seed=data.get('seed'),
+            progress_callback=progress_callback,
+            cancel_token=cancel_token,
+            problem=problem
+        )
+    return GeneticAlgorithm(
+        classes=classes,
+        subjects=subjects,
+        teachers=teachers,
+        rooms=rooms,
+        generations=data.get('generations'),
+        population_size=data.get('population_size'),
+        time_limit=time_limit,
+        target_fitness=float(data.get('target_fitness', 99)),
+        mutation_rate=0.2,
+        crossover_rate=0.85,
+        representation='array',
+        workers=int(os.environ.get('GA_WORKERS', 1)),
+        islands=int(os.environ.get('GA_ISLANDS', 1)),
+        topology=os.environ.get('GA_TOPOLOGY', 'ring'),
+        construction=data.get('construction', 'greedy'),
+        seed=data.get('seed'),
+        progress_callback=progress_callback,
+        cancel_token=cancel_token,
+        problem=problem
+    )
+
+
+def schedule_payload(schedule: Dict) -> Dict:
+    """Расписание решателя -> JSON для клиента (урок, предмет, учитель, кабинет)"""
+    schedule_dict = {}
+    for class_name, class_schedule in schedule.items():
+        schedule_dict[class_name] = {}
+        for day, lessons in class_schedule.items():
+            schedule_dict[class_name][day] = []
+            for lesson in lessons:
+                schedule_dict[class_name][day].append({
+                    'урок': lesson.get('урок', 0),
+                    'предмет': lesson.get('предмет', 'N/A'),
+                    'учитель': lesson.get('учитель', 'N/A'),
+                    'кабинет': str(lesson.get('кабинет', '101'))
+                })
+    return schedule_dict
+
+
+def run_optimization(data: Dict, progress_callback: Optional[Callable] = None,
+                     cancel_token: Optional[CancellationToken] = None,
+                     problem: Optional[ProblemInstance] = None) -> Dict:
+    """Полный прогон решателя; результат в формате ответа /api/optimize"""
+    solver = make_solver(data, progress_callback, cancel_token, problem)
+    result = solver.run()
+    schedule_dict = schedule_payload(result.schedule)
+    return {
+        'schedule': schedule_dict,
+        'fitness': result.fitness,
+        'total_lessons': sum(len(lessons) for c_sched in schedule_dict.values() for lessons in c_sched.values()),
+        'conflicts': result.conflicts,
+        'stats': solver.stats
+    }
+
+
+def _init_worker(events, cancel_flags):
+    global _events, _cancel_flags
+    _events = events
+    _cancel_flags = cancel_flags
+
+
+def _emit(job_id, kind, payload=None):
+    _events.put((job_id, kind, payload))
+
+
+def _run_job(job_id, slot, data, problem=None):
+    """Задача в процессе-воркере: прогресс идет в очередь событий, результат - через future;
+    отмена - флаг slot в общем массиве"""
+    token = CancellationToken(_cancel_flags, slot)
+    # Задача могла быть отменена, пока ждала в очереди исполнителя
+    token.check()
+    _emit(job_id, 'started')
+    return run_optimization(data, progress_callback=partial(_emit, job_id, 'progress'), cancel_token=token,
+                            problem=problem)
+
+
+class Job:
+    """Задача оптимизации: статус queued/running/done/failed/cancelled, прогресс и результат"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # Растет при каждом изменении (для ожидания в JobQueue.watch)
+        self.version = 0
+        # Слот флага отмены в JobQueue.cancel_flags и future выполнения
+        self.slot = None
+        self.future = None
+        # Ключ входных данных (result_cache.request_key), если задан; cached - результат взят из кэша
+        self.key = None
+        self.cached = False
+
+    @property
+    def pending(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> Dict:
+        job = {
+            'id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+        if self.status == 'done':
+            job['result'] = self.result
+            job['cached'] = self.cached
+        elif self.status == 'failed':
+            job['error'] = self.error
+        return job
+
+
+def _job_event(status, progress, error) -> Tuple[str, Dict]:
+    """Событие watch()/watch_record() по состоянию задачи"""
+    if status == 'done':
+        return 'done', {'status': status}
+    if status in ('failed', 'cancelled'):
+        return status, {'status': status, 'error': error}
+    return 'progress', {'status': status, 'progress': progress}
+
+
+def _cancel_key(job_id) -> str:
+    return f'{job_id}:cancel'
+
+
+def request_cancel(store, job_id):
+    """Запрос отмены задачи другого процесса: владелец увидит его в хранилище и отменит задачу.
+    Отдельная запись - публикация прогресса владельцем ее не перезапишет"""
+    store.put(_cancel_key(job_id), {'requested': time.time()})
+
+
+def watch_record(store, job_id, keepalive=15.0, interval=STORE_POLL_INTERVAL) -> Iterator[Optional[Tuple[str, Dict]]]:
+    """Как JobQueue.watch, но по записи задачи в хранилище - для задачи другого процесса"""
+    version = None
+    idle = 0.0
+    while True:
+        record = store.get(job_id)
+        if record is None:
+            yield 'failed', {'status': 'failed', 'error': 'Задача не найдена'}
+            return
+        if record.get('version') != version:
+            version = record.get('version')
+            idle = 0.0
+            name, payload = _job_event(record['status'], record.get('progress', {}), record.get('error'))
+            yield name, payload
+            if name != 'progress':
+                return
+        elif idle >= keepalive:
+            idle = 0.0
+            yield None
+        time.sleep(interval)
+        idle += interval
+
+
+class JobQueue:
+    """Очередь задач оптимизации на пуле из workers процессов.
+
+    submit() возвращает задачу сразу; не больше max_pending задач могут ждать
+    или выполняться одновременно (иначе QueueFull). Воркеры пишут события
+    (старт, прогресс) в общую очередь, ее разбирает фоновый поток; watch()
+    отдает изменения задачи по мере поступления (для SSE). cancel() снимает
+    задачу из очереди или поднимает ее флаг отмены: у каждой незавершенной
+    задачи свой слот в общем массиве cancel_flags. Хранятся
+    последние history завершенных задач. on_result(job) вызывается после
+    успешного завершения.
+
+    С store (state_store) каждое изменение задачи публикуется записью
+    to_dict() под ее id: статус, прогресс и результат видны другим процессам
+    приложения (watch_record), а их запросы отмены (request_cancel) очередь
+    проверяет раз в STORE_POLL_INTERVAL секунд.
+    """
+
+    def __init__(self, workers=1, max_pending=8, history=100, on_result: Optional[Callable] = None, store=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.history = history
+        self.on_result = on_result
+        self.store = store
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        # Публикации идут по одной и читают задачу в момент записи - старый снимок не затрет новый
+        self.publish_lock = threading.Lock()
+
+        self._ctx = multiprocessing.get_context()
+        self.events = self._ctx.Queue()
+        self.cancel_flags = self._ctx.RawArray('b', max_pending)
+        self.free_slots = list(range(max_pending))
+        self.executor = self._new_executor()
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+        if store is not None:
+            threading.Thread(target=self._poll_cancels, daemon=True).start()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._ctx,
+                                   initializer=_init_worker, initargs=(self.events, self.cancel_flags))
+
+    def submit(self, data: Dict, key: Optional[str] = None, problem: Optional[ProblemInstance] = None) -> Job:
+        validate_request(data)
+        job = Job()
+        job.key = key
+        with self.lock:
+            pending = sum(1 for j in self.jobs.values() if j.pending)
+            if pending >= self.max_pending or not self.free_slots:
+                raise QueueFull(f'Очередь заполнена: {self.max_pending} задач в работе')
+            job.slot = self.free_slots.pop()
+            self.cancel_flags[job.slot] = 0
+            self.jobs[job.id] = job
+            self._trim()
+        self._publish(job)
+
+        try:
+            job.future = self.executor.submit(_run_job, job.id, job.slot, data, problem)
+        except BrokenProcessPool:
+            # Воркер упал (например, по памяти) - пул пересоздается
+            self.executor = self._new_executor()
+            job.future = self.executor.submit(_run_job, job.id, job.slot, data, problem)
+        job.future.add_done_callback(partial(self._finish, job))
+        return job
+
+    def add_cached(self, result: Dict, key: Optional[str] = None) -> Job:
+        """Задача, сразу завершенная результатом из кэша, - без пула"""
+        job = Job()
+        job.key = key
+        job.cached = True
+        job.status = 'done'
+        job.result = result
+        job.started = job.finished = job.created
+        with self.lock:
+            self.jobs[job.id] = job
+            self._trim()
+        self._publish(job)
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        """Отмена задачи: из очереди снимается сразу, выполняющаяся останавливается
+        на ближайшей проверке токена. False - задача уже завершена"""
+        with self.lock:
+            if not job.pending:
+                return False
+            self.cancel_flags[job.slot] = 1
+        if job.future is not None:
+            job.future.cancel()
+        return True
+
+    def get(self, job_id) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def watch(self, job: Job, keepalive=15.0) -> Iterator[Optional[Tuple[str, Dict]]]:
+        """События задачи: ('progress', {status, progress}) при каждом изменении, в конце
+        ('done' | 'failed' | 'cancelled', {...}). Промежуточные изменения между чтениями
+        схлопываются в последнее; None - прошло keepalive секунд без изменений.
+        """
+        version = None
+        while True:
+            with self.changed:
+                if not self.changed.wait_for(lambda: job.version != version, keepalive):
+                    yield None
+                    continue
+                version = job.version
+                status, progress, error = job.status, job.progress, job.error
+
+            name, payload = _job_event(status, progress, error)
+            yield name, payload
+            if name != 'progress':
+                return
+
+    def _update(self, job: Job, pending_only=False, **fields):
+        with self.changed:
+            if pending_only and not job.pending:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            self.changed.notify_all()
+        self._publish(job)
+
+    def _publish(self, job: Job):
+        if self.store is None:
+            return
+        with self.publish_lock:
+            with self.lock:
+                record = dict(job.to_dict(), version=job.version)
+            try:
+                self.store.put(job.id, record)
+            except Exception as e:
+                print(f"⚠️ Задача {job.id}: запись в хранилище не удалась ({e})")
+
+    def _poll_cancels(self):
+        """Отмена задач по запросам других процессов (request_cancel)"""
+        while True:
+            time.sleep(STORE_POLL_INTERVAL)
+            with self.lock:
+                pending = [job for job in self.jobs.values() if job.pending]
+            for job in pending:
+                try:
+                    requested = self.store.get(_cancel_key(job.id))
+                    if requested is not None:
+                        self.store.delete(_cancel_key(job.id))
+                        self.cancel(job)
+                except Exception as e:
+                    print(f"⚠️ Задача {job.id}: проверка отмены не удалась ({e})")
+
+    def _trim(self):
+        finished = [j.id for j in self.jobs.values() if not j.pending]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def _listen(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            job_id, kind, payload = event
+            job = self.get(job_id)
+            if job is None:
+                continue
+            # События воркера могут прийти после завершения задачи - тогда они устарели
+            if kind == 'started':
+                self._update(job, pending_only=True, status='running', started=time.time())
+            elif kind == 'progress':
+                self._update(job, pending_only=True, progress=payload)
+
+    def _finish(self, job, future):
+        error = None if future.cancelled() else future.exception()
+        if future.cancelled() or isinstance(error, Cancelled):
+            print(f"⏹ Задача {job.id} отменена")
+            self._complete(job, status='cancelled', error='Оптимизация отменена')
+            return
+        if error is not None:
+            print(f"❌ Задача {job.id}: {error}")
+            print(''.join(traceback.format_exception(type(error), error, error.__traceback__)))
+            self._complete(job, status='failed', error=str(error))
+            return
+
+        result = future.result()
+        if self.on_result:
+            job.result = result
+            try:
+                self.on_result(job)
+            except Exception as e:
+                print(f"❌ Задача {job.id}: не удалось сохранить результат: {e}")
+                print(traceback.format_exc())
+                self._complete(job, status='failed', error=str(e))
+                return
+        self._complete(job, status='done', result=result)
+
+    def _complete(self, job, **fields):
+        """Итоговый статус задачи и освобождение ее слота - под одной блокировкой:
+        cancel() не поднимет флаг слота, который уже отдан новой задаче"""
+        with self.changed:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.finished = time.time()
+            job.version += 1
+            self.cancel_flags[job.slot] = 0
+            self.free_slots.append(job.slot)
+            self.changed.notify_all()
+        self._publish(job)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.events.put(None)
@@ -0,0 +1,149 @@
+import random
+import time
+from typing import Dict
+
+import numpy as np
+
+from chromosome import ScheduleCodec
+from delta_fitness import IncrementalFitness
+from fitness import ROOM_CONFLICT_PENALTY, SAME_ROOM_PENALTY, TEACHER_CONFLICT_PENALTY
+
+
+class TabuRepair:
+    """Ремонт расписания локальным поиском min-conflicts с табу-списком.
+
+    Состояние - IncrementalFitness с живым множеством конфликтов (учитель, день,
+    урок), поэтому конфликты не перебираются заново на каждой итерации. На
+    итерации берется случайный конфликт, для каждого урока в нем оцениваются
+    обмены внутри дня и обмены с уроками других дней того же класса (длины дней
+    не меняются), и выполняется лучший по приращению штрафа ход, не запрещенный
+    табу-списком (или дающий новый рекорд). Остановка - ноль конфликтов, лимит
+    итераций или времени.
+    """
+
+    def __init__(self, codec: ScheduleCodec, genes: np.ndarray, tenure=10, rng=random):
+        self.codec = codec
+        self.engine = IncrementalFitness(codec, genes.copy())
+        self.tenure = tenure
+        self.rng = rng
+        # (класс, id урока, день, позиция) -> итерация, до которой урок нельзя вернуть в ячейку
+        self.tabu = {}
+        self.stats = {}
+
+    def cost(self) -> int:
+        """Штраф, который меняют ходы ремонта (длины дней при обменах постоянны)"""
+        return self.engine.teacher_conflicts * TEACHER_CONFLICT_PENALTY + \
+            self.engine.room_conflicts * ROOM_CONFLICT_PENALTY + \
+            self.engine.same_room_total * SAME_ROOM_PENALTY
+
+    def _apply(self, move):
+        c, d1, i, d2, j = move
+        if d1 == d2:
+            self.engine.swap(c, d1, i, j)
+        else:
+            self.engine.swap_days(c, d1, i, d2, j)
+
+    def _candidates(self, c, d, p):
+        """Обмены урока (c, d, p) с другими уроками того же класса"""
+        lengths = self.engine.lengths[c].tolist()
+        for d2, n in enumerate(lengths):
+            for j in range(n):
+                if d2 != d or j != p:
+                    yield c, d, p, d2, j
+
+    def _is_tabu(self, move, iteration) -> bool:
+        c, d1, i, d2, j = move
+        genes = self.engine.genes
+        a, b = int(genes[c, d1, i]), int(genes[c, d2, j])
+        return self.tabu.get((c, a, d2, j), -1) > iteration or self.tabu.get((c, b, d1, i), -1) > iteration
+
+    def run(self, max_iterations=20000, time_limit=5.0, progress_callback=None, cancel_token=None) -> bool:
+        """Ремонт до нуля конфликтов; в engine остается лучшее найденное расписание.
+
+        progress_callback(dict) вызывается на каждой итерации (прореживает вызывающий),
+        cancel_token (cancellation.py) проверяется на каждой итерации.
+        """
+        engine = self.engine
+        teacher_of = self.codec.teacher_of
+        start_time = time.perf_counter()
+
+        best_cost = self.cost()
+        best_genes = engine.genes.copy()
+        iterations = 0
+        moves = 0
+        evaluated = 0
+
+        while engine.clashes and iterations < max_iterations:
+            if time.perf_counter() - start_time > time_limit:
+                break
+            iterations += 1
+            if cancel_token is not None:
+                cancel_token.check()
+            if progress_callback is not None:
+                progress_callback({
+                    'phase': 'repair',
+                    'method': 'tabu',
+                    'iteration': iterations,
+                    'conflicts': engine.teacher_conflicts
+                })
+
+            t, d, p = self.rng.choice(sorted(engine.clashes))
+            classes = np.nonzero(teacher_of[engine.genes[:, d, p]] == t)[0].tolist()
+
+            current = self.cost()
+            best_moves = []
+            best_delta = None
+            for c in classes:
+                for move in self._candidates(c, d, p):
+                    self._apply(move)
+                    delta = self.cost() - current
+                    self._apply(move)
+                    evaluated += 1
+
+                    # Аспирация: табу-ход разрешен, если дает новый рекорд
+                    if self._is_tabu(move, iterations) and current + delta >= best_cost:
+                        continue
+                    if best_delta is None or delta < best_delta:
+                        best_delta = delta
+                        best_moves = [move]
+                    elif delta == best_delta:
+                        best_moves.append(move)
+
+            if not best_moves:
+                continue
+
+            move = self.rng.choice(best_moves)
+            c, d1, i, d2, j = move
+            genes = engine.genes
+            self.tabu[(c, int(genes[c, d1, i]), d1, i)] = iterations + self.tenure
+            self.tabu[(c, int(genes[c, d2, j]), d2, j)] = iterations + self.tenure
+            self._apply(move)
+            moves += 1
+
+            if self.cost() < best_cost:
+                best_cost = self.cost()
+                best_genes = engine.genes.copy()
+
+        if self.cost() > best_cost:
+            self.engine = IncrementalFitness(self.codec, best_genes)
+
+        elapsed = time.perf_counter() - start_time
+        self.stats = {
+            'iterations': iterations,
+            'moves': moves,
+            'evaluated_moves': evaluated,
+            'time': elapsed,
+            'moves_per_sec': evaluated / elapsed if elapsed > 0 else 0.0,
+            'teacher_conflicts': self.engine.teacher_conflicts
+        }
+        return not self.engine.clashes
+
+
+def repair_schedule(schedule: Dict, days, max_iterations=20000, time_limit=5.0, rng=random,
+                    progress_callback=None, cancel_token=None, problem=None):
+    """Ремонт dict-расписания TabuRepair; возвращает (расписание, решено ли, статистика)"""
+    codec = ScheduleCodec.from_schedule(schedule, days, problem)
+    repair = TabuRepair(codec, codec.encode(schedule), rng=rng)
+    success = repair.run(max_iterations=max_iterations, time_limit=time_limit, progress_callback=progress_callback,
+                         cancel_token=cancel_token)
+    return codec.decode(repair.engine.genes), success, repair.stats
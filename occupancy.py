@@ -0,0 +1,106 @@
+from collections import defaultdict
+from typing import Dict, List
+
+
+class SlotOccupancy:
+    """Индекс занятости ресурса: (день, урок, ресурс) -> классы.
+
+    Ресурс - значение поля урока field (учитель, кабинет). Поддерживается
+    построчно (класс × день), поэтому после изменения дня класса достаточно
+    вызвать update_row. Конфликты читаются за время, пропорциональное их числу,
+    а не размеру школы.
+    """
+
+    field = None
+    label = None
+    not_counted = ('', None)
+
+    def __init__(self, schedule: Dict, days: List[str], periods: int = 8):
+        self.days = days
+        self.day_index = {d: i for i, d in enumerate(days)}
+        self.periods = periods
+        self._period_range = range(1, periods + 1)
+        self.class_order = {c: i for i, c in enumerate(schedule)}
+        self.slots = defaultdict(list)
+        self.rows = {}
+        self.clashes = set()
+
+        for c_name, c_sched in schedule.items():
+            for day in days:
+                self.update_row(c_name, day, c_sched.get(day, []))
+
+    def _row_entries(self, lessons):
+        """(урок, ресурс) для дня класса; как и раньше, учитывается первый урок с данным номером"""
+        entries = []
+        seen = set()
+        for lesson in lessons:
+            p = lesson.get('урок')
+            if p not in self._period_range or p in seen:
+                continue
+            seen.add(p)
+            value = lesson.get(self.field)
+            if value not in self.not_counted:
+                entries.append((p, value))
+        return entries
+
+    def update_row(self, cls, day, lessons):
+        """Переиндексирует день класса после изменения"""
+        if cls not in self.class_order:
+            self.class_order[cls] = len(self.class_order)
+
+        for p, value in self.rows.get((cls, day), ()):
+            key = (day, p, value)
+            classes = self.slots[key]
+            classes.remove(cls)
+            if len(classes) < 2:
+                self.clashes.discard(key)
+            if not classes:
+                del self.slots[key]
+
+        entries = self._row_entries(lessons)
+        for p, value in entries:
+            key = (day, p, value)
+            classes = self.slots[key]
+            classes.append(cls)
+            if len(classes) > 1:
+                self.clashes.add(key)
+        self.rows[(cls, day)] = entries
+
+    def is_busy(self, value, day, period, exclude_class=None) -> bool:
+        """Занят ли ресурс в данный урок (не считая класса exclude_class)"""
+        classes = self.slots.get((day, period, value), ())
+        return any(c != exclude_class for c in classes)
+
+    def count(self) -> int:
+        return len(self.clashes)
+
+    def conflicts(self) -> List[Dict]:
+        """Конфликты в том же порядке, что давал полный перебор: день, урок, порядок классов"""
+        order = self.class_order
+        result = []
+        for day, p, value in self.clashes:
+            classes = sorted(self.slots[(day, p, value)], key=order.get)
+            result.append({
+                'day': day,
+                'period': p,
+                self.label: value,
+                'classes': classes
+            })
+        result.sort(key=lambda c: (self.day_index[c['day']], c['period'], order[c['classes'][0]]))
+        return result
+
+
+class TeacherOccupancy(SlotOccupancy):
+    """Индекс занятости учителей (Generic не учитывается)"""
+
+    field = 'учитель'
+    label = 'teacher'
+    not_counted = ('', None, 'Generic')
+
+
+class RoomOccupancy(SlotOccupancy):
+    """Индекс занятости кабинетов"""
+
+    field = 'кабинет'
+    label = 'room'
+    not_counted = ('', None, 'N/A')
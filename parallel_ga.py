@@ -0,0 +1,97 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from delta_fitness import IncrementalFitness
+
+# Экземпляр GA в процессе-воркере (данные задачи и кодек передаются один раз)
+_worker_ga = None
+
+
+def child_rng(seed, generation, index) -> random.Random:
+    """Собственный поток случайных чисел для потомка index в поколении generation"""
+    return random.Random(f"{seed}:{generation}:{index}")
+
+
+def _init_worker(ga):
+    global _worker_ga
+    _worker_ga = ga
+
+
+def _breed_chunk(generation, parents, indices):
+    """Создает и оценивает потомков с номерами indices в процессе-воркере;
+    возвращает потомков и приращение (попадания, промахи) кэша fitness воркера.
+
+    При 'delta' родители приходят состояниями движков (IncrementalFitness.state), а
+    лучшие len(parents) потомков чанка возвращаются со своим состоянием: только они
+    могут стать родителями следующего поколения, и пересчитывать их не придется.
+    """
+    ga = _worker_ga
+    cache = ga.fitness_cache
+    before = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    if ga.evaluation == 'delta':
+        pool = [{'schedule': state[0], 'engine': IncrementalFitness.from_state(ga.codec, state)} for state in parents]
+    else:
+        pool = [{'schedule': genes} for genes in parents]
+
+    children = ga._breed_children(pool, generation, indices)
+    keep = set()
+    if ga.evaluation == 'delta':
+        keep = set(sorted(range(len(children)), key=lambda i: children[i]['fitness'], reverse=True)[:len(parents)])
+    after = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    return [(c['schedule'], c['fitness'], c['conflicts'], c['engine'].state() if i in keep else None)
+            for i, c in enumerate(children)], (after[0] - before[0], after[1] - before[1])
+
+
+class OffspringPool:
+    """Пул процессов для создания потомков GA.
+
+    Каждый воркер один раз получает копию GeneticAlgorithm (данные задачи и кодек);
+    в каждом поколении передаются только родители (при 'delta' - готовые состояния
+    их движков, без пересчета в воркерах) и номера потомков.
+    Кэш fitness у каждого воркера свой; счетчики попаданий суммируются в кэш ga.
+    """
+
+    def __init__(self, ga, workers):
+        self.ga = ga
+        self.workers = workers
+        self.cache = ga.fitness_cache
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ga,))
+
+    def breed(self, generation, parents, indices):
+        indices = list(indices)
+        if not indices:
+            return []
+
+        if self.ga.evaluation == 'delta':
+            genes = [self._engine(p).state() for p in parents]
+        else:
+            genes = [p['schedule'] for p in parents]
+        size = -(-len(indices) // self.workers)
+        chunks = [indices[i:i + size] for i in range(0, len(indices), size)]
+        futures = [self.executor.submit(_breed_chunk, generation, genes, chunk) for chunk in chunks]
+
+        children = []
+        for future in futures:
+            chunk, (hits, misses) = future.result()
+            if self.cache is not None:
+                self.cache.hits += hits
+                self.cache.misses += misses
+            for schedule, fitness, conflicts, state in chunk:
+                child = {
+                    'schedule': schedule,
+                    'fitness': fitness,
+                    'conflicts': conflicts
+                }
+                if state is not None:
+                    child['engine'] = IncrementalFitness.from_state(self.ga.codec, state)
+                children.append(child)
+        return children
+
+    def _engine(self, ind):
+        """Движок родителя; пересчитывается, только если потомок пришел без состояния"""
+        if 'engine' not in ind:
+            ind['engine'] = IncrementalFitness(self.ga.codec, ind['schedule'])
+        return ind['engine']
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,291 @@
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from teacher_index import TeacherIndex
+
+DAYS = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница']
+HEADER_ROW = ['День', 'Урок 1', 'Урок 2', 'Урок 3', 'Урок 4', 'Урок 5', 'Урок 6', 'Урок 7']
+
+TIMETABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('FONTSIZE', (0, 1), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 4),
+    ('TOPPADDING', (0, 0), (-1, 0), 4),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
+    ('LEFTPADDING', (0, 0), (-1, -1), 2),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+    ('TOPPADDING', (0, 1), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 2),
+]
+
+# Шрифты с кириллицей регистрируются один раз на процесс (register_fonts)
+_fonts = None
+# Пул процессов для рендеринга частей (создается при первом экспорте ZIP)
+_pool = None
+
+
+def register_fonts() -> Tuple[str, str]:
+    """(обычный, жирный) шрифт: DejaVu, если он есть в системе, иначе Helvetica"""
+    global _fonts
+    if _fonts is None:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        try:
+            pdfmetrics.registerFont(TTFont('DejaVu', 'DejaVuSans.ttf'))
+            pdfmetrics.registerFont(TTFont('DejaVuBold', 'DejaVuSans-Bold.ttf'))
+            _fonts = ('DejaVu', 'DejaVuBold')
+        except Exception:
+            _fonts = ('Helvetica', 'Helvetica-Bold')
+    return _fonts
+
+
+def _heading(text, name, font_bold):
+    style = ParagraphStyle(name, fontName=font_bold, fontSize=12, spaceAfter=10,
+                           textColor=colors.HexColor('#4472C4'))
+    # Paragraph разбирает разметку - имена классов и учителей экранируются
+    return Paragraph(escape(text), style)
+
+
+def _timetable(data, font_name, font_name_bold):
+    table = Table(data, colWidths=[0.8 * inch] + [0.9 * inch] * 7)
+    table.setStyle(TableStyle(TIMETABLE_STYLE + [
+        ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
+        ('FONTNAME', (0, 1), (-1, -1), font_name),
+    ]))
+    return table
+
+
+def _or_dash(value):
+    return '-' if not value or value == 'N/A' else value
+
+
+def class_rows(class_schedule: Dict) -> List[List[str]]:
+    """Таблица класса: строка на день, в ячейке предмет, учитель и кабинет урока"""
+    data = [list(HEADER_ROW)]
+    for day in DAYS:
+        lessons = class_schedule.get(day, [])
+        if isinstance(lessons, dict):
+            lessons = list(lessons.values())
+        by_period = {}
+        for lesson in lessons:
+            if lesson is not None:
+                period = lesson.get('урок') if isinstance(lesson, dict) else getattr(lesson, 'урок', 0)
+                by_period.setdefault(period, lesson)
+
+        row = [day]
+        for period in range(1, 8):
+            lesson = by_period.get(period)
+            if lesson:
+                subj = _or_dash(lesson.get('предмет', '-'))
+                teacher = _or_dash(lesson.get('учитель', '-'))
+                room = _or_dash(lesson.get('кабинет', '-'))
+                row.append(f"{subj}\n{teacher}\nКаб.{room}")
+            else:
+                row.append('-')
+        data.append(row)
+    return data
+
+
+def teacher_rows(teachers: TeacherIndex, teacher) -> List[List[str]]:
+    """Таблица учителя: строка на день, в ячейке класс, предмет и кабинет урока"""
+    data = [list(HEADER_ROW)]
+    for day in DAYS:
+        by_period = teachers.day(teacher, day)
+        row = [day]
+        for period in range(1, 8):
+            lesson = by_period.get(period)
+            row.append(f"{lesson['класс']}\n{_or_dash(lesson['предмет'])}\nКаб.{_or_dash(lesson['кабинет'])}"
+                       if lesson else '-')
+        data.append(row)
+    return data
+
+
+def class_story(class_name, rows, fonts):
+    font_name, font_name_bold = fonts
+    return [_heading(f"Класс {class_name}", 'ClassHeader', font_name_bold),
+            _timetable(rows, font_name, font_name_bold),
+            Spacer(1, 0.2 * inch)]
+
+
+def teacher_story(teacher, rows, summary, fonts):
+    font_name, font_name_bold = fonts
+    note = ParagraphStyle('TeacherSummary', fontName=font_name, fontSize=9, spaceBefore=6)
+    return [_heading(f"Учитель {teacher}", 'TeacherHeader', font_name_bold),
+            _timetable(rows, font_name, font_name_bold),
+            Paragraph(summary, note),
+            Spacer(1, 0.2 * inch)]
+
+
+def stats_story(fitness, conflicts, fonts):
+    font_name, font_name_bold = fonts
+    stats_data = [
+        ['Параметр', 'Значение'],
+        ['Качество расписания', f"{fitness:.1f}%"],
+        ['Конфликты учителей', str(conflicts.get('teacher_conflicts', 0))],
+        ['Конфликты кабинетов', str(conflicts.get('room_conflicts', 0))],
+        ['Нарушения SanPin', str(conflicts.get('sanpin_violations', 0))],
+    ]
+
+    stats_table = Table(stats_data, colWidths=[3 * inch, 2 * inch])
+    stats_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
+        ('FONTNAME', (0, 1), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F5F5F5')]),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    return [_heading("Статистика", 'StatsHeader', font_name_bold), stats_table]
+
+
+def render(story) -> bytes:
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), topMargin=0.3 * inch, bottomMargin=0.3 * inch,
+                            leftMargin=0.3 * inch, rightMargin=0.3 * inch)
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def merge_pdfs(parts) -> bytes:
+    """Один PDF из готовых документов: их страницы по порядку, без повторного рендеринга"""
+    writer = PdfWriter()
+    for data in parts:
+        writer.append(PdfReader(BytesIO(data)))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _render_class(class_name, rows):
+    return render(class_story(class_name, rows, register_fonts()))
+
+
+def _render_teacher(teacher, rows, summary):
+    return render(teacher_story(teacher, rows, summary, register_fonts()))
+
+
+def _render_classes(classes, stats=None):
+    """Один документ из таблиц классов [(класс, строки), ...] и, если задана, статистики (fitness, conflicts)"""
+    fonts = register_fonts()
+    story = []
+    for class_name, rows in classes:
+        story.extend(class_story(class_name, rows, fonts))
+    if stats is not None:
+        story.extend(stats_story(*stats, fonts))
+    return render(story)
+
+
+def pool_workers() -> int:
+    return int(os.environ.get('PDF_WORKERS', os.cpu_count() or 1))
+
+
+def get_pool():
+    """Пул PDF_WORKERS процессов (по умолчанию по числу ядер); шрифты регистрируются при старте воркера"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=pool_workers(), initializer=register_fonts)
+    return _pool
+
+
+@contextmanager
+def _pooled():
+    """Пул для экспорта; если воркер упал (например, по памяти), следующий экспорт создаст новый пул"""
+    global _pool
+    try:
+        yield get_pool()
+    except BrokenProcessPool:
+        _pool = None
+        raise
+
+
+def _submit_combined(pool, schedule, fitness, conflicts) -> List:
+    """Задачи рендеринга общего документа: классы по порядку делятся на PDF_WORKERS
+    подряд идущих частей, статистика - в конце последней"""
+    classes = [(class_name, class_rows(class_schedule)) for class_name, class_schedule in sorted(schedule.items())]
+    size = max(1, -(-len(classes) // pool_workers()))
+    chunks = [classes[i:i + size] for i in range(0, len(classes), size)] or [[]]
+    return [pool.submit(_render_classes, chunk, (fitness, conflicts) if i == len(chunks) - 1 else None)
+            for i, chunk in enumerate(chunks)]
+
+
+def _combined_result(futures) -> bytes:
+    parts = [future.result() for future in futures]
+    return parts[0] if len(parts) == 1 else merge_pdfs(parts)
+
+
+def export_to_pdf(schedule, fitness, conflicts):
+    """Экспортировать расписание в PDF: все классы и статистика одним документом.
+
+    Части документа (подряд идущие классы) рендерятся параллельно в пуле
+    get_pool() и склеиваются merge_pdfs; каждая часть начинается с новой
+    страницы. С одним воркером документ тот же, что при рендеринге целиком.
+    """
+    with _pooled() as pool:
+        return BytesIO(_combined_result(_submit_combined(pool, schedule, fitness, conflicts)))
+
+
+def _file_name(name, used):
+    """Имя файла в архиве: без разделителей пути и управляющих символов, уникальное в used"""
+    base = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', str(name)).strip() or '_'
+    name, n = base, 1
+    while name in used:
+        n += 1
+        name = f"{base} ({n})"
+    used.add(name)
+    return name
+
+
+def export_pdf_zip(schedule, fitness, conflicts, teachers: TeacherIndex = None) -> bytes:
+    """ZIP с PDF каждого класса (classes/), каждого учителя (teachers/) и общим расписание.pdf.
+
+    Части и общий документ (как в export_to_pdf, по частям) рендерятся
+    параллельно в пуле get_pool(). Общий документ не склеивается из PDF
+    классов: в каждом из них свой встроенный шрифт, и склейка была бы в
+    десятки раз больше и не быстрее рендеринга частями.
+    """
+    teachers = teachers or TeacherIndex(schedule)
+
+    with _pooled() as pool:
+        combined = _submit_combined(pool, schedule, fitness, conflicts)
+        parts = []
+        used = set()
+        for class_name, class_schedule in sorted(schedule.items()):
+            parts.append((f"classes/{_file_name(class_name, used)}.pdf",
+                          pool.submit(_render_class, class_name, class_rows(class_schedule))))
+        used = set()
+        for teacher in teachers.teachers:
+            summary = (f"Всего часов в неделю: {teachers.hours(teacher, DAYS)}. "
+                       f"Окна: {teachers.windows(teacher)}")
+            parts.append((f"teachers/{_file_name(teacher, used)}.pdf",
+                          pool.submit(_render_teacher, teacher, teacher_rows(teachers, teacher), summary)))
+
+        buffer = BytesIO()
+        # PDF уже сжаты - в архив без повторного сжатия
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            archive.writestr('расписание.pdf', _combined_result(combined))
+            for name, future in parts:
+                archive.writestr(name, future.result())
+    return buffer.getvalue()
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from typing import Dict, List
+
+DAYS = ('Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница')
+# Порядок дней, которым достается остаток уроков при делении на 5
+QUOTA_PRIORITY = (2, 1, 3, 0, 4)
+# Уроков в дне класса не больше (построители расписания, индексы занятости)
+MAX_PERIODS = 8
+
+
+class ProblemInstance:
+    """Скомпилированная задача составления расписания.
+
+    Все, что не зависит от конкретного расписания: уроки каждого класса,
+    квоты уроков по дням, кабинеты учителей и интернированные id. Создается
+    один раз (compile_problem) и разделяется всеми ScheduleBuilder, кодеком,
+    ремонтом и процессами-воркерами (поэтому только dict/tuple - объект должен
+    сериализоваться pickle). Поля не изменяются после компиляции.
+    """
+
+    def __init__(self, classes, subjects, teachers, rooms, days, class_names, class_lessons,
+                 class_quotas, teacher_rooms):
+        # Исходные (нормализованные) данные
+        self.classes = classes
+        self.subjects = subjects
+        self.teachers = teachers
+        self.rooms = rooms
+
+        self.days = days
+        self.class_names = class_names
+        self.class_lessons = class_lessons
+        self.class_quotas = class_quotas
+        self.teacher_rooms = teacher_rooms
+
+        # Интернированные id
+        self.class_ids = {c: i for i, c in enumerate(class_names)}
+        teacher_names = sorted({l['учитель'] for lessons in class_lessons.values() for l in lessons})
+        self.teacher_names = tuple(teacher_names)
+        self.teacher_ids = {t: i for i, t in enumerate(teacher_names)}
+        subject_names = sorted({l['предмет'] for lessons in class_lessons.values() for l in lessons})
+        self.subject_names = tuple(subject_names)
+        self.subject_ids = {s: i for i, s in enumerate(subject_names)}
+
+    @property
+    def total_lessons(self) -> int:
+        return sum(len(lessons) for lessons in self.class_lessons.values())
+
+
+def _normalize_subjects(subjects: List[Dict]) -> List[Dict]:
+    """Копии строк предметов с учителем и часами по умолчанию"""
+    normalized = []
+    for subj in subjects:
+        subj = dict(subj)
+        if not subj.get('учитель') or subj.get('учитель') == 'N/A':
+            subj['учитель'] = 'Generic'
+        if not subj.get('часов_в_неделю'):
+            subj['часов_в_неделю'] = 1
+        normalized.append(subj)
+    return normalized
+
+
+def _teacher_rooms(teachers: List[Dict]) -> Dict[str, tuple]:
+    """Учитель -> доступные кабинеты"""
+    teacher_rooms = {}
+    for teacher in teachers:
+        fio = teacher.get('ФИО', '')
+        rooms_str = teacher.get('кабинеты', '')
+        if rooms_str and rooms_str != 'N/A':
+            teacher_rooms[fio] = tuple(r.strip() for r in str(rooms_str).split(';'))
+    return teacher_rooms
+
+
+def _distribute_subjects(classes, subjects) -> Dict[str, List[Dict]]:
+    """Предметы параллели распределяются по классам, плюс личные предметы класса"""
+    parallels_map = defaultdict(list)
+    for c in classes:
+        parallels_map[str(c.get('параллель'))].append(c.get('класс'))
+    for p in parallels_map:
+        parallels_map[p].sort()
+
+    distributed_subjects = defaultdict(list)
+
+    for p_key, classes_list in parallels_map.items():
+        p_subjects = [s for s in subjects if str(s.get('параллель')) == p_key]
+        grouped_by_name = defaultdict(list)
+        for s in p_subjects:
+            grouped_by_name[s['предмет']].append(s)
+
+        for subj_name, variants in grouped_by_name.items():
+            if len(variants) >= len(classes_list):
+                for i, cls_name in enumerate(classes_list):
+                    distributed_subjects[cls_name].append(variants[i % len(variants)])
+            else:
+                for cls_name in classes_list:
+                    distributed_subjects[cls_name].append(variants[0])
+
+    for c in classes:
+        c_name = c.get('класс')
+        personal = [s for s in subjects if str(s.get('параллель')) == c_name]
+        distributed_subjects[c_name].extend(personal)
+
+    return distributed_subjects
+
+
+def day_quotas(total: int, days=DAYS) -> Dict[str, int]:
+    """Сколько уроков класса приходится на каждый день"""
+    base = total // len(days)
+    quotas = [base] * len(days)
+    for i in range(total % len(days)):
+        quotas[QUOTA_PRIORITY[i]] += 1
+    return {day: q for day, q in zip(days, quotas)}
+
+
+def compile_problem(classes, subjects, teachers, rooms, days=DAYS) -> ProblemInstance:
+    """Компилирует исходные листы в ProblemInstance"""
+    if not classes or not subjects:
+        raise ValueError("Нет классов или предметов")
+
+    subjects = _normalize_subjects(subjects)
+    distributed_subjects = _distribute_subjects(classes, subjects)
+
+    class_names = tuple(c.get('класс') for c in classes)
+    class_lessons = {}
+    class_quotas = {}
+    for c_name in class_names:
+        lessons = []
+        for subj in distributed_subjects[c_name]:
+            lessons.extend([subj] * int(subj.get('часов_в_неделю', 1)))
+
+        lessons.sort(key=lambda x: (x['учитель'], x.get('коэффициент', 0)), reverse=True)
+        class_lessons[c_name] = tuple(lessons)
+        class_quotas[c_name] = day_quotas(len(lessons), days)
+
+    return ProblemInstance(
+        classes=classes,
+        subjects=subjects,
+        teachers=teachers,
+        rooms=rooms,
+        days=tuple(days),
+        class_names=class_names,
+        class_lessons=class_lessons,
+        class_quotas=class_quotas,
+        teacher_rooms=_teacher_rooms(teachers)
+    )
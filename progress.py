@@ -0,0 +1,33 @@
+import time
+from typing import Callable, Dict, Optional
+
+
+class ProgressReporter:
+    """Прореживание вызовов progress_callback по времени.
+
+    Вызов пропускается, если с предыдущего прошло меньше interval секунд;
+    смена фазы ('evolution', 'repair', ...) и force=True передаются всегда.
+    К событию добавляется elapsed - секунды с создания. Проверка - одно
+    чтение часов, поэтому reporter можно вызывать в горячих циклах.
+    """
+
+    def __init__(self, callback: Optional[Callable[[Dict], None]], interval=0.25):
+        self.callback = callback
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._last = None
+        self._phase = None
+
+    def __bool__(self):
+        return self.callback is not None
+
+    def __call__(self, info: Dict, force=False):
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        phase = info.get('phase')
+        if not force and phase == self._phase and self._last is not None and now - self._last < self.interval:
+            return
+        self._last = now
+        self._phase = phase
+        self.callback(dict(info, elapsed=now - self.start))
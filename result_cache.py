@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+# Меняется при изменениях решателя, влияющих на результат, - старые записи перестают совпадать
+CACHE_VERSION = 1
+
+# Поля запроса, от которых зависит результат (см. jobs.make_solver)
+INPUT_FIELDS = ('classes', 'subjects', 'teachers', 'rooms')
+SOLVER_FIELDS = ('solver', 'seed', 'time_limit', 'target_fitness', 'generations', 'population_size',
+                 'construction', 'cooling')
+# Переменные окружения, которые make_solver подставляет в решатель
+SOLVER_ENV = ('GA_TIME_LIMIT', 'GA_ISLANDS', 'GA_TOPOLOGY')
+
+
+def _canonical(value):
+    """Целые float (3.0 из Excel) -> int, чтобы одинаковые данные давали один ключ"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def request_key(data: Dict) -> str:
+    """SHA-256 канонического JSON входных данных, параметров решателя и seed.
+
+    Порядок ключей в объектах не важен, порядок элементов списков - важен
+    (он влияет на решатель). Поля, не влияющие на результат (schedule_id и т.п.),
+    в ключ не входят.
+    """
+    canonical = {
+        'version': CACHE_VERSION,
+        'input': {field: _canonical(data.get(field) or []) for field in INPUT_FIELDS},
+        'solver': {field: _canonical(data.get(field)) for field in SOLVER_FIELDS},
+        'env': {name: os.environ.get(name) for name in SOLVER_ENV}
+    }
+    canonical['solver']['solver'] = canonical['solver']['solver'] or 'ga'
+    text = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def disk_entries(directory, suffix):
+    """(mtime, размер, путь) файлов directory с окончанием suffix"""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.name.endswith(suffix):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    return entries
+
+
+def evict_oldest(directory, max_bytes, suffix) -> int:
+    """Удаляет файлы с давним mtime, пока их суммарный размер больше max_bytes; возвращает число удаленных"""
+    entries = sorted(disk_entries(directory, suffix))
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        evicted += 1
+    return evicted
+
+
+class ResultCache:
+    """Результаты оптимизации на диске по ключу запроса (request_key), LRU по размеру.
+
+    Запись - файл <ключ>.json.gz в directory; время последнего обращения -
+    mtime файла (get его обновляет). Когда суммарный размер превышает
+    max_bytes, put удаляет самые давние записи. Запись идет через временный
+    файл и os.replace, поэтому кэш можно делить между процессами приложения.
+    Счетчики hits/misses/evictions - свои у каждого процесса.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json.gz')
+
+    def get(self, key) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Нет записи, ее только что вытеснили или файл поврежден
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result: Dict):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+                json.dump(result, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, path)
+        except OSError as e:
+            # Кэш не должен ронять оптимизацию: без записи следующий запрос просто пересчитается
+            print(f"⚠️ Кэш результатов: запись не удалась ({e})")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict()
+
+    def _evict(self):
+        evicted = evict_oldest(self.directory, self.max_bytes, '.json.gz')
+        with self.lock:
+            self.evictions += evicted
+
+    def stats(self) -> Dict:
+        entries = disk_entries(self.directory, '.json.gz')
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes
+        }
+
+
+def make_result_cache(directory=None, max_mb=None) -> Optional[ResultCache]:
+    """Кэш по RESULT_CACHE_DIR и RESULT_CACHE_MB (0 - без кэша)"""
+    if max_mb is None:
+        max_mb = float(os.environ.get('RESULT_CACHE_MB', 256))
+    if max_mb <= 0:
+        return None
+    directory = directory or os.environ.get('RESULT_CACHE_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'result_cache')
+    return ResultCache(directory, int(max_mb * 1024 * 1024))
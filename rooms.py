@@ -0,0 +1,77 @@
+from typing import Dict, List, Sequence, Tuple
+
+from occupancy import RoomOccupancy
+
+
+def match_rooms(current: Sequence, allowed: Sequence[Sequence]) -> Tuple[List, int]:
+    """Паросочетание уроков одного слота (день, урок) с кабинетами (алгоритм Куна).
+
+    current[i] - кабинет урока i сейчас, allowed[i] - допустимые кабинеты
+    (пусто - кабинет урока не меняется). Урок сначала пробует свой текущий
+    кабинет, поэтому без конфликтов назначение не меняется. Возвращает
+    (кабинеты уроков, число уроков без свободного кабинета - они остаются в текущем).
+    """
+    n = len(current)
+    options = [
+        [current[i]] + [r for r in allowed[i] if r != current[i]] if allowed[i] else [current[i]]
+        for i in range(n)
+    ]
+    owner = {}
+
+    def augment(i, visited):
+        for room in options[i]:
+            if room in visited:
+                continue
+            visited.add(room)
+            if room not in owner or augment(owner[room], visited):
+                owner[room] = i
+                return True
+        return False
+
+    # Сначала без перестановок: каждый урок занимает свой кабинет, если он свободен
+    pending = []
+    for i in range(n):
+        if current[i] not in owner:
+            owner[current[i]] = i
+        else:
+            pending.append(i)
+
+    unmatched = 0
+    for i in pending:
+        if not augment(i, set()):
+            unmatched += 1
+
+    result = list(current)
+    for room, i in owner.items():
+        result[i] = room
+    return result, unmatched
+
+
+def assign_rooms(schedule: Dict, days: List[str], teacher_rooms: Dict[str, Sequence]) -> int:
+    """Переназначает кабинеты в слотах с конфликтами кабинетов; изменяет schedule на месте.
+
+    Допустимые кабинеты урока - кабинеты его учителя. Возвращает число уроков,
+    сменивших кабинет.
+    """
+    occupancy = RoomOccupancy(schedule, days)
+    slots = {(day, p) for day, p, _ in occupancy.clashes}
+    changed = 0
+
+    for day, period in slots:
+        lessons = []
+        for c_sched in schedule.values():
+            for lesson in c_sched.get(day, []):
+                if lesson.get('урок') == period and lesson.get('кабинет') not in RoomOccupancy.not_counted:
+                    lessons.append(lesson)
+                    break
+
+        rooms, _ = match_rooms(
+            [lesson['кабинет'] for lesson in lessons],
+            [teacher_rooms.get(lesson.get('учитель'), ()) for lesson in lessons]
+        )
+        for lesson, room in zip(lessons, rooms):
+            if lesson['кабинет'] != room:
+                lesson['кабинет'] = room
+                changed += 1
+
+    return changed
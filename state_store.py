@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class MemoryStateStore:
+    """Состояния расписаний в памяти процесса: LRU на max_entries записей.
+
+    Подходит для одного процесса приложения; при нескольких процессах за
+    балансировщиком нужен SQLiteStateStore.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key) -> Optional[Dict]:
+        with self.lock:
+            state = self.entries.get(key)
+            if state is not None:
+                self.entries.move_to_end(key)
+            return state
+
+    def put(self, key, state: Dict):
+        with self.lock:
+            self.entries[key] = state
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class SQLiteStateStore:
+    """Состояния расписаний в SQLite (JSON по ключу), общие для всех процессов приложения.
+
+    Хранится не больше max_entries записей: вытесняются давно не читавшиеся
+    (время обращения обновляют get и put). Соединение открывается на каждую
+    операцию, поэтому хранилище можно использовать из любых потоков. table -
+    имя таблицы: у разных хранилищ в одном файле свои записи и свой лимит.
+    """
+
+    def __init__(self, path, max_entries=1000, table='schedule_state'):
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(f'CREATE TABLE IF NOT EXISTS {table} ('
+                       'id TEXT PRIMARY KEY, state TEXT NOT NULL, accessed REAL NOT NULL)')
+            db.execute(f'CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)')
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key) -> Optional[Dict]:
+        with self._connect() as db:
+            row = db.execute(f'SELECT state FROM {self.table} WHERE id = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute(f'UPDATE {self.table} SET accessed = ? WHERE id = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, state: Dict):
+        with self._connect() as db:
+            db.execute(f'INSERT OR REPLACE INTO {self.table} (id, state, accessed) VALUES (?, ?, ?)',
+                       (key, json.dumps(state, ensure_ascii=False), time.time()))
+            db.execute(f'DELETE FROM {self.table} WHERE id NOT IN '
+                       f'(SELECT id FROM {self.table} ORDER BY accessed DESC LIMIT ?)', (self.max_entries,))
+
+    def delete(self, key):
+        with self._connect() as db:
+            db.execute(f'DELETE FROM {self.table} WHERE id = ?', (key,))
+
+
+def make_state_store(backend=None, path=None, max_entries=None, table='schedule_state'):
+    """Хранилище по STATE_BACKEND (memory | sqlite), STATE_DB и STATE_MAX_ENTRIES"""
+    backend = backend or os.environ.get('STATE_BACKEND', 'memory')
+    if max_entries is None and os.environ.get('STATE_MAX_ENTRIES'):
+        max_entries = int(os.environ['STATE_MAX_ENTRIES'])
+    if backend == 'memory':
+        return MemoryStateStore(max_entries or 256)
+    if backend == 'sqlite':
+        path = path or os.environ.get('STATE_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 'schedules.db')
+        return SQLiteStateStore(path, max_entries or 1000, table)
+    raise ValueError(f"Неизвестное хранилище состояния: {backend}")
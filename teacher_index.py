@@ -0,0 +1,66 @@
+from typing import Dict, Iterable, List
+
+# Не настоящие учителя: заглушки построителя и пустые ячейки
+NOT_TEACHERS = ('', 'Generic', 'N/A')
+
+
+class TeacherIndex:
+    """Обратный индекс расписания: учитель -> день -> номер урока -> урок.
+
+    Строится за один проход по всем урокам; урок в индексе - словарь
+    {'урок', 'класс', 'предмет', 'кабинет'}. Если у учителя два урока в одном
+    слоте (конфликт), в индексе остается первый по порядку классов - как его
+    показывал лист учителей XLSX.
+    """
+
+    def __init__(self, schedule: Dict):
+        self.by_teacher = {}
+        for class_name, class_schedule in schedule.items():
+            for day, lessons in class_schedule.items():
+                if isinstance(lessons, dict):
+                    lessons = list(lessons.values())
+                for lesson in lessons:
+                    if lesson is None:
+                        continue
+                    teacher = lesson.get('учитель', '')
+                    if teacher in NOT_TEACHERS:
+                        continue
+                    period = lesson.get('урок', 0)
+                    self.by_teacher.setdefault(teacher, {}).setdefault(day, {}).setdefault(period, {
+                        'урок': period,
+                        'класс': class_name,
+                        'предмет': lesson.get('предмет', ''),
+                        'кабинет': lesson.get('кабинет', '')
+                    })
+        self.teachers = sorted(self.by_teacher)
+
+    def __contains__(self, teacher):
+        return teacher in self.by_teacher
+
+    def day(self, teacher, day) -> Dict[int, Dict]:
+        """Уроки учителя за день: номер урока -> урок"""
+        return self.by_teacher.get(teacher, {}).get(day, {})
+
+    def hours(self, teacher, days: Iterable[str], periods=range(1, 8)) -> int:
+        """Число занятых уроков periods за дни days"""
+        return sum(1 for day in days for period in periods if period in self.day(teacher, day))
+
+    def free_periods(self, teacher, days: Iterable[str], periods=range(1, 8)) -> int:
+        """Свободные уроки periods в рабочие дни учителя (строка "Окна (пропуски)" листа XLSX)"""
+        return sum(1 for day in days if self.day(teacher, day)
+                   for period in periods if period not in self.day(teacher, day))
+
+    def windows(self, teacher) -> int:
+        """Окна: пустые уроки между первым и последним уроком дня, сумма по дням"""
+        total = 0
+        for lessons in self.by_teacher.get(teacher, {}).values():
+            periods = [p for p in lessons if isinstance(p, int) and p > 0]
+            if periods:
+                total += max(periods) - min(periods) + 1 - len(periods)
+        return total
+
+    def timetable(self, teacher, days: Iterable[str]) -> Dict[str, List[Dict]]:
+        """Уроки учителя по дням days, по порядку номеров"""
+        return {day: sorted(self.day(teacher, day).values(),
+                            key=lambda lesson: lesson['урок'] if isinstance(lesson['урок'], int) else 0)
+                for day in days}
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+def row_hash(lessons) -> Tuple[str, str]:
+    """(хеш, канонический JSON) строки расписания - уроков класса за день"""
+    text = json.dumps(lessons, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest(), text
+
+
+class ScheduleVersions:
+    """Версии расписаний в SQLite: результат оптимизации и каждое сохранение редактора.
+
+    Версия - список ссылок (класс, день) -> хеш строки; сами строки (уроки
+    класса за день) хранятся один раз в schedule_row, поэтому правка
+    нескольких дней добавляет только их строки. Версии нумеруются с 1 для
+    каждого schedule_id, поиск - по первичному ключу (schedule_id, version).
+    Для каждого schedule_id хранятся последние keep версий, строки, на которые
+    больше никто не ссылается, удаляются.
+    """
+
+    def __init__(self, path, keep=50):
+        self.path = path
+        self.keep = keep
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS schedule_version ('
+                       'schedule_id TEXT NOT NULL, version INTEGER NOT NULL, created REAL NOT NULL, '
+                       'source TEXT NOT NULL, fitness REAL, conflicts TEXT, '
+                       'PRIMARY KEY (schedule_id, version)) WITHOUT ROWID')
+            db.execute('CREATE TABLE IF NOT EXISTS schedule_version_row ('
+                       'schedule_id TEXT NOT NULL, version INTEGER NOT NULL, position INTEGER NOT NULL, '
+                       'class_name TEXT NOT NULL, day TEXT NOT NULL, row_hash TEXT NOT NULL, '
+                       'PRIMARY KEY (schedule_id, version, position)) WITHOUT ROWID')
+            db.execute('CREATE INDEX IF NOT EXISTS schedule_version_row_hash ON schedule_version_row (row_hash)')
+            db.execute('CREATE TABLE IF NOT EXISTS schedule_row ('
+                       'hash TEXT PRIMARY KEY, lessons TEXT NOT NULL) WITHOUT ROWID')
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save(self, schedule_id, state: Dict, source='optimize') -> int:
+        """Новая версия из состояния {'schedule', 'fitness', 'conflicts'}; возвращает ее номер"""
+        refs = []
+        rows = {}
+        for class_name, days in state['schedule'].items():
+            for day, lessons in days.items():
+                digest, text = row_hash(lessons)
+                refs.append((class_name, day, digest))
+                rows[digest] = text
+
+        with self._connect() as db:
+            # BEGIN IMMEDIATE - номер версии не достанется двум процессам
+            db.execute('BEGIN IMMEDIATE')
+            version = db.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM schedule_version WHERE schedule_id = ?',
+                                 (schedule_id,)).fetchone()[0]
+            db.execute('INSERT INTO schedule_version (schedule_id, version, created, source, fitness, conflicts) '
+                       'VALUES (?, ?, ?, ?, ?, ?)',
+                       (schedule_id, version, time.time(), source, state.get('fitness'),
+                        json.dumps(state.get('conflicts') or {}, ensure_ascii=False)))
+            db.executemany('INSERT OR IGNORE INTO schedule_row (hash, lessons) VALUES (?, ?)', rows.items())
+            db.executemany('INSERT INTO schedule_version_row '
+                           '(schedule_id, version, position, class_name, day, row_hash) VALUES (?, ?, ?, ?, ?, ?)',
+                           [(schedule_id, version, i, c, d, h) for i, (c, d, h) in enumerate(refs)])
+            self._prune(db, schedule_id, version)
+        return version
+
+    def _prune(self, db, schedule_id, version):
+        if version <= self.keep:
+            return
+        oldest = version - self.keep
+        db.execute('DELETE FROM schedule_version_row WHERE schedule_id = ? AND version <= ?', (schedule_id, oldest))
+        db.execute('DELETE FROM schedule_version WHERE schedule_id = ? AND version <= ?', (schedule_id, oldest))
+        db.execute('DELETE FROM schedule_row WHERE NOT EXISTS '
+                   '(SELECT 1 FROM schedule_version_row r WHERE r.row_hash = schedule_row.hash)')
+
+    def load(self, schedule_id, version: Optional[int] = None) -> Optional[Dict]:
+        """Состояние версии (по умолчанию последней) с полями version, source, created или None"""
+        with self._connect() as db:
+            if version is None:
+                meta = db.execute('SELECT version, created, source, fitness, conflicts FROM schedule_version '
+                                  'WHERE schedule_id = ? ORDER BY version DESC LIMIT 1', (schedule_id,)).fetchone()
+            else:
+                meta = db.execute('SELECT version, created, source, fitness, conflicts FROM schedule_version '
+                                  'WHERE schedule_id = ? AND version = ?', (schedule_id, version)).fetchone()
+            if meta is None:
+                return None
+            rows = db.execute('SELECT r.class_name, r.day, s.lessons FROM schedule_version_row r '
+                              'JOIN schedule_row s ON s.hash = r.row_hash '
+                              'WHERE r.schedule_id = ? AND r.version = ? ORDER BY r.position',
+                              (schedule_id, meta[0])).fetchall()
+
+        schedule = {}
+        for class_name, day, lessons in rows:
+            schedule.setdefault(class_name, {})[day] = json.loads(lessons)
+        version, created, source, fitness, conflicts = meta
+        return {
+            'schedule': schedule,
+            'fitness': fitness if fitness is not None else 0,
+            'conflicts': json.loads(conflicts) if conflicts else {},
+            'version': version,
+            'source': source,
+            'created': created
+        }
+
+    def history(self, schedule_id) -> List[Dict]:
+        """Версии schedule_id без самих расписаний, от новых к старым"""
+        with self._connect() as db:
+            rows = db.execute('SELECT version, created, source, fitness FROM schedule_version '
+                              'WHERE schedule_id = ? ORDER BY version DESC', (schedule_id,)).fetchall()
+        return [{'version': v, 'created': c, 'source': s, 'fitness': f} for v, c, s, f in rows]
+
+    def rollback(self, schedule_id, version: int) -> Optional[Dict]:
+        """Делает версию текущей: сохраняет ее копией под новым номером (история не теряется)"""
+        state = self.load(schedule_id, version)
+        if state is None:
+            return None
+        return self.load(schedule_id, self.save(schedule_id, state, source=f'rollback:{version}'))
+
+
+def make_version_store(path=None, keep=None) -> ScheduleVersions:
+    """Хранилище версий по VERSIONS_DB (по умолчанию schedules.db рядом с app.py) и VERSIONS_KEEP"""
+    path = path or os.environ.get('VERSIONS_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 'schedules.db')
+    if keep is None:
+        keep = int(os.environ.get('VERSIONS_KEEP', 50))
+    return ScheduleVersions(path, keep)
@@ -0,0 +1,138 @@
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+import openpyxl
+
+from problem import compile_problem
+
+# Ключ запроса оптимизации -> лист книги (как в шаблоне веб-интерфейса)
+SHEETS = {
+    'classes': 'Параллели',
+    'subjects': 'Предметы',
+    'teachers': 'Учителя',
+    'rooms': 'Кабинеты'
+}
+# Обязательные листы и столбцы
+REQUIRED = {
+    'classes': ('класс', 'параллель'),
+    'subjects': ('предмет', 'параллель'),
+    'teachers': ('ФИО',)
+}
+# Числовые столбцы: целое число уроков
+INTEGER_COLUMNS = {
+    'subjects': ('часов_в_неделю',),
+    'teachers': ('макс_уроков_в_день',)
+}
+MAX_ERRORS = 20
+
+
+def _value(value):
+    """Значение ячейки для JSON: строки без пробелов по краям, целые float (4.0) -> int, даты -> строки"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    value = str(value).strip()
+    return value or None
+
+
+def _integer(value):
+    """Неотрицательное целое из ячейки (4 или "4") или None"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if value >= 0 else None
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+def _read_sheet(ws) -> Tuple[List[Dict], List[int]]:
+    """Строки листа словарями по заголовку (первая непустая строка) и их номера на листе;
+    пустые ячейки и строки пропускаются"""
+    header = None
+    records = []
+    numbers = []
+    # iter_rows в read_only идет с первой строки листа, пропуски заполняет пустыми строками
+    for number, row in enumerate(ws.iter_rows(values_only=True), 1):
+        values = [_value(v) for v in row]
+        if header is None:
+            if any(v is not None for v in values):
+                header = values
+            continue
+        record = {str(name): value for name, value in zip(header, values)
+                  if name is not None and value is not None}
+        if record:
+            records.append(record)
+            numbers.append(number)
+    return records, numbers
+
+
+def read_workbook(file) -> Dict[str, List[Dict]]:
+    """Листы книги XLSX в формате запроса /api/optimize (classes, subjects, teachers, rooms).
+
+    Книга читается openpyxl в режиме read_only: строки листов разбираются
+    потоком, без загрузки всей книги в память. Бросает ValueError с
+    перечнем ошибок (лист, строка), если данные не проходят проверку.
+    """
+    try:
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"Не удалось прочитать книгу XLSX: {e}")
+    data = {}
+    numbers = {}
+    try:
+        for key, sheet in SHEETS.items():
+            data[key], numbers[key] = _read_sheet(wb[sheet]) if sheet in wb.sheetnames else ([], [])
+    finally:
+        wb.close()
+    validate_workbook(data, numbers)
+    return data
+
+
+def validate_workbook(data: Dict[str, List[Dict]], numbers: Optional[Dict[str, List[int]]] = None):
+    """Обязательные листы и столбцы, целые числа уроков (приводятся к int).
+
+    numbers - номера строк записей на листах (для сообщений об ошибках);
+    без них записи считаются идущими подряд со второй строки.
+    """
+    numbers = numbers or {}
+    errors = []
+    for key, columns in REQUIRED.items():
+        if not data[key]:
+            errors.append(f"Лист «{SHEETS[key]}» отсутствует или пуст")
+            continue
+        for i, record in zip(numbers.get(key) or range(2, len(data[key]) + 2), data[key]):
+            missing = [c for c in columns if c not in record]
+            if missing:
+                errors.append(f"{SHEETS[key]}, строка {i}: нет {', '.join(missing)}")
+
+    for key, columns in INTEGER_COLUMNS.items():
+        for i, record in zip(numbers.get(key) or range(2, len(data[key]) + 2), data[key]):
+            for column in columns:
+                value = record.get(column)
+                if value is None:
+                    continue
+                number = _integer(value)
+                if number is None:
+                    errors.append(f"{SHEETS[key]}, строка {i}: {column} = {value!r} - нужно целое число")
+                else:
+                    record[column] = number
+
+    if errors:
+        more = f" (и еще {len(errors) - MAX_ERRORS})" if len(errors) > MAX_ERRORS else ''
+        raise ValueError('; '.join(errors[:MAX_ERRORS]) + more)
+
+
+def problem_id(data: Dict[str, List[Dict]]) -> str:
+    """Id загруженных данных - хеш их канонического JSON (одна и та же книга - один id)"""
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def import_workbook(file) -> Dict:
+    """Книга -> {'id', 'data', 'problem'}: листы запроса и скомпилированная задача (ProblemInstance)"""
+    data = read_workbook(file)
+    problem = compile_problem(data['classes'], data['subjects'], data['teachers'], data['rooms'])
+    return {'id': problem_id(data), 'data': data, 'problem': problem}
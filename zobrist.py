@@ -0,0 +1,100 @@
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from chromosome import EMPTY, LESSON_FIELDS
+
+MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+_ROW_FIELDS = ('урок',) + LESSON_FIELDS
+
+
+def _mix(z: int) -> int:
+    """Финализатор splitmix64: псевдослучайный 64-битный ключ по числу"""
+    z = (z + 1) * _GOLDEN & MASK
+    z = (z ^ (z >> 30)) * _MIX1 & MASK
+    z = (z ^ (z >> 27)) * _MIX2 & MASK
+    return z ^ (z >> 31)
+
+
+def cell_key(index: int, lid: int) -> int:
+    """Zobrist-ключ урока lid в ячейке index = (класс * дней + день) * уроков + урок.
+
+    Ключи не хранятся таблицей (ячеек × уроков слишком много), а вычисляются
+    хешированием пары; пустая ячейка дает 0. Ключи одинаковы во всех процессах.
+    """
+    if lid == EMPTY:
+        return 0
+    return _mix((index << 16) | lid)
+
+
+def fingerprint(genes: np.ndarray) -> int:
+    """Zobrist-хеш тензорной особи: XOR ключей всех ячеек (совпадает с cell_key)"""
+    lids = genes.ravel().astype(np.int64)
+    z = (np.arange(lids.size, dtype=np.uint64) << np.uint64(16)) | (lids & 0xFFFF).astype(np.uint64)
+    z = (z + np.uint64(1)) * np.uint64(_GOLDEN)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(_MIX1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(_MIX2)
+    z ^= z >> np.uint64(31)
+    z[lids == EMPTY] = 0
+    return int(np.bitwise_xor.reduce(z))
+
+
+def lesson_key(cls, day, p, lesson) -> int:
+    """Zobrist-ключ урока dict-расписания: BLAKE2b от repr полей.
+
+    Встроенный hash() строк солится в каждом процессе, а repr строк и чисел
+    от процесса не зависит - ключи одинаковы во всех процессах и запусках.
+    """
+    text = repr((cls, day, p) + tuple(lesson.get(f) for f in _ROW_FIELDS))
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def row_fingerprint(cls, day, row) -> int:
+    """Zobrist-хеш строки класс-день dict-расписания: XOR ключей ее уроков"""
+    h = 0
+    for p, lesson in enumerate(row):
+        h ^= lesson_key(cls, day, p, lesson)
+    return h
+
+
+class FitnessCache:
+    """LRU-кэш fingerprint расписания -> (fitness, conflicts).
+
+    Одинаковые особи (копии родителя, потомки одной элиты без мутации)
+    оцениваются один раз. Хранится не больше maxsize записей.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Tuple[float, Dict]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], dict(entry[1])
+
+    def put(self, key, fitness, conflicts):
+        self.entries[key] = (fitness, dict(conflicts))
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries)
+        }